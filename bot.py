@@ -6,111 +6,813 @@ monkey.patch_all()
 import random
 import requests
 import re
+import json
+import zlib
+import hashlib
+import hmac
+import base64
+import secrets
+import uuid
+import io
+import csv
+import urllib.parse
+import functools
+from contextlib import contextmanager
+from collections import deque
 import gevent
+import numpy as np
+import redis
+from gevent.lock import Semaphore
+from gevent.queue import Queue
+from gevent.event import AsyncResult
+from requests.adapters import HTTPAdapter
 from flask import Flask, render_template, jsonify, request
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 app = Flask(__name__, template_folder='templates')
 CORS(app)
 
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="gevent", ping_timeout=20, ping_interval=5)
+REDIS_URL = os.getenv("REDIS_URL")
+
+# 🌟 REDIS_URL ሲሰጥ emit በ Redis message queue በኩል ወደ ሁሉም worker ክላየንቶች ይደርሳል
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="gevent", ping_timeout=20, ping_interval=5, message_queue=REDIS_URL)
 
 ADMIN_ID = os.getenv("ADMIN_ID") 
 BOT_TOKEN = os.getenv("BOT_TOKEN") 
 MONGO_URL = os.getenv("MONGO_URL")
 WEB_APP_URL = os.getenv("WEB_APP_URL", "https://habesha-dice-bot.onrender.com") 
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+CARD_SEED = os.getenv("CARD_SEED", "habesha-bingo-v1")
+
+# 🌟 ቀላል Prometheus መለኪያዎች፤ /metrics ላይ በ text format ይወጣሉ
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+metric_histograms = {}
+metric_counters = {}
+metric_buckets = {}
+metric_help = {}
+
+def define_histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    metric_buckets[name] = buckets
+    metric_help[name] = help_text
+
+define_histogram("bingo_route_seconds", "HTTP and Socket.IO handler latency")
+define_histogram("bingo_task_seconds", "Background task and settlement step duration")
+define_histogram("bingo_mongo_seconds", "MongoDB command latency")
+define_histogram("bingo_telegram_seconds", "Telegram Bot API call latency")
+define_histogram("bingo_emit_seconds", "Socket.IO emit duration per broadcast")
+define_histogram("bingo_broadcast_bytes", "Serialized broadcast payload size", SIZE_BUCKETS)
+define_histogram("bingo_win_latency_seconds", "Time from drawing the winning ball to detect, broadcast, settle and shown on a client")
+define_histogram("bingo_loop_drift_seconds", "How late sleep wakeups are in the game loop and flusher",
+                 (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    hist = metric_histograms.get(key)
+    if hist is None:
+        hist = metric_histograms[key] = {"buckets": [0] * len(metric_buckets[name]), "sum": 0.0, "count": 0}
+    for i, bound in enumerate(metric_buckets[name]):
+        if value <= bound:
+            hist["buckets"][i] += 1
+    hist["sum"] += value
+    hist["count"] += 1
+
+def count(name, amount=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    metric_counters[key] = metric_counters.get(key, 0) + amount
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+# 🌟 በሂደት ላይ ያሉ handler/task ዎች በመግቢያ እና መውጫ ይቆጠራሉ (heap ን መፈተሽ hub ን ያግዳል)፤ የሚቆጠሩት በ timed_route እና
+# timed_task የተጠቀለሉ ብቻ ናቸው፣ ሌሎች gevent.spawn ያስነሳቸው greenlet ዎች (broadcast_delta፣ ማሳወቂያዎች) አይቆጠሩም
+handlers_active = {}
+metric_help["bingo_handlers_active"] = "Instrumented HTTP/Socket.IO handlers and background tasks currently running (not all greenlets)"
+
+def instrumented(name, label):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            handlers_active[label] = handlers_active.get(label, 0) + 1
+            try:
+                with timed(name, **{label: func.__name__}):
+                    return func(*args, **kwargs)
+            finally:
+                handlers_active[label] -= 1
+        return wrapper
+    return decorate
 
-client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+timed_route = instrumented("bingo_route_seconds", "route")
+timed_task = instrumented("bingo_task_seconds", "task")
+
+def loop_sleep(seconds, loop):
+    started = time.monotonic()
+    socketio.sleep(seconds)
+    observe("bingo_loop_drift_seconds", max(0.0, time.monotonic() - started - seconds), loop=loop)
+
+# 🌟 ቀጣዩ ክስተት በ monotonic ሰዓት በተወሰነ deadline ይነሳል፤ የ broadcast/Mongo መዘግየት ወደ ቀጣዩ አይደመርም
+def sleep_until(deadline, loop):
+    socketio.sleep(max(0.0, deadline - time.monotonic()))
+    observe("bingo_loop_drift_seconds", max(0.0, time.monotonic() - deadline), loop=loop)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        if QUERY_SHAPE_LOG:
+            try:
+                record_command_shape(event.command_name, event.command)
+            except Exception as e:
+                print(f"Query shape record error: {e}")
+
+    def succeeded(self, event):
+        observe("bingo_mongo_seconds", event.duration_micros / 1e6, command=event.command_name, outcome="ok")
+
+    def failed(self, event):
+        observe("bingo_mongo_seconds", event.duration_micros / 1e6, command=event.command_name, outcome="error")
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs) + "}"
+
+def render_metrics(gauges):
+    lines = []
+    for name in metric_buckets:
+        lines.append(f"# HELP {name} {metric_help[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for (hist_name, labels), hist in metric_histograms.items():
+            if hist_name != name:
+                continue
+            for bound, total in zip(metric_buckets[name], hist["buckets"]):
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {total}")
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {hist['sum']:.6f}")
+            lines.append(f"{name}_count{format_labels(labels)} {hist['count']}")
+    for name in sorted({k[0] for k in metric_counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (counter_name, labels), value in metric_counters.items():
+            if counter_name == name:
+                lines.append(f"{name}{format_labels(labels)} {value}")
+    for name, samples in gauges.items():
+        if name in metric_help:
+            lines.append(f"# HELP {name} {metric_help[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000, event_listeners=[MongoCommandMetrics()])
 db = client['bingo_db']
 wallets = db['wallets']
+broadcast_jobs = db['broadcast_jobs']
+round_journal = db['round_journal']
+webhook_updates = db['webhook_updates']
+webhook_dead_letters = db['webhook_dead_letters']
 
-try:
-    wallets.create_index("phone", unique=True)
-except Exception as e:
-    print(f"Index creation notice: {e}")
-
-game_state = {
-    "status": "lobby", 
-    "timer": 30,
-    "ball_timer": 3,      
-    "pot": 0, 
-    "players": {},        
-    "sold_tickets": {},  
-    "current_ball": "--", 
-    "drawn_balls": [], 
-    "winner": None,
-    "winning_card": None,
-    "winning_ticket_num": None,
-    "winning_indices": None,
-    "winning_line_name": None,  
-    "all_cards": {}  
+shared = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+LEADER_KEY = "bingo:leader"
+LEADER_TTL = 10
+SHARED_EVENTS = "bingo:events"
+SHARED_REPLY_TIMEOUT = 3
+is_leader = shared is None
+
+# 🌟 የሚያስፈልጉ index-ዎች እዚህ ይታወጃሉ፤ ሲነሳ ያልተፈጠሩት በጀርባ ይፈጠራሉ፣ ልዩነት (drift) ካለ ይነገራል
+REQUIRED_INDEXES = {
+    "wallets": [
+        ([("phone", 1)], {"unique": True}),
+        ([("chat_id", 1)], {}),
+        ([("balance", -1)], {}),
+    ],
+    "round_journal": [
+        ([("type", 1), ("open", 1)], {}),
+        ([("round_id", 1), ("n", 1)], {}),
+    ],
+    "broadcast_jobs": [
+        ([("status", 1)], {}),
+    ],
+    "webhook_updates": [
+        ([("ts", 1)], {"expireAfterSeconds": 7 * 86400}),
+    ],
 }
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+index_drift = {}
+
+def index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def check_index_drift():
+    drift = {}
+    for coll_name, declared in REQUIRED_INDEXES.items():
+        existing = db[coll_name].index_information()
+        wanted = {index_name(keys): (keys, options) for keys, options in declared}
+        for name, (keys, options) in wanted.items():
+            info = existing.get(name)
+            if info is None:
+                drift.setdefault(coll_name, []).append(f"missing {name}")
+            elif [tuple(k) for k in info["key"]] != [tuple(k) for k in keys] or \
+                    any(info.get(opt) != options.get(opt) for opt in INDEX_OPTIONS):
+                drift.setdefault(coll_name, []).append(f"changed {name}")
+        for name in existing:
+            if name != "_id_" and name not in wanted:
+                drift.setdefault(coll_name, []).append(f"extra {name}")
+    return drift
+
+# 🌟 create_index ቀድሞ ካለ ምንም አያደርግም፤ አንዱ ቢወድቅ (ለምሳሌ የተደገመ phone) ሌሎቹ ይቀጥላሉ
+def ensure_indexes():
+    global index_drift
+    for coll_name, declared in REQUIRED_INDEXES.items():
+        for keys, options in declared:
+            try:
+                with timed("bingo_task_seconds", task="ensure_index"):
+                    db[coll_name].create_index(keys, **options)
+            except Exception as e:
+                print(f"Index {coll_name}.{index_name(keys)} not created: {e}")
+    try:
+        index_drift = check_index_drift()
+    except Exception as e:
+        print(f"Index drift check failed: {e}")
+        return
+    for coll_name, problems in index_drift.items():
+        print(f"Index drift on {coll_name}: {', '.join(problems)}")
+
+# 🌟 bot.py የሚልካቸው query-ዎች ቅርጽ፤ indexcheck.py በ explain() COLLSCAN እንዳይሆኑ ያረጋግጣል፣ tests/test_query_shapes.py
+# ደግሞ ኮዱ የሚልከው እያንዳንዱ filter እዚህ መታወጁን ያረጋግጣል። full_scan=True ያላቸው ሁሉንም ሰነድ ማንበብ ያለባቸው የ admin ሪፖርቶች ናቸው።
+QUERY_SHAPES = [
+    {"name": "wallet_get", "collection": "wallets", "filter": {"phone": "0911000000"}},
+    {"name": "wallet_refresh", "collection": "wallets", "filter": {"phone": {"$in": ["0911000000", "0911000001"]}}},
+    {"name": "wallet_reserve_direct", "collection": "wallets", "filter": {"phone": "0911000000", "balance": {"$gte": 10}}},
+    {"name": "wallet_settle_once", "collection": "wallets", "filter": {"phone": "0911000000", "settlements": {"$ne": "wb:1"}}},
+    {"name": "wallet_debit_once", "collection": "wallets", "filter": {"phone": "0911000000", "settlements": {"$ne": "cb_1"}, "balance": {"$gte": 10}}},
+    {"name": "wallet_apply_once_check", "collection": "wallets", "filter": {"phone": "0911000000", "settlements": "cb_1"}},
+    {"name": "wallet_bind_request", "collection": "wallets", "filter": {"phone": "0911000000", "bind_chat_id": {"$ne": "123456"}}},
+    {"name": "wallet_bind_confirm", "collection": "wallets", "filter": {"phone": "0911000000", "bind_chat_id": "123456"}},
+    {"name": "webhook_touch_chat", "collection": "wallets", "filter": {"chat_id": "123456"}},
+    {"name": "broadcast_first_page", "collection": "wallets", "filter": {"chat_id": {"$nin": [None, ""]}}, "sort": [("_id", 1)]},
+    {"name": "broadcast_page", "collection": "wallets", "filter": {"chat_id": {"$nin": [None, ""]}, "_id": {"$gt": "0"}}, "sort": [("_id", 1)]},
+    {"name": "report_top_n", "collection": "wallets", "filter": {}, "sort": [("balance", -1)], "limit": 20},
+    {"name": "report_nonzero", "collection": "wallets", "filter": {"balance": {"$gt": 0}}},
+    {"name": "report_all", "collection": "wallets", "filter": {}, "full_scan": True},
+    {"name": "report_summary", "collection": "wallets", "pipeline": [{"$group": {"_id": None, "total": {"$sum": "$balance"}}}], "full_scan": True},
+    {"name": "broadcast_resume", "collection": "broadcast_jobs", "filter": {"status": "running"}},
+    {"name": "broadcast_job", "collection": "broadcast_jobs", "filter": {"_id": "bc_1"}},
+    {"name": "broadcast_job_owned", "collection": "broadcast_jobs", "filter": {"_id": "bc_1", "owner": "w"}},
+    {"name": "broadcast_claim", "collection": "broadcast_jobs",
+     "filter": {"_id": "bc_1", "status": "running", "$or": [{"lease_until": None}, {"lease_until": {"$lt": 0}}]}},
+    {"name": "journal_event", "collection": "round_journal", "filter": {"_id": "r1:00001"}},
+    {"name": "journal_open_rounds", "collection": "round_journal", "filter": {"type": "round_started", "open": True}},
+    {"name": "journal_round_events", "collection": "round_journal", "filter": {"round_id": "r1"}, "sort": [("n", 1)]},
+    {"name": "webhook_update_seen", "collection": "webhook_updates", "filter": {"_id": 1}},
+    {"name": "webhook_dead_letter", "collection": "webhook_dead_letters", "filter": {"_id": 1}},
+]
+
+# 🌟 የ filter ቅርጽ፦ እሴቶቹ ይጣላሉ፣ field ዎች እና operator ዎች ይቀራሉ
+SHAPE_NESTED_OPS = ("$and", "$or", "$nor", "$not", "$elemMatch")
+SHAPE_LIST_OPS = ("$in", "$nin", "$all")
+
+def filter_shape(value):
+    if isinstance(value, dict):
+        if value and all(str(k).startswith("$") for k in value):
+            return {k: filter_shape(v) if k in SHAPE_NESTED_OPS else "?" for k, v in sorted(value.items())}
+        return {k: filter_shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(v) for v in value]
+    return "?"
+
+def query_shape_key(collection, query):
+    return json.dumps([collection, filter_shape(query or {})], sort_keys=True)
+
+def declared_filter(shape):
+    if "pipeline" in shape:
+        return shape["pipeline"][0].get("$match", {}) if shape["pipeline"] else {}
+    return shape["filter"]
+
+# 🌟 እሴቶቹ በአይነታቸው ባዶ ምትክ ይተካሉ (ስልክ ቁጥር ወደ ፋይሉ አይጻፍም)፤ ለ explain ግን filter ው ትክክል ሆኖ ይቀራል
+def redact_filter(value, key=None):
+    if isinstance(value, dict):
+        return {k: redact_filter(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_filter(v) for v in (value[:1] if key in SHAPE_LIST_OPS else value)]
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return 0
+    return "?"
+
+# 🌟 QUERY_SHAPE_LOG=path ሲሰጥ CommandListener ው የሚያየውን እያንዳንዱን አዲስ ቅርጽ ወደ JSON ፋይሉ ይጽፋል (indexcheck.py --seen)
+QUERY_SHAPE_LOG = os.getenv("QUERY_SHAPE_LOG")
+seen_query_shapes = {}
+
+def record_query_shape(collection, query, sort=None):
+    key = query_shape_key(collection, query)
+    if key in seen_query_shapes:
+        return
+    seen_query_shapes[key] = {"collection": collection, "filter": redact_filter(query or {}), "sort": list((sort or {}).items())}
+    if QUERY_SHAPE_LOG:
+        with open(QUERY_SHAPE_LOG, "w") as f:
+            json.dump(list(seen_query_shapes.values()), f, indent=1, default=str)
+
+def record_command_shape(command_name, command):
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        return
+    if command_name in ("find", "findAndModify", "count", "distinct"):
+        record_query_shape(collection, command.get("filter" if command_name == "find" else "query"), command.get("sort"))
+    elif command_name in ("update", "delete"):
+        for op in command.get("updates" if command_name == "update" else "deletes") or []:
+            record_query_shape(collection, op.get("q"))
+    elif command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        record_query_shape(collection, pipeline[0].get("$match", {}))
+
+def plan_stages(plan, winning=False):
+    if isinstance(plan, dict):
+        if winning and "stage" in plan:
+            yield plan["stage"]
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                yield from plan_stages(value, winning or key == "winningPlan")
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value, winning)
+
+# 🌟 aggregate ሲሆን ዕቅዱ ከላይ ወይም በ stages[0].$cursor ውስጥ ይገኛል፤ ሁለቱም ይፈለጋሉ
+def explain_query(shape):
+    coll_name = shape["collection"]
+    if "pipeline" in shape:
+        command = {"aggregate": coll_name, "pipeline": shape["pipeline"], "cursor": {}}
+    else:
+        command = {"find": coll_name, "filter": shape["filter"]}
+        if shape.get("sort"):
+            command["sort"] = dict(shape["sort"])
+        if shape.get("limit"):
+            command["limit"] = shape["limit"]
+    return set(plan_stages(db.command("explain", command, verbosity="queryPlanner")))
+
+gevent.spawn(ensure_indexes)
+
+GAME_ROOMS = os.getenv("GAME_ROOMS", "10")
 
 loop_started = False
-reset_task_reference = None
-pending_claims = []
-claim_lock_active = False
+connected_sockets = 0
+WALLET_FLUSH_INTERVAL = 0.25
+wallet_cache = {}
+wallet_batch = None
+wallet_flush_lock = Semaphore()
+journal_buffer = []
 
 def sanitize_input(text):
     if not text:
         return ""
     return re.sub(r'[^\w\s\-\\.\@]', '', str(text)).strip()
 
-def send_telegram(text, reply_markup=None):
-    def _send():
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        payload = {"chat_id": ADMIN_ID, "text": text, "parse_mode": "Markdown"}
-        if reply_markup:
-            payload["reply_markup"] = reply_markup
+# 🌟 ሁሉም የቴሌግራም ጥሪዎች በአንድ connection pool እና በ rate limit ወረፋ ያልፋሉ
+TG_WORKERS = 8
+TG_GLOBAL_RATE = 30
+TG_CHAT_INTERVAL = 1.0
+TG_MAX_ATTEMPTS = 5
+
+tg_session = requests.Session()
+tg_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=TG_WORKERS))
+tg_session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=TG_WORKERS))
+tg_queue = Queue()
+tg_limits = {"global": 0.0, "chats": {}}
+tg_parked = {}
+tg_workers_started = False
+
+def telegram_chat_wait(chat_id):
+    return tg_limits["chats"].get(chat_id, 0.0) - time.monotonic()
+
+def telegram_wait_turn(chat_id):
+    now = time.monotonic()
+    chats = tg_limits["chats"]
+    if len(chats) > 10000:
+        for cid in [c for c, t in chats.items() if t < now and c not in tg_parked]:
+            chats.pop(cid, None)
+    slot = max(now, tg_limits["global"])
+    if chat_id is not None:
+        chats[chat_id] = max(slot, chats.get(chat_id, 0.0)) + TG_CHAT_INTERVAL
+    tg_limits["global"] = slot + 1.0 / TG_GLOBAL_RATE
+    if slot > now:
+        gevent.sleep(slot - now)
+
+def telegram_hold(chat_id, seconds, everyone=True):
+    until = time.monotonic() + seconds
+    if everyone:
+        tg_limits["global"] = max(tg_limits["global"], until)
+    if chat_id is not None:
+        tg_limits["chats"][chat_id] = max(tg_limits["chats"].get(chat_id, 0.0), until)
+
+# 🌟 ተራው ያልደረሰ chat መልዕክት worker ይዞ አይተኛም፤ በዚያ chat ወረፋ ይቆማል፣ ጊዜው ሲደርስ አንድ በአንድ (በቅደም ተከተል) ይለቀቃል
+def telegram_park(job, front=False):
+    chat_id = job["chat_id"]
+    parked = tg_parked.get(chat_id)
+    if parked is None:
+        parked = tg_parked[chat_id] = deque()
+        gevent.spawn_later(max(0.0, telegram_chat_wait(chat_id)), telegram_release, chat_id)
+    if front:
+        parked.appendleft(job)
+    else:
+        parked.append(job)
+
+def telegram_release(chat_id):
+    parked = tg_parked.get(chat_id)
+    if not parked:
+        tg_parked.pop(chat_id, None)
+        return
+    if telegram_chat_wait(chat_id) > 0:
+        gevent.spawn_later(telegram_chat_wait(chat_id), telegram_release, chat_id)
+        return
+    job = parked.popleft()
+    job["released"] = True
+    tg_queue.put(job)
+
+def telegram_next(chat_id):
+    if tg_parked.get(chat_id):
+        gevent.spawn_later(max(0.0, telegram_chat_wait(chat_id)), telegram_release, chat_id)
+    else:
+        tg_parked.pop(chat_id, None)
+
+# 🌟 አንድ ሙከራ ብቻ፤ (body, None) ወይም እንደገና ለመሞከር (None, የሚጠበቅ ሰከንድ) ይመልሳል
+def telegram_attempt(job):
+    method, chat_id = job["method"], job["chat_id"]
+    telegram_wait_turn(chat_id)
+    try:
+        url = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/{method}"
+        with timed("bingo_telegram_seconds", method=method):
+            if job["files"]:
+                res = tg_session.post(url, data=job["payload"], files=job["files"], timeout=30)
+            else:
+                res = tg_session.post(url, json=job["payload"], timeout=10)
+        count("bingo_telegram_responses_total", method=method, status=res.status_code)
+        body = res.json()
+    except Exception as e:
+        count("bingo_telegram_responses_total", method=method, status="error")
+        print(f"Telegram Error ({method}): {e}")
+        delay = 0.5 * job["attempt"]
+        telegram_hold(chat_id, delay, everyone=False)
+        return None, delay
+    if res.status_code == 429:
+        delay = (body.get("parameters") or {}).get("retry_after", 1)
+        telegram_hold(chat_id, delay)
+        return None, delay
+    return body, None
+
+def telegram_worker():
+    while True:
+        job = tg_queue.get()
+        chat_id = job["chat_id"]
+        released = job.pop("released", False)
+        if chat_id is not None and not released and (chat_id in tg_parked or telegram_chat_wait(chat_id) > 0):
+            telegram_park(job)
+            continue
         try:
-            requests.post(url, json=payload, timeout=2)
+            job["attempt"] += 1
+            body, retry_after = telegram_attempt(job)
+            if retry_after is None or job["attempt"] >= TG_MAX_ATTEMPTS:
+                job["result"].set(body)
+            elif chat_id is None:
+                gevent.spawn_later(retry_after, tg_queue.put, job)
+            else:
+                telegram_park(job, front=True)
         except Exception as e:
-            print(f"Telegram Error: {e}")
-    gevent.spawn(_send)
+            print(f"Telegram Error ({job['method']}): {e}")
+            job["result"].set(None)
+        if released:
+            telegram_next(chat_id)
+
+def telegram_call(method, payload, wait=False, timeout=60, files=None):
+    global tg_workers_started
+    if not tg_workers_started:
+        tg_workers_started = True
+        for _ in range(TG_WORKERS):
+            gevent.spawn(telegram_worker)
+    result = AsyncResult()
+    chat_id = payload.get("chat_id")
+    tg_queue.put({
+        "method": method, "payload": payload, "files": files, "result": result, "attempt": 0,
+        "chat_id": str(chat_id) if chat_id is not None else None
+    })
+    if wait:
+        return result.get(timeout=timeout)
+    return result
+
+def send_telegram(text, reply_markup=None):
+    payload = {"chat_id": ADMIN_ID, "text": text, "parse_mode": "Markdown"}
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    return telegram_call("sendMessage", payload)
 
 def set_webhook():
-    webhook_url = f"{WEB_APP_URL}/webhook"
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/setWebhook?url={webhook_url}"
+    payload = {"url": f"{WEB_APP_URL}/webhook"}
+    if WEBHOOK_SECRET:
+        payload["secret_token"] = WEBHOOK_SECRET
+    telegram_call("setWebhook", payload)
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+# 🌟 msgpack ለሚጠይቁ ክላየንቶች፤ ኳሶች uint8፣ የተሸጡ ትኬቶች bitset፣ ካርቴላዎች 25 byte ይሆናሉ
+WIRE_FORMATS = ("json", "msgpack") if msgpack else ("json",)
+
+def wire_format(value):
+    return value if value in WIRE_FORMATS else "json"
+
+def ball_number(label):
     try:
-        requests.get(url, timeout=2)
-    except Exception as e:
-        print(f"Webhook set failed: {e}")
-
-def broadcast_game_state():
-    state_payload = {
-        "status": game_state["status"],
-        "timer": game_state["timer"],
-        "ball_timer": game_state["ball_timer"],
-        "pot": game_state["pot"],
-        "sold_tickets": game_state["sold_tickets"],
-        "current_ball": game_state["current_ball"],
-        "drawn_balls": game_state["drawn_balls"],
-        "winner": game_state["winner"],
-        "winning_card": game_state["winning_card"],
-        "winning_ticket_num": game_state["winning_ticket_num"],
-        "winning_indices": game_state.get("winning_indices"),
-        "winning_line_name": game_state.get("winning_line_name"), 
-        "all_cards": game_state.get("all_cards", {}), 
-        "active_players": len(game_state["players"])
-    }
-    socketio.emit('game_update', state_payload)
+        return int(str(label)[1:])
+    except ValueError:
+        return 0
+
+def pack_tickets(sold_tickets):
+    bits = bytearray(TICKET_COUNT // 8 + 1)
+    for t_num in sold_tickets:
+        slot = int(t_num)
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return bytes(bits)
+
+def compact_payload(payload):
+    out = dict(payload)
+    if "drawn_balls" in out:
+        out["drawn_balls"] = bytes(ball_number(b) for b in out["drawn_balls"] or [])
+    if "current_ball" in out:
+        out["current_ball"] = ball_number(out["current_ball"])
+    if "sold_tickets" in out:
+        out["sold_tickets"] = pack_tickets(out["sold_tickets"] or {})
+    for field in ("winning_card", "winning_indices"):
+        if out.get(field) is not None:
+            out[field] = bytes(out[field])
+    if "players" in out:
+        out["players"] = {k: {"username": v["username"], "cards": [bytes(c) for c in v["cards"]]} for k, v in out["players"].items()}
+    if "my_cards" in out:
+        out["my_cards"] = [bytes(c) for c in out["my_cards"]]
+    return out
+
+def encode_wire(payload, wire="json"):
+    if wire == "msgpack":
+        return msgpack.packb(compact_payload(payload), use_bin_type=True)
+    return encode_json(payload)
+
+def balance_room(phone_num):
+    digits = re.sub(r'[^0-9]', '', str(phone_num or ""))[-9:]
+    return f"bal_{digits}" if digits else None
+
+# 🌟 ከ /register_or_login በኋላ ማንነት ከተፈረመ token ይነበባል፤ በየ request Mongo ላይ በስልክ መፈለግ አያስፈልግም
+SESSION_SECRET = (os.getenv("SESSION_SECRET") or "").encode() or hashlib.sha256(f"session:{BOT_TOKEN or secrets.token_hex(16)}".encode()).digest()
+SESSION_TTL = int(os.getenv("SESSION_TTL", 7 * 86400))
+INIT_DATA_MAX_AGE = 86400
+# 🌟 በስልክ ብቻ መግባት ለሽግግሩ ጊዜ ብቻ ነው፤ REQUIRE_INIT_DATA=0 ካልተሰጠ initData ግዴታ ነው
+REQUIRE_INIT_DATA = os.getenv("REQUIRE_INIT_DATA", "1") != "0"
+LEGACY_PHONE_AUTH = os.getenv("LEGACY_PHONE_AUTH") == "1"
+
+def b64url(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def b64url_decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def issue_session(phone_num, chat_id=None):
+    body = b64url(encode_json({"p": phone_num, "c": chat_id, "exp": int(time.time()) + SESSION_TTL}))
+    return body + "." + b64url(hmac.new(SESSION_SECRET, body.encode(), hashlib.sha256).digest())
+
+def read_session(token):
+    body, _, sig = str(token or "").partition(".")
+    if not body or not sig:
+        return None
+    expected = b64url(hmac.new(SESSION_SECRET, body.encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(expected, sig):
+        return None
+    try:
+        claims = json.loads(b64url_decode(body))
+    except ValueError:
+        return None
+    return claims if claims.get("exp", 0) > time.time() else None
+
+# 🌟 Telegram WebApp initData በ BOT_TOKEN የተፈረመ ነው፤ እዚህ ሲረጋገጥ የተጠቃሚው id እውነተኛ መሆኑ ይታወቃል
+def verify_init_data(init_data):
+    if not init_data or not BOT_TOKEN:
+        return None
+    fields = dict(urllib.parse.parse_qsl(str(init_data), keep_blank_values=True))
+    received = fields.pop("hash", "")
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(hmac.new(secret_key, check_string.encode(), hashlib.sha256).hexdigest(), received):
+        return None
+    try:
+        if time.time() - int(fields.get("auth_date", 0)) > INIT_DATA_MAX_AGE:
+            return None
+        user = json.loads(fields.get("user") or "{}")
+    except ValueError:
+        return None
+    return user if user.get("id") else None
+
+# 🌟 HTTP ላይ token ከ Authorization header ብቻ ይነበባል (URL ላይ ያለ token በ proxy log ይመዘገባል)፤ socket ደግሞ በ auth/payload ይልከዋል
+def session_phone(data=None, token=None):
+    data = data or {}
+    auth_header = request.headers.get("Authorization") or ""
+    claims = read_session(auth_header[7:] if auth_header.startswith("Bearer ") else token)
+    if claims:
+        return claims["p"]
+    if LEGACY_PHONE_AUTH:
+        return sanitize_input(data.get("phone") or request.args.get("phone"))
+    return None
+
+def session_required():
+    return jsonify({"success": False, "msg": "እባክዎ እንደገና ይግቡ!", "relogin": True}), 401
 
 def notify_user_balance_update(phone_num, new_balance):
-    socketio.emit('balance_update', {"phone": phone_num, "balance": new_balance})
+    room = balance_room(phone_num)
+    if room:
+        socketio.emit('balance_update', {"phone": phone_num, "balance": new_balance}, to=room)
+
+# 🌟 የዙሩ ተጫዋቾች ባላንስ በሜሞሪ ይያዛል፤ ለውጦቹ በ batch ወደ Mongo ይጻፋሉ (Mongo ዋናው ምንጭ ነው)
+def wallet_get(phone_num):
+    entry = wallet_cache.get(phone_num)
+    if entry is None:
+        user = wallets.find_one({"phone": phone_num}, {"phone": 1, "balance": 1, "username": 1})
+        if not user:
+            return None
+        entry = {
+            "phone": user["phone"], "username": user.get("username"),
+            "balance": user.get("balance", 0), "pending": 0, "inflight": 0, "stale": False
+        }
+        # 🌟 ብዙ worker ሲኖር ካሽ አይጋራም፤ ስለዚህ ክፍያው በቀጥታ Mongo ላይ በ atomic $inc ይሆናል
+        if shared is not None:
+            entry["direct"] = True
+            return entry
+        entry = wallet_cache.setdefault(user["phone"], entry)
+    return entry
+
+def wallet_available(entry):
+    return entry["balance"] + entry["inflight"] + entry["pending"]
+
+def wallet_reserve(entry, amount):
+    if entry.get("direct"):
+        user = wallets.find_one_and_update(
+            {"phone": entry["phone"], "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}}, return_document=True
+        )
+        if not user:
+            return None
+        entry["balance"] = user["balance"]
+        return entry["balance"]
+    if wallet_available(entry) < amount:
+        return None
+    entry["pending"] -= amount
+    return wallet_available(entry)
+
+def wallet_release(entry, amount):
+    if entry.get("direct"):
+        user = wallets.find_one_and_update({"phone": entry["phone"]}, {"$inc": {"balance": amount}}, return_document=True)
+        entry["balance"] = user["balance"] if user else entry["balance"] + amount
+        return entry["balance"]
+    entry["pending"] += amount
+    return wallet_available(entry)
+
+def wallet_sync(phone_num, new_balance):
+    entry = wallet_cache.get(phone_num)
+    if entry is None:
+        return
+    if entry["inflight"] == 0:
+        entry["balance"] = new_balance
+    else:
+        entry["stale"] = True
+
+def notify_wallet_balance(phone_num, new_balance):
+    entry = wallet_cache.get(phone_num)
+    notify_user_balance_update(phone_num, wallet_available(entry) if entry else new_balance)
+
+@timed_task
+def wallet_flush():
+    with wallet_flush_lock:
+        return wallet_write_batch()
+
+# 🌟 wallet_flush_lock ተይዞ ይጠራል፤ Mongo ከተቀበለው በኋላ መጠኑ ከ inflight ወደ balance ይዛወራል፣ መልሶ ማንበቡ ቢወድቅ stale ሆኖ ይቀራል
+def wallet_write_batch():
+    global wallet_batch
+    if wallet_batch is None:
+        amounts = {}
+        for phone_num, entry in wallet_cache.items():
+            if entry["pending"]:
+                amounts[phone_num] = entry["pending"]
+                entry["inflight"] += entry["pending"]
+                entry["pending"] = 0
+        wallet_batch = {"key": f"wb:{uuid.uuid4().hex[:12]}", "amounts": amounts}
+
+    batch = wallet_batch
+    ops = [
+        UpdateOne(
+            {"phone": phone_num, "settlements": {"$ne": batch["key"]}},
+            {"$inc": {"balance": amount}, "$push": {"settlements": {"$each": [batch["key"]], "$slice": -20}}}
+        )
+        for phone_num, amount in batch["amounts"].items()
+    ]
+    try:
+        if ops:
+            wallets.bulk_write(ops, ordered=True)
+    except Exception as e:
+        print(f"Wallet flush error ({batch['key']}): {e}")
+        return False
+    wallet_batch = None
+    for phone_num, amount in batch["amounts"].items():
+        entry = wallet_cache.get(phone_num)
+        if entry is not None:
+            entry["inflight"] -= amount
+            entry["balance"] += amount
+            entry["stale"] = True
+
+    refresh = [p for p, e in wallet_cache.items() if e["stale"]]
+    if refresh:
+        try:
+            found = {u["phone"]: u.get("balance", 0) for u in wallets.find({"phone": {"$in": refresh}}, {"phone": 1, "balance": 1})}
+        except Exception as e:
+            print(f"Wallet balance read error ({batch['key']}): {e}")
+            return True
+        for phone_num in refresh:
+            entry = wallet_cache.get(phone_num)
+            if entry is None or entry["inflight"]:
+                continue
+            entry["stale"] = False
+            if phone_num in found:
+                entry["balance"] = found[phone_num]
+            elif not entry["pending"]:
+                wallet_cache.pop(phone_num, None)
+    return True
+
+def wallet_trim():
+    for phone_num, entry in list(wallet_cache.items()):
+        if not entry["pending"] and not entry["inflight"]:
+            wallet_cache.pop(phone_num, None)
+
+# 🌟 የዙር ጆርናል በሜሞሪ ይሰበሰባል፤ _id ቋሚ ስለሆነ ድጋሚ ቢጻፍ አይደገምም
+@timed_task
+def journal_write(events):
+    global journal_buffer
+    if not events:
+        return True
+    ops = [UpdateOne({"_id": e["_id"]}, {"$setOnInsert": e}, upsert=True) for e in events]
+    ops += [UpdateOne({"_id": f"{e['round_id']}:00001"}, {"$set": {"open": False}}) for e in events if e["type"] == "round_closed"]
+    try:
+        round_journal.bulk_write(ops, ordered=True)
+    except Exception as e:
+        print(f"Round journal write error: {e}")
+        journal_buffer = events + journal_buffer
+        return False
+    return True
+
+# 🌟 ጆርናሉ የሚጻፈው የዋሌት ለውጦቹ ከተጻፉ በኋላ ነው፤ ያልተከፈለ ትኬት በማገገሚያ ጊዜ ተመላሽ አይደረግም
+def journal_sync():
+    global journal_buffer
+    events, journal_buffer = journal_buffer, []
+    if not wallet_flush():
+        journal_buffer = events + journal_buffer
+        return False
+    return journal_write(events)
+
+def wallet_flusher():
+    global journal_buffer
+    while True:
+        loop_sleep(WALLET_FLUSH_INTERVAL, "wallet_flusher")
+        events, journal_buffer = journal_buffer, []
+        try:
+            if wallet_batch is not None or any(e["pending"] or e["stale"] for e in wallet_cache.values()):
+                if not wallet_flush():
+                    journal_buffer = events + journal_buffer
+                    continue
+            if events:
+                journal_write(events)
+                events = []
+            if pending_settlements:
+                retry_settlements()
+        except Exception as e:
+            print(f"Wallet flusher error: {e}")
+            journal_buffer = events + journal_buffer
 
 @app.route('/request_deposit', methods=['POST'])
+@timed_route
 def request_deposit():
     d = request.json or {}
-    ph = sanitize_input(str(d.get('phone')))
+    db_phone = session_phone(d)
+    if not db_phone:
+        return session_required()
     try:
         amt = float(d.get('amount', 0))
     except ValueError:
         amt = 0
     t_id = sanitize_input(d.get('transaction_id', 'N/A'))
-    user = wallets.find_one({"phone": ph})
-    db_phone = user["phone"] if user else ph
     
     msg = f"💰 *Deposit Request*\n📞 Phone: `{db_phone}`\n💵 Amount: `{amt}` ETB\n🆔 ID: `{t_id}`"
     keyboard = {
@@ -125,21 +827,24 @@ def request_deposit():
     return jsonify({"success": True})
 
 @app.route('/request_withdrawal', methods=['POST'])
+@timed_route
 def request_withdrawal():
     d = request.json or {}
-    ph = sanitize_input(str(d.get('phone')))
+    ph = session_phone(d)
+    if not ph:
+        return session_required()
     try:
         amt = float(d.get('amount', 0))
     except ValueError:
         return jsonify({"success": False, "msg": "ትክክለኛ የገንዘብ መጠን ያስገቡ!"})
     if amt < 20:
         return jsonify({"success": False, "msg": "ቢያንስ 20 ETB ነው!"})
-    user = wallets.find_one({"phone": ph})
+    user = wallet_get(ph)
     if not user:
         return jsonify({"success": False, "msg": "ተጠቃሚው አልተገኘም!"})
     db_phone = user["phone"]
     
-    if user.get("balance", 0) < amt:
+    if wallet_available(user) < amt:
         return jsonify({"success": False, "msg": "በቂ ባላንስ የለዎትም!"})
 
     msg = f"📤 *Withdrawal Request*\n📞 Phone: `{db_phone}`\n💵 Amount: `{amt}` ETB"
@@ -155,17 +860,20 @@ def request_withdrawal():
     return jsonify({"success": True, "msg": "የውዝድሮዋል ጥያቄዎ ለአድሚን ተልኳል!"})
 
 @app.route('/request_transfer', methods=['POST'])
+@timed_route
 def request_transfer():
     d = request.json or {}
-    sender_ph = sanitize_input(d.get('phone'))
+    sender_ph = session_phone(d)
+    if not sender_ph:
+        return session_required()
     receiver_ph = sanitize_input(d.get('receiver_phone'))
     try:
         amt = float(d.get('amount', 0))
     except ValueError:
         return jsonify({"success": False, "msg": "ትክክለኛ መጠን ያስገቡ!"})
     
-    sender = wallets.find_one({"phone": sender_ph})
-    if not sender or sender.get("balance", 0) < amt:
+    sender = wallet_get(sender_ph)
+    if not sender or wallet_available(sender) < amt:
         return jsonify({"success": False, "msg": "በቂ ባላንስ የለዎትም!"})
     db_sender_phone = sender["phone"]
     
@@ -186,9 +894,317 @@ def request_transfer():
     send_telegram(msg, reply_markup=keyboard)
     return jsonify({"success": True, "msg": "የገንዘብ ማስተላለፍ ጥያቄ ለአድሚን ተልኳል!"})
 
+# አዝራሮቹ (Inline Buttons) እንዲኖሩ የሚደረግ ማቀናበሪያ
+BROADCAST_MARKUP = {
+    "inline_keyboard": [
+        [{"text": "👉 Beshbingo (10ብር)", "url": "https://t.me/beshbingo1bot"}],
+        [{"text": "👉 Supperbeshbingo (50ብር)", "url": "http://t.me/superbeshbingobot"}]
+    ]
+}
+BROADCAST_CHUNK = 25
+BROADCAST_PROGRESS_INTERVAL = 5
+BROADCAST_LEASE = 60
+broadcast_running = set()
+
+# 🌟 ብሮድካስት በ Mongo የሚቀመጥ job ነው፤ በ update_id አንድ ጊዜ ብቻ ይፈጠራል፣ ሰርቨሩ ቢነሳም ከቆመበት ይቀጥላል
+def start_broadcast_job(update_id, text):
+    job_id = f"bc_{update_id if update_id is not None else uuid.uuid4().hex}"
+    try:
+        broadcast_jobs.insert_one({
+            "_id": job_id, "text": text, "status": "running", "last_id": None,
+            "sent": 0, "failed": 0, "progress_message_id": None, "created_at": time.time(),
+            "owner": None, "lease_until": 0
+        })
+    except DuplicateKeyError:
+        return False
+    gevent.spawn(run_broadcast_job, job_id)
+    return True
+
+def resume_broadcast_jobs():
+    for job in broadcast_jobs.find({"status": "running"}, {"_id": 1}):
+        if job["_id"] not in broadcast_running:
+            gevent.spawn(run_broadcast_job, job["_id"])
+
+# 🌟 job ን የሚልከው lease የያዘው worker ብቻ ነው፤ lease በየ chunk ይታደሳል፣ worker ቢሞት ጊዜው ሲያልፍ ሌላው ይረከባል
+def claim_broadcast_job(job_id):
+    now = time.time()
+    return broadcast_jobs.find_one_and_update(
+        {"_id": job_id, "status": "running", "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        {"$set": {"owner": WORKER_ID, "lease_until": now + BROADCAST_LEASE}},
+        return_document=True
+    )
+
+def recheck_broadcast_job(job_id):
+    job = broadcast_jobs.find_one({"_id": job_id}, {"status": 1, "lease_until": 1})
+    if job and job["status"] == "running":
+        gevent.spawn_later(max(1, (job.get("lease_until") or 0) - time.time()), run_broadcast_job, job_id)
+
+def report_broadcast_progress(job, text):
+    if job.get("progress_message_id"):
+        telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": job["progress_message_id"], "text": text, "parse_mode": "Markdown"})
+    else:
+        telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": text, "parse_mode": "Markdown"})
+
+def run_broadcast_job(job_id):
+    if job_id in broadcast_running:
+        return
+    broadcast_running.add(job_id)
+    try:
+        send_broadcast_job(job_id)
+    finally:
+        broadcast_running.discard(job_id)
+
+@timed_task
+def send_broadcast_job(job_id):
+    job = claim_broadcast_job(job_id)
+    if not job:
+        recheck_broadcast_job(job_id)
+        return
+    if not job.get("progress_message_id"):
+        res = telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": "📢 *ብሮድካስት ተጀምሯል...*", "parse_mode": "Markdown"}, wait=True)
+        job["progress_message_id"] = ((res or {}).get("result") or {}).get("message_id")
+        broadcast_jobs.update_one({"_id": job_id}, {"$set": {"progress_message_id": job["progress_message_id"]}})
+    owned = {"_id": job_id, "owner": WORKER_ID}
+
+    query = {"chat_id": {"$nin": [None, ""]}}
+    if job.get("last_id") is not None:
+        query["_id"] = {"$gt": job["last_id"]}
+    sent, failed = job.get("sent", 0), job.get("failed", 0)
+    last_report = time.monotonic()
+
+    def send_chunk(chunk):
+        nonlocal sent, failed, last_report
+        results = [
+            telegram_call("sendMessage", {"chat_id": u["chat_id"], "text": job["text"], "parse_mode": "Markdown", "reply_markup": BROADCAST_MARKUP})
+            for u in chunk
+        ]
+        for result in results:
+            res = result.get()
+            if res and res.get("ok"):
+                sent += 1
+            else:
+                failed += 1
+        held = broadcast_jobs.update_one(owned, {"$set": {
+            "last_id": chunk[-1]["_id"], "sent": sent, "failed": failed, "lease_until": time.time() + BROADCAST_LEASE
+        }}).matched_count
+        if not held:
+            print(f"Broadcast {job_id} lease lost, stopping")
+            return False
+        if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            report_broadcast_progress(job, f"📢 *ብሮድካስት በሂደት ላይ...*\n\n✅ የተሳካላቸው: {sent}\n❌ ያልተሳካላቸው: {failed}")
+        return True
+
+    chunk = []
+    for u in wallets.find(query, {"chat_id": 1}).sort("_id", 1).batch_size(500):
+        chunk.append(u)
+        if len(chunk) >= BROADCAST_CHUNK:
+            if not send_chunk(chunk):
+                return
+            chunk = []
+    if chunk and not send_chunk(chunk):
+        return
+
+    broadcast_jobs.update_one(owned, {"$set": {"status": "done", "finished_at": time.time()}})
+    if sent + failed == 0:
+        report_broadcast_progress(job, "📭 ምንም የተመዘገበ ተጠቃሚ የለም።")
+    else:
+        report_broadcast_progress(job, f"📢 *ብሮድካስት ተጠናቋል!*\n\n✅ የተሳካላቸው: {sent}\n❌ ያልተሳካላቸው: {failed}")
+
+REPORT_PAGE_CHARS = 3800
+
+# 🌟 /all [top N] [nonzero] [csv] — ድምሩ በ aggregation፣ ዝርዝሩ ከ cursor በገጽ በገጽ ይላካል
+@timed_task
+def send_balance_report(args):
+    top_n = None
+    if "top" in args:
+        try:
+            top_n = max(1, int(args[args.index("top") + 1]))
+        except (IndexError, ValueError):
+            top_n = 20
+    nonzero = "nonzero" in args
+    as_csv = "csv" in args
+
+    summary = next(wallets.aggregate([{"$group": {
+        "_id": None,
+        "total": {"$sum": "$balance"},
+        "users": {"$sum": 1},
+        "funded": {"$sum": {"$cond": [{"$gt": ["$balance", 0]}, 1, 0]}}
+    }}]), None)
+    if not summary or not summary["users"]:
+        telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": "📭 ምንም የተመዘገበ ተጠቃሚ የለም።"})
+        return
+    footer = f"\n💵 *አጠቃላይ የሲስተሙ ገንዘብ:* {summary['total']} ETB\n👥 ተጠቃሚዎች: {summary['users']} (ባላንስ ያላቸው: {summary['funded']})"
+
+    query = {"balance": {"$gt": 0}} if nonzero else {}
+    cursor = wallets.find(query, {"_id": 0, "phone": 1, "name": 1, "username": 1, "balance": 1})
+    if top_n:
+        cursor = cursor.sort("balance", -1).limit(top_n)
+    cursor = cursor.batch_size(1000)
+
+    if as_csv:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["phone", "name", "balance"])
+        for u in cursor:
+            writer.writerow([u.get("phone", ""), u.get("name", u.get("username", "")), u.get("balance", 0)])
+        telegram_call(
+            "sendDocument",
+            {"chat_id": ADMIN_ID, "caption": footer.strip(), "parse_mode": "Markdown"},
+            files={"document": ("balances.csv", buf.getvalue().encode("utf-8"), "text/csv")}
+        )
+        return
+
+    page = "📋 *የሁሉም ተጠቃሚዎች ባላንስ ዝርዝር:*\n\n"
+    for u in cursor:
+        line = f"📞 `{u.get('phone', 'N/A')}` | 👤 {u.get('name', u.get('username', 'Unknown'))} | 💰 *{u.get('balance', 0)} ETB*\n"
+        if len(page) + len(line) > REPORT_PAGE_CHARS:
+            telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": page, "parse_mode": "Markdown"})
+            page = ""
+        page += line
+    if len(page) + len(footer) > REPORT_PAGE_CHARS:
+        telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": page, "parse_mode": "Markdown"})
+        page = ""
+    telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": page + footer, "parse_mode": "Markdown"})
+
+# 🌟 webhook ወዲያው 200 ይመልሳል፤ ስራው በ chat የተከፋፈሉ worker ዎች ላይ ይሰራል (የአንድ chat ትዕዛዞች በቅደም ተከተል)
+WEBHOOK_WORKERS = 4
+WEBHOOK_ATTEMPTS = 3
+WEBHOOK_RETRY_SECONDS = 2
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+webhook_queues = [Queue() for _ in range(WEBHOOK_WORKERS)]
+webhook_pending = set()
+webhook_workers_started = False
+
+def webhook_chat_id(data):
+    if "message" in data:
+        return str((data["message"].get("chat") or {}).get("id", ""))
+    if "callback_query" in data:
+        return str((((data["callback_query"].get("message") or {}).get("chat")) or {}).get("id", ""))
+    return ""
+
+# 🌟 marker ው update ን ለዚህ worker ይይዛል፤ ስራው ቢወድቅ (handler ዎቹ በ update_id idempotent ናቸው) እዚሁ እንደገና ይሞከራል፣
+# ሙከራዎቹ ካለቁ update ው ወደ webhook_dead_letters ይቀመጣል፣ አድሚኑ ይነገረዋል እና marker ው ይሰረዛል (/replay <update_id>)።
+# Telegram 200 ስላገኘ ራሱ ድጋሚ አይልክም። የሚደገም update ወደ ወረፋው መጨረሻ ስለሚገባ የ chat ቅደም ተከተል አይጠበቅለትም፤
+# ከዚያው chat በኋላ የመጣ update ከሱ በፊት ሊፈጸም ይችላል።
+def webhook_worker(queue):
+    while True:
+        data = queue.get()
+        update_id = data["update_id"]
+        attempt = data.pop("_attempt", 0)
+        try:
+            if attempt:
+                webhook_updates.update_one({"_id": update_id}, {"$setOnInsert": {"ts": time.time()}}, upsert=True)
+            else:
+                webhook_updates.insert_one({"_id": update_id, "ts": time.time()})
+        except DuplicateKeyError:
+            count("bingo_webhook_updates_total", result="duplicate")
+            webhook_pending.discard(update_id)
+            continue
+        except Exception as e:
+            retry_update(queue, data, attempt + 1, e)
+            continue
+        try:
+            process_update(data)
+        except Exception as e:
+            retry_update(queue, data, attempt + 1, e)
+            continue
+        webhook_pending.discard(update_id)
+
+def retry_update(queue, data, attempt, error):
+    update_id = data["update_id"]
+    print(f"Webhook update error ({update_id}, attempt {attempt}): {error}")
+    if attempt < WEBHOOK_ATTEMPTS:
+        data["_attempt"] = attempt
+        gevent.spawn_later(WEBHOOK_RETRY_SECONDS * attempt, queue.put, data)
+        return
+    count("bingo_webhook_updates_total", result="failed")
+    webhook_pending.discard(update_id)
+    try:
+        webhook_dead_letters.insert_one({"_id": update_id, "update": data, "error": str(error), "attempts": attempt, "ts": time.time()})
+    except Exception as e:
+        print(f"Webhook dead letter error ({update_id}): {e}")
+    try:
+        send_telegram(f"⚠️ *Webhook update failed*\n🆔 Update: `{update_id}`\n💬 Chat: `{webhook_chat_id(data)}`\n❌ `{error}`\n\n/replay {update_id}")
+    except Exception as e:
+        print(f"Webhook failure notice error ({update_id}): {e}")
+    try:
+        webhook_updates.delete_one({"_id": update_id})
+    except Exception as e:
+        print(f"Webhook marker cleanup error ({update_id}): {e}")
+
+def replay_update(update_id):
+    dead = webhook_dead_letters.find_one({"_id": update_id})
+    if not dead or not enqueue_update(dead["update"]):
+        return False
+    webhook_dead_letters.delete_one({"_id": update_id})
+    return True
+
+def enqueue_update(data):
+    global webhook_workers_started
+    if not webhook_workers_started:
+        webhook_workers_started = True
+        for queue in webhook_queues:
+            gevent.spawn(webhook_worker, queue)
+    if data["update_id"] in webhook_pending:
+        count("bingo_webhook_updates_total", result="duplicate")
+        return False
+    webhook_pending.add(data["update_id"])
+    webhook_queues[zlib.crc32(webhook_chat_id(data).encode()) % WEBHOOK_WORKERS].put(data)
+    count("bingo_webhook_updates_total", result="queued")
+    return True
+
+# 🌟 የአድሚን ውሳኔ በመልዕክቱ key በዋሌቱ settlements ላይ ይመዘገባል፤ ሁለተኛ ጊዜ ቢመጣ (retry ወይም ድጋሚ መጫን) አይፈጸምም
+# 🌟 ለውጡ በ flush lock ስር ይጻፋል፤ ቅናሽ መጀመሪያ ካሹን ይጽፋል (ካልተሳካ RuntimeError፣ update ው ይደገማል) እና መጠኑን በካሹ ላይ
+# ይይዛል፣ ስለዚህ በዚያው ጊዜ የሚገባ ትኬት ግዢ ያንኑ ገንዘብ መጠቀም አይችልም
+def wallet_apply_once(phone_num, amount, action_key, min_balance=None, upsert=False):
+    with wallet_flush_lock:
+        entry = wallet_get(phone_num) if amount < 0 else wallet_cache.get(phone_num)
+        held = 0
+        if entry is not None and not entry.get("direct") and amount < 0:
+            if not wallet_write_batch():
+                raise RuntimeError(f"wallet flush failed before debiting {phone_num}")
+            if min_balance is not None and wallet_available(entry) < min_balance:
+                return None, wallet_action_applied(phone_num, action_key)
+            held = amount
+            entry["inflight"] += held
+
+        query = {"phone": phone_num, "settlements": {"$ne": action_key}}
+        if min_balance is not None:
+            query["balance"] = {"$gte": min_balance}
+        try:
+            updated = wallets.find_one_and_update(
+                query,
+                {"$inc": {"balance": amount}, "$push": {"settlements": {"$each": [action_key], "$slice": -20}}},
+                return_document=True,
+                upsert=upsert
+            )
+        except DuplicateKeyError:
+            updated = None
+        finally:
+            if held:
+                entry["inflight"] -= held
+        if updated:
+            wallet_sync(phone_num, updated.get("balance", 0))
+            return updated, False
+    return None, wallet_action_applied(phone_num, action_key)
+
+def wallet_action_applied(phone_num, action_key):
+    return wallets.count_documents({"phone": phone_num, "settlements": action_key}, limit=1) > 0
+
 @app.route('/webhook', methods=['POST'])
+@timed_route
 def webhook():
-    data = request.json or {}
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return "Forbidden", 403
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+        return "OK", 200
+    enqueue_update(data)
+    return "OK", 200
+
+@timed_task
+def process_update(data):
     if "message" in data:
         msg = data["message"]
         text = msg.get("text", "")
@@ -198,22 +1214,18 @@ def webhook():
             wallets.update_one({"chat_id": chat_id}, {"$set": {"chat_id": chat_id}}, upsert=False)
         
         if chat_id == str(ADMIN_ID):
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
             if text.startswith("/add "):
                 parts = text.split()
                 if len(parts) >= 3:
                     target_phone = sanitize_input(parts[1])
                     try:
                         add_amt = float(parts[2])
-                        updated = wallets.find_one_and_update(
-                            {"phone": target_phone},
-                            {"$inc": {"balance": add_amt}},
-                            return_document=True,
-                            upsert=True
-                        )
+                        updated, already_done = wallet_apply_once(target_phone, add_amt, f"upd_{data['update_id']}", upsert=True)
+                        if already_done:
+                            updated = wallets.find_one({"phone": target_phone}, {"balance": 1})
                         new_bal = updated.get("balance", 0) if updated else 0
-                        notify_user_balance_update(target_phone, new_bal)
-                        requests.post(url, json={"chat_id": ADMIN_ID, "text": f"✅ የተጠቃሚው ({target_phone}) ባላንስ በ {add_amt} ETB ጨምሯል። አጠቃላይ ባላንስ: {new_bal} ETB"})
+                        notify_wallet_balance(target_phone, new_bal)
+                        telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": f"✅ የተጠቃሚው ({target_phone}) ባላንስ በ {add_amt} ETB ጨምሯል። አጠቃላይ ባላንስ: {new_bal} ETB"})
                     except ValueError:
                         pass
             elif text.startswith("/sub "):
@@ -222,135 +1234,139 @@ def webhook():
                     target_phone = sanitize_input(parts[1])
                     try:
                         sub_amt = float(parts[2])
-                        updated = wallets.find_one_and_update(
-                            {"phone": target_phone},
-                            {"$inc": {"balance": -sub_amt}},
-                            return_document=True
-                        )
+                        updated, already_done = wallet_apply_once(target_phone, -sub_amt, f"upd_{data['update_id']}")
+                        if already_done:
+                            updated = wallets.find_one({"phone": target_phone}, {"balance": 1})
                         if updated:
                             new_bal = updated.get("balance", 0)
-                            notify_user_balance_update(target_phone, new_bal)
-                            requests.post(url, json={"chat_id": ADMIN_ID, "text": f"✅ የተጠቃሚው ({target_phone}) ባላንስ በ {sub_amt} ETB ቀንሷል። አጠቃላይ ባላንስ: {new_bal} ETB"})
+                            notify_wallet_balance(target_phone, new_bal)
+                            telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": f"✅ የተጠቃሚው ({target_phone}) ባላንስ በ {sub_amt} ETB ቀንሷል። አጠቃላይ ባላንስ: {new_bal} ETB"})
                         else:
-                            requests.post(url, json={"chat_id": ADMIN_ID, "text": f"❌ ተጠቃሚ በስልክ ቁጥር ({target_phone}) አልተገኘም!"})
+                            telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": f"❌ ተጠቃሚ በስልክ ቁጥር ({target_phone}) አልተገኘም!"})
                     except ValueError:
                         pass
-            elif text == "/all" or text == "/all_balances":
-                all_users = list(wallets.find({}))
-                if not all_users:
-                    requests.post(url, json={"chat_id": ADMIN_ID, "text": "📭 ምንም የተመዘገበ ተጠቃሚ የለም።"})
-                else:
-                    msg_text = "📋 *የሁሉም ተጠቃሚዎች ባላንስ ዝርዝር:*\n\n"
-                    total_sys_balance = 0
-                    for u in all_users:
-                        u_phone = u.get("phone", "N/A")
-                        u_name = u.get("name", u.get("username", "Unknown"))
-                        u_bal = u.get("balance", 0)
-                        total_sys_balance += u_bal
-                        msg_text += f"📞 `{u_phone}` | 👤 {u_name} | 💰 *{u_bal} ETB*\n"
-                    msg_text += f"\n💵 *አጠቃላይ የሲስተሙ ገንዘብ:* {total_sys_balance} ETB"
-                    requests.post(url, json={"chat_id": ADMIN_ID, "text": msg_text, "parse_mode": "Markdown"})
+            elif text.split()[:1] in (["/all"], ["/all_balances"]):
+                gevent.spawn(send_balance_report, text.split()[1:])
+            elif text.startswith("/replay "):
+                parts = text.split()
+                if len(parts) >= 2:
+                    try:
+                        replayed = replay_update(int(parts[1]))
+                    except ValueError:
+                        replayed = False
+                    telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": f"🔁 Update {parts[1]} እንደገና ተልኳል።" if replayed else f"❌ Update {parts[1]} አልተገኘም!"})
             elif text.startswith("/remove "):
                 parts = text.split()
                 if len(parts) >= 2:
                     target_phone = sanitize_input(parts[1])
                     wallets.delete_one({"phone": target_phone})
-                    requests.post(url, json={"chat_id": ADMIN_ID, "text": f"✅ ተጠቃሚው ({target_phone}) ከዳታቤዙ ተሰርዟል!"})
+                    wallet_cache.pop(target_phone, None)
+                    telegram_call("sendMessage", {"chat_id": ADMIN_ID, "text": f"✅ ተጠቃሚው ({target_phone}) ከዳታቤዙ ተሰርዟል!"})
             elif text.startswith("/broadcast "):
                 broadcast_msg = text.replace("/broadcast ", "", 1)
-                all_users = list(wallets.find({}))
-                if not all_users:
-                    requests.post(url, json={"chat_id": ADMIN_ID, "text": "📭 ምንም የተመዘገበ ተጠቃሚ የለም።"})
-                else:
-                    success_count = 0
-                    fail_count = 0
-                    
-                    # አዝራሮቹ (Inline Buttons) እንዲኖሩ የሚደረግ ማቀናበሪያ
-                    broadcast_markup = {
-                        "inline_keyboard": [
-                            [{"text": "👉 Beshbingo (10ብር)", "url": "https://t.me/beshbingo1bot"}],
-                            [{"text": "👉 Supperbeshbingo (50ብር)", "url": "http://t.me/superbeshbingobot"}]
-                        ]
-                    }
-
-                    for u in all_users:
-                        u_chat_id = u.get("chat_id")
-                        if u_chat_id:
-                            payload = {
-                                "chat_id": u_chat_id, 
-                                "text": broadcast_msg, 
-                                "parse_mode": "Markdown",
-                                "reply_markup": broadcast_markup
-                            }
-                            try:
-                                res = requests.post(url, json=payload, timeout=2)
-                                if res.status_code == 200:
-                                    success_count += 1
-                                else:
-                                    fail_count += 1
-                            except:
-                                fail_count += 1
-                    requests.post(url, json={
-                        "chat_id": ADMIN_ID, 
-                        "text": f"📢 *ብሮድካስት ተጠናቋል!*\n\n✅ የተሳካላቸው: {success_count}\n❌ ያልተሳካላቸው: {fail_count}"
-                    })
+                start_broadcast_job(data.get("update_id"), broadcast_msg)
     elif "callback_query" in data:
         cq = data["callback_query"]
         cq_id = cq["id"]
         chat_id = str(cq["message"]["chat"]["id"])
         data_str = cq.get("data", "")
+        action_key = f"cb_{cq['message']['message_id']}"
         if chat_id == str(ADMIN_ID):
-            answer_url = f"https://api.telegram.org/bot{BOT_TOKEN}/answerCallbackQuery"
-            edit_url = f"https://api.telegram.org/bot{BOT_TOKEN}/editMessageText"
-            
             if data_str.startswith("app_dep_"):
                 _, _, phone_num, amt_str = data_str.split("_", 3)
                 amt = float(amt_str)
-                updated = wallets.find_one_and_update({"phone": phone_num}, {"$inc": {"balance": amt}}, return_document=True, upsert=True)
-                new_bal = updated.get("balance", 0) if updated else 0
-                notify_user_balance_update(phone_num, new_bal)
-                requests.post(answer_url, json={"callback_query_id": cq_id, "text": f"ተሳክቷል! {amt} ETB ገብቷል።"})
-                requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 አጠቃላይ ባላንስ: {new_bal} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                updated, already_done = wallet_apply_once(phone_num, amt, action_key, upsert=True)
+                if not updated:
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ይህ ጥያቄ ቀድሞ ተስተናግዷል።"})
+                    return
+                new_bal = updated.get("balance", 0)
+                notify_wallet_balance(phone_num, new_bal)
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": f"ተሳክቷል! {amt} ETB ገብቷል።"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 አጠቃላይ ባላንስ: {new_bal} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
             
             elif data_str.startswith("rej_dep_"):
                 _, _, phone_num = data_str.split("_", 2)
-                requests.post(answer_url, json={"callback_query_id": cq_id, "text": "ዲፖዚት ጥያቄው ሪጀክት ተደርጓል።"})
-                requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ዲፖዚት ጥያቄው ሪጀክት ተደርጓል።"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
 
             elif data_str.startswith("app_wit_"):
                 _, _, phone_num, amt_str = data_str.split("_", 3)
                 amt = float(amt_str)
-                updated = wallets.find_one_and_update({"phone": phone_num, "balance": {"$gte": amt}}, {"$inc": {"balance": -amt}}, return_document=True)
+                updated, already_done = wallet_apply_once(phone_num, -amt, action_key, min_balance=amt)
+                if already_done:
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ይህ ጥያቄ ቀድሞ ተስተናግዷል።"})
+                    return
                 new_bal = updated.get("balance", 0) if updated else 0
                 if updated:
-                    notify_user_balance_update(phone_num, new_bal)
-                    requests.post(answer_url, json={"callback_query_id": cq_id, "text": f"ዊዝድሮዋል ጸድቋል!"})
-                requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 አጠቃላይ ባላንስ: {new_bal} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                    notify_wallet_balance(phone_num, new_bal)
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": f"ዊዝድሮዋል ጸድቋል!"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 አጠቃላይ ባላንስ: {new_bal} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
             
             elif data_str.startswith("rej_wit_"):
-                requests.post(answer_url, json={"callback_query_id": cq_id, "text": "ዊዝድሮዋል ጥያቄው ሪጀክት ተደርጓል።"})
-                requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ዊዝድሮዋል ጥያቄው ሪጀክት ተደርጓል።"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
 
             elif data_str.startswith("app_trf_"):
                 _, _, sender_ph, receiver_ph, amt_str = data_str.split("_", 4)
                 amt = float(amt_str)
-                sender_updated = wallets.find_one_and_update({"phone": sender_ph, "balance": {"$gte": amt}}, {"$inc": {"balance": -amt}}, return_document=True)
+                sender_updated, already_done = wallet_apply_once(sender_ph, -amt, action_key, min_balance=amt)
+                if already_done:
+                    # 🌟 ላኪው ተቀንሶ ተቀባዩ ሳይጨመር ቢቋረጥ እዚህ ይጠናቀቃል (ለተቀባዩም ተመሳሳይ key)
+                    receiver_updated, _ = wallet_apply_once(receiver_ph, amt, action_key, upsert=True)
+                    if receiver_updated:
+                        notify_wallet_balance(receiver_ph, receiver_updated.get("balance", 0))
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ይህ ጥያቄ ቀድሞ ተስተናግዷል።"})
+                    return
                 if sender_updated:
-                    receiver_updated = wallets.find_one_and_update({"phone": receiver_ph}, {"$inc": {"balance": amt}}, return_document=True, upsert=True)
-                    notify_user_balance_update(sender_ph, sender_updated.get("balance", 0))
+                    receiver_updated, _ = wallet_apply_once(receiver_ph, amt, action_key, upsert=True)
+                    notify_wallet_balance(sender_ph, sender_updated.get("balance", 0))
                     if receiver_updated:
-                        notify_user_balance_update(receiver_ph, receiver_updated.get("balance", 0))
-                    requests.post(answer_url, json={"callback_query_id": cq_id, "text": "የገንዘብ ማስተላለፍ ጥያቄ ጸድቋል!"})
-                    requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 የላኪ አጠቃላይ ባላንስ: {sender_updated.get('balance', 0)} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                        notify_wallet_balance(receiver_ph, receiver_updated.get("balance", 0))
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "የገንዘብ ማስተላለፍ ጥያቄ ጸድቋል!"})
+                    telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED\n💰 የላኪ አጠቃላይ ባላንስ: {sender_updated.get('balance', 0)} ETB", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
             
+            elif data_str.startswith("app_bind_"):
+                _, _, phone_num, bind_chat_id = data_str.split("_", 3)
+                bound = wallets.update_one(
+                    {"phone": phone_num, "bind_chat_id": bind_chat_id},
+                    {"$set": {"chat_id": bind_chat_id, "chat_verified": True}, "$unset": {"bind_chat_id": ""}}
+                )
+                if not bound.modified_count:
+                    telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ይህ ጥያቄ ቀድሞ ተስተናግዷል።"})
+                    return
+                telegram_call("sendMessage", {"chat_id": bind_chat_id, "text": "✅ ዋሌትዎ ከቴሌግራም አካውንትዎ ጋር ተያይዟል። አሁን መግባት ይችላሉ።"})
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ዋሌቱ ተያይዟል!"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n✅ APPROVED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+
+            elif data_str.startswith("rej_bind_"):
+                _, _, phone_num, bind_chat_id = data_str.split("_", 3)
+                wallets.update_one({"phone": phone_num, "bind_chat_id": bind_chat_id}, {"$unset": {"bind_chat_id": ""}})
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "የማያያዝ ጥያቄው ሪጀክት ተደርጓል።"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+
             elif data_str.startswith("rej_trf_"):
-                requests.post(answer_url, json={"callback_query_id": cq_id, "text": "ማስተላለፍ ጥያቄው ሪጀክት ተደርጓል።"})
-                requests.post(edit_url, json={"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
+                telegram_call("answerCallbackQuery", {"callback_query_id": cq_id, "text": "ማስተላለፍ ጥያቄው ሪጀክት ተደርጓል።"})
+                telegram_call("editMessageText", {"chat_id": ADMIN_ID, "message_id": cq["message"]["message_id"], "text": cq["message"]["text"] + f"\n\n❌ REJECTED", "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": []}})
 
-    return "OK", 200
+# 🌟 አንድ የቴሌግራም አካውንት ለአንድ ዋሌት አንድ ጥያቄ ብቻ ወደ አድሚኑ ይልካል (ተደጋጋሚ መግቢያ አያጨናንቅም)
+def request_wallet_binding(phone_num, chat_id, username, balance):
+    requested = wallets.update_one({"phone": phone_num, "bind_chat_id": {"$ne": chat_id}}, {"$set": {"bind_chat_id": chat_id}})
+    if not requested.modified_count:
+        return
+    msg = f"🔗 *Wallet Binding Request*\n📞 Phone: `{phone_num}`\n👤 User: `{username}`\n🆔 Telegram: `{chat_id}`\n💵 Balance: `{balance}` ETB"
+    keyboard = {
+        "inline_keyboard": [
+            [
+                {"text": "✅ አረጋግጥ (Approve)", "callback_data": f"app_bind_{phone_num}_{chat_id}"},
+                {"text": "❌ሰርዝ (Reject)", "callback_data": f"rej_bind_{phone_num}_{chat_id}"}
+            ]
+        ]
+    }
+    send_telegram(msg, reply_markup=keyboard)
 
 # 🌟 የተስተካከለ የምዝገባ እና መግቢያ ሎጂክ ከ chat_id ጋር (ከቴሌግራም ዌብ አፕ ጋር የተገናኘ)
 @app.route('/register_or_login', methods=['POST'])
+@timed_route
 def register_or_login():
     data = request.json or {}
     input_phone = sanitize_input(data.get('phone'))
@@ -362,406 +1378,1139 @@ def register_or_login():
         
     clean_phone = input_phone.replace("+", "").replace(" ", "")
     fallback_name = input_username if input_username else f"User_{clean_phone[-4:]}"
+
+    # 🌟 በተረጋገጠ initData የገባ ስልክ ከዚያ የቴሌግራም አካውንት ጋር ይታሰራል፤ ሌላ አካውንት ያንን ስልክ መጠቀም አይችልም
+    tg_user = verify_init_data(data.get('init_data'))
+    if REQUIRE_INIT_DATA and not tg_user:
+        return jsonify({"success": False, "msg": "እባክዎ በቴሌግራም በኩል ይግቡ!"}), 401
+    verified_chat_id = str(tg_user["id"]) if tg_user else None
+    current = wallets.find_one({"phone": clean_phone}, {"chat_id": 1, "chat_verified": 1, "balance": 1}) or {}
+    known_chat_id = str(current.get("chat_id") or "")
+    entry = wallet_cache.get(clean_phone)
+    funded = current.get("balance", 0) > 0 or (entry is not None and wallet_available(entry) > 0)
+    # 🌟 ዋሌቱ chat_id ካለው የሚታሰረው ያው የቴሌግራም አካውንት ሲሆን ብቻ ነው፤ ያልተረጋገጠ መግቢያ የታሰረ ዋሌት አይነካም
+    if (verified_chat_id and known_chat_id and known_chat_id != verified_chat_id) or \
+            (not verified_chat_id and current.get("chat_verified")):
+        return jsonify({"success": False, "msg": "ይህ ስልክ ቁጥር በሌላ የቴሌግራም አካውንት ተመዝግቧል!"}), 403
+    # 🌟 ገንዘብ ያለው ዋሌት chat_id ከሌለው ስልኩን የሚያውቅ ሁሉ እንዳይወስደው አድሚኑ ሲያረጋግጥ ብቻ ይታሰራል
+    if verified_chat_id and not known_chat_id and funded:
+        request_wallet_binding(clean_phone, verified_chat_id, fallback_name, current.get("balance", 0))
+        return jsonify({"success": False, "msg": "ይህ ዋሌት ገንዘብ አለው፤ አድሚኑ ሲያረጋግጥ በቴሌግራም መልእክት ይደርስዎታል።", "pending": True}), 403
     
     update_data = {
         "username": fallback_name, 
         "name": fallback_name
     }
     
-    if input_chat_id:
+    update_doc = {
+        "$set": update_data, 
+        "$setOnInsert": {
+            "balance": 0
+        }
+    }
+    if verified_chat_id:
+        update_data["chat_id"] = verified_chat_id
+        update_data["chat_verified"] = True
+        # 🌟 በቀጥታ የታሰረ ዋሌት ላይ የቆየ የማያያዝ ጥያቄ በኋላ በአድሚኑ ቢጸድቅ chat_id ውን እንዳይቀይር ይሰረዛል
+        update_doc["$unset"] = {"bind_chat_id": ""}
+    elif input_chat_id and not known_chat_id and not funded:
         update_data["chat_id"] = input_chat_id
 
-    wallets.update_one(
-        {"phone": clean_phone},
-        {
-            "$set": update_data, 
-            "$setOnInsert": {
-                "balance": 0
-            }
-        },
-        upsert=True
-    )
+    wallets.update_one({"phone": clean_phone}, update_doc, upsert=True)
     
     existing = wallets.find_one({"phone": clean_phone})
     return jsonify({
         "success": True, 
-        "balance": existing.get("balance", 0) if existing else 0,
-        "username": existing.get("username", fallback_name)
+        "balance": wallet_available(entry) if entry else (existing.get("balance", 0) if existing else 0),
+        "username": existing.get("username", fallback_name),
+        "phone": clean_phone,
+        "token": issue_session(clean_phone, verified_chat_id)
     })
 
-def check_winning_line(card, drawn_numbers, player_marked_numbers=None):
-    drawn_set = set()
-    for b in drawn_numbers:
-        if len(b) > 1:
-            try:
-                drawn_set.add(int(b[1:]))
-            except ValueError:
-                pass
-    drawn_set.add(0) 
-    marked_set = set(player_marked_numbers) if player_marked_numbers is not None else None
-
-    def is_hit(idx):
-        val = card[idx]
-        if idx == 12 or val == 0 or val == "Besh" or val == "★":
-            return True
+WIN_LINES = (
+    [(f"ረድፍ {i+1}", [i*5 + j for j in range(5)]) for i in range(5)] +
+    [(f"አምድ {j+1}", [j + i*5 for i in range(5)]) for j in range(5)] +
+    [("ዲያጎናል ↘", [0, 6, 12, 18, 24]),
+     ("ዲያጎናል ↙", [4, 8, 12, 16, 20]),
+     ("ኮርነር (4 ማዕዘኖች)", [0, 4, 20, 24])]
+)
+LINE_MATRIX = np.zeros((25, len(WIN_LINES)), dtype=np.uint8)
+for _li, (_, _indices) in enumerate(WIN_LINES):
+    LINE_MATRIX[_indices, _li] = 1
+LINE_LENGTHS = LINE_MATRIX.sum(axis=0)
+FREE_CELLS = np.zeros(25, dtype=bool)
+FREE_CELLS[12] = True
+
+# 🌟 ሁሉም ካርቴላዎች በአንድ (n_cards x 25) uint8 ማትሪክስ ውስጥ፤ ticket -> row
+def engine_new(capacity=64):
+    return {
+        "cards": np.zeros((capacity, 25), dtype=np.uint8),
+        "marked": np.zeros((capacity, 25), dtype=bool),
+        "won": np.zeros(capacity, dtype=bool),
+        "tickets": [],
+        "rows": {},
+        "drawn": np.zeros(76, dtype=bool)
+    }
+
+def engine_add_card(card_store, t_num, card):
+    row = len(card_store["tickets"])
+    if row == len(card_store["cards"]):
+        for key in ("cards", "marked", "won"):
+            old = card_store[key]
+            card_store[key] = np.zeros((len(old) * 2,) + old.shape[1:], dtype=old.dtype)
+            card_store[key][:row] = old
+    cells = np.asarray(card, dtype=np.uint8)
+    card_store["cards"][row] = cells
+    card_store["marked"][row] = FREE_CELLS | card_store["drawn"][cells]
+    card_store["won"][row] = ((card_store["marked"][row] @ LINE_MATRIX) == LINE_LENGTHS).any()
+    card_store["tickets"].append(t_num)
+    card_store["rows"][t_num] = row
+
+def engine_remove_card(card_store, t_num):
+    row = card_store["rows"].pop(t_num, None)
+    if row is None:
+        return
+    last = len(card_store["tickets"]) - 1
+    if row != last:
+        for key in ("cards", "marked", "won"):
+            card_store[key][row] = card_store[key][last]
+        moved = card_store["tickets"][last]
+        card_store["tickets"][row] = moved
+        card_store["rows"][moved] = row
+    card_store["tickets"].pop()
+
+def engine_mark_ball(card_store, ball):
+    num = int(ball[1:])
+    card_store["drawn"][num] = True
+    n = len(card_store["tickets"])
+    hit = card_store["cards"][:n] == num
+    card_store["marked"][:n] |= hit
+    rows = np.flatnonzero(hit.any(axis=1))
+    if not len(rows):
+        return []
+    won_now = ((card_store["marked"][rows].astype(np.uint8) @ LINE_MATRIX) == LINE_LENGTHS).any(axis=1)
+    newly = rows[won_now & ~card_store["won"][rows]]
+    card_store["won"][rows] |= won_now
+    return [card_store["tickets"][r] for r in newly]
+
+def engine_card_win(card_store, t_num):
+    row = card_store["rows"].get(t_num)
+    if row is None or not card_store["won"][row]:
+        return None, None
+    won = np.flatnonzero((card_store["marked"][row].astype(np.uint8) @ LINE_MATRIX) == LINE_LENGTHS)
+    indices = np.flatnonzero(LINE_MATRIX[:, won].any(axis=1))
+    return [int(idx) for idx in indices], " + ".join(WIN_LINES[li][0] for li in won)
+
+# 🌟 settle_key በዋሌቱ ላይ ስለሚቀመጥ ተመሳሳዩ ክፍያ በድጋሚ ቢሞከር ሁለት ጊዜ አይከፈልም
+@timed_task
+def apply_wallet_credits(credits, settle_key, attempts=3):
+    if not credits:
+        return {}
+    ops = [
+        UpdateOne(
+            {"phone": phone_num, "settlements": {"$ne": settle_key}},
+            {"$inc": {"balance": amount}, "$push": {"settlements": {"$each": [settle_key], "$slice": -20}}}
+        )
+        for phone_num, amount in credits.items()
+    ]
+    for attempt in range(attempts):
+        try:
+            wallets.bulk_write(ops, ordered=True)
+            break
+        except Exception as e:
+            print(f"Wallet bulk write error ({settle_key}, attempt {attempt + 1}): {e}")
+            if attempt + 1 < attempts:
+                socketio.sleep(0.2 * (attempt + 1))
+    else:
+        return None
+
+    # 🌟 ማንበቡ እና ካሹን ማስተካከሉ በ flush lock ስር ነው፤ አለበለዚያ በመሀል የገባ flush በአሮጌው ባላንስ ይተካል
+    with wallet_flush_lock:
+        try:
+            balances = {
+                u["phone"]: u.get("balance", 0)
+                for u in wallets.find({"phone": {"$in": list(credits)}}, {"phone": 1, "balance": 1})
+            }
+        except Exception as e:
+            print(f"Wallet balance read error ({settle_key}): {e}")
+            for phone_num in credits:
+                if phone_num in wallet_cache:
+                    wallet_cache[phone_num]["stale"] = True
+            return {}
+        for phone_num, new_balance in balances.items():
+            wallet_sync(phone_num, new_balance)
+    for phone_num, new_balance in balances.items():
+        notify_wallet_balance(phone_num, new_balance)
+    return balances
+
+# 🌟 ያልተሳካ ክፍያ አይጣልም፤ flusher በተመሳሳዩ settle_key እስኪሳካ ይሞክራል፣ የዙሩ ጆርናልም እስከዚያ ክፍት ይቆያል
+# journaled=False ማለት የ payout ክስተቱ ገና ወደ ጆርናሉ አልተጻፈም፤ ክፍያው የሚፈጸመው ጆርናሉ ከተጻፈ በኋላ ብቻ ነው
+SETTLEMENT_RETRY_SECONDS = 5
+pending_settlements = {}
+
+def settle_or_queue(credits, settle_key, round_id=None, journaled=True):
+    if journaled and apply_wallet_credits(credits, settle_key) is not None:
+        return True
+    pending_settlements[settle_key] = {
+        "credits": credits, "round_id": round_id, "journaled": journaled,
+        "retry_at": time.monotonic() + SETTLEMENT_RETRY_SECONDS
+    }
+    print(f"Settlement {settle_key} queued for retry")
+    return False
+
+def round_settling(round_id):
+    return any(item["round_id"] == round_id for item in pending_settlements.values())
+
+def retry_settlements():
+    now = time.monotonic()
+    for settle_key, item in list(pending_settlements.items()):
+        if item["retry_at"] > now:
+            continue
+        if not item["journaled"]:
+            if not journal_sync():
+                item["retry_at"] = now + SETTLEMENT_RETRY_SECONDS
+                continue
+            item["journaled"] = True
+        if apply_wallet_credits(item["credits"], settle_key, attempts=1) is None:
+            item["retry_at"] = now + SETTLEMENT_RETRY_SECONDS
+            continue
+        pending_settlements.pop(settle_key, None)
+        print(f"Settlement {settle_key} applied on retry")
+        if item["round_id"] and not round_settling(item["round_id"]):
+            journal_buffer.append({"_id": f"{item['round_id']}:closed", "round_id": item["round_id"], "type": "round_closed", "ts": time.time()})
+
+TICKET_COUNT = 500
+
+def ticket_slot(value):
+    try:
+        slot = int(value)
+    except (TypeError, ValueError):
+        return None
+    return slot if 1 <= slot <= TICKET_COUNT else None
+
+BALLS = [f"{'BINGO'[i//15]}{i+1}" for i in range(75)]
+LOBBY_SECONDS = 30
+PREP_SECONDS = 3
+BALL_INTERVAL = 3.5
+RESULT_SECONDS = 10
+HOUSE_RESULT_SECONDS = 5
+
+# 🌟 እያንዳንዱ የትኬት ቁጥር ከ CARD_SEED የሚወጣ ቋሚ ካርቴላ አለው፤ ክላየንቱ አንድ ጊዜ አውርዶ ያስቀምጠዋል
+def build_card_pool(seed, count):
+    pool = np.zeros((count + 1, 25), dtype=np.uint8)
+    for slot in range(1, count + 1):
+        rng = random.Random(f"{seed}:{slot}")
+        columns = [rng.sample(range(r[0], r[1]+1), 5) for r in [(1,15), (16,30), (31,45), (46,60), (61,75)]]
+        pool[slot] = [columns[c][r] for r in range(5) for c in range(5)]
+        pool[slot][12] = 0
+    return pool
+
+CARD_POOL = build_card_pool(CARD_SEED, TICKET_COUNT)
+CARD_POOL_BYTES = None
+
+def pool_card(slot):
+    return CARD_POOL[int(slot)].tolist()
+
+# 🌟 የኳሶቹ ቅደም ተከተል ከዙሩ seed ይወጣል፤ seed_hash ቀድሞ ይታወቃል፣ seed ራሱ ዙሩ ሲያልቅ ይገለጣል
+def round_draw_order(round_seed):
+    order = BALLS.copy()
+    random.Random(round_seed).shuffle(order)
+    return order
+
+def replay_round(round_seed, slots):
+    card_store = engine_new()
+    for slot in slots:
+        engine_add_card(card_store, str(slot), pool_card(slot))
+    order = round_draw_order(round_seed)
+    for n, ball in enumerate(order, 1):
+        winners = engine_mark_ball(card_store, ball)
+        if winners:
+            return order[:n], winners
+    return order, []
+
+def new_round_state():
+    round_seed = secrets.token_hex(16)
+    return {
+        "round_id": uuid.uuid4().hex[:12],
+        "seed": round_seed, "seed_hash": hashlib.sha256(round_seed.encode()).hexdigest(),
+        "status": "lobby", "winner": None, "winning_card": None, "winning_ticket_num": None,
+        "winning_indices": None, "winning_line_name": None, "pot": 0, "players": {},
+        "sold_tickets": {}, "drawn_balls": [], "current_ball": "--", "timer": LOBBY_SECONDS, "ball_timer": PREP_SECONDS,
+        "deadline": None
+    }
+
+# 🌟 እያንዳንዱ አዳራሽ (hall) የራሱ ስቴት፣ game loop፣ የካርቴላ ዋጋ እና Socket.IO room አለው
+class GameRoom:
+    def __init__(self, room_id, stake):
+        self.room_id = room_id
+        self.stake = stake
+        self.sio_room = f"hall_{room_id}"
+        self.wire_rooms = {wire: f"hall_{room_id}_{wire}" for wire in WIRE_FORMATS}
+        self.state = new_round_state()
+        self.cards = engine_new()
+        self.seq = 0
+        self.snapshot_cache = {"seq": None}
+        self.loop_started = False
+        self.deadline = time.monotonic()
+        self.round_winners = set()
+        self.win_timing = None
+        self.ticket_holds = bytearray(TICKET_COUNT + 1)
+        self.journal_n = 0
+
+    def build_snapshot(self):
+        game_state = self.state
+        return {
+            "type": "snapshot",
+            "seq": self.seq,
+            "room": self.room_id,
+            "round_id": game_state["round_id"],
+            "card_seed": CARD_SEED,
+            "seed_hash": game_state["seed_hash"],
+            "round_seed": game_state["seed"] if game_state["status"] == "result" else None,
+            "stake": self.stake,
+            "status": game_state["status"],
+            "timer": game_state["timer"],
+            "ball_timer": game_state["ball_timer"],
+            "deadline": game_state["deadline"],
+            "pot": game_state["pot"],
+            "sold_tickets": game_state["sold_tickets"],
+            "current_ball": game_state["current_ball"],
+            "drawn_balls": game_state["drawn_balls"],
+            "winner": game_state["winner"],
+            "winning_card": game_state["winning_card"],
+            "winning_ticket_num": game_state["winning_ticket_num"],
+            "winning_indices": game_state.get("winning_indices"),
+            "winning_line_name": game_state.get("winning_line_name"),
+            "active_players": len(game_state["players"])
+        }
+
+    def state_bytes(self, kind="snapshot", wire="json"):
+        if self.snapshot_cache["seq"] != self.seq:
+            self.snapshot_cache = {"seq": self.seq}
+        cache_key = kind if wire == "json" else f"{kind}:{wire}"
+        if cache_key not in self.snapshot_cache:
+            payload = self.build_snapshot()
+            if kind == "status":
+                payload["players"] = {k: {"username": v.get("username", ""), "cards": list(v.get("cards", {}).values())} for k, v in self.state["players"].items()}
+            self.snapshot_cache[cache_key] = encode_wire(payload, wire)
+        return self.snapshot_cache[cache_key]
+
+    # 🌟 binary snapshot ውስጥ ስልክ ስለሌለ የራሱ ትኬቶች ለብቻው እንደ ሁለተኛ argument ይላካሉ
+    def my_tickets(self, phone_num):
+        owner = balance_room(phone_num)
+        if not owner:
+            return []
+        return [int(t_num) for t_num, p in self.state["sold_tickets"].items() if balance_room(p) == owner]
+
+    def send_snapshot(self, phone_num, wire):
+        if wire == "json":
+            emit('game_update', self.state_bytes())
+        else:
+            emit('game_update', (self.state_bytes("snapshot", wire), self.my_tickets(phone_num)))
+
+    # 🌟 ትናንሽ delta ዎች ለሁሉም JSON ሆነው ይሄዳሉ (binary attachment ከራሳቸው ይበልጣል)፤ snapshot ግን በየ format ይላካል
+    def broadcast_state(self):
+        self.seq += 1
+        for wire, wire_room in self.wire_rooms.items():
+            payload = self.state_bytes("snapshot", wire)
+            observe("bingo_broadcast_bytes", len(payload), kind="snapshot", wire=wire)
+            with timed("bingo_emit_seconds", kind="snapshot"):
+                socketio.emit('game_update', payload, to=wire_room)
+        self.publish_shared()
+
+    def broadcast_delta(self, kind, **fields):
+        self.seq += 1
+        fields["type"] = kind
+        fields["seq"] = self.seq
+        observe("bingo_broadcast_bytes", len(encode_json(fields)), kind=kind)
+        with timed("bingo_emit_seconds", kind=kind):
+            socketio.emit('game_update', fields, to=self.sio_room)
+        self.publish_shared()
+
+    def key(self, name):
+        return f"bingo:{self.room_id}:{name}"
+
+    # 🌟 መሪው (leader) ስቴቱን በ Redis ያስቀምጣል፤ ሌሎች worker ዎች seq ሲቀየር ብቻ ያነቡታል
+    def publish_shared(self):
+        if shared is None or not is_leader:
+            return
+        try:
+            shared.mset({self.key("seq"): self.seq, self.key("snapshot"): self.state_bytes("status")})
+        except Exception as e:
+            print(f"Shared state publish error ({self.room_id}): {e}")
+
+    # 🌟 seed ው ከ phase ጋር ይቀመጣል፤ አዲሱ መሪ lobby ላይ ያለውን ዙር ሲረከብ seed_hash አይቀየርም
+    def set_phase(self, phase):
+        if shared is None:
+            return
+        try:
+            shared.mset({self.key("phase"): f"{phase}:{self.state['round_id']}", self.key("seed"): self.state["seed"]})
+        except Exception as e:
+            print(f"Shared phase error ({self.room_id}): {e}")
+
+    def sync_from_shared(self):
+        if shared is None or is_leader:
+            return
         try:
-            val_int = int(val)
-            if marked_set is not None:
-                return (val_int in drawn_set) and (val_int in marked_set)
-            return val_int in drawn_set
-        except:
+            seq = shared.get(self.key("seq"))
+            if seq is None or int(seq) == self.seq:
+                return
+            body = shared.get(self.key("snapshot"))
+        except Exception as e:
+            print(f"Shared state read error ({self.room_id}): {e}")
+            return
+        if not body:
+            return
+        snap = json.loads(body)
+        players = {}
+        for t_num, phone_num in snap["sold_tickets"].items():
+            username = snap["players"].get(phone_num, {}).get("username", "")
+            players.setdefault(phone_num, {"cards": {}, "username": username})["cards"][t_num] = pool_card(t_num)
+        for field in ("round_id", "status", "timer", "ball_timer", "deadline", "pot", "sold_tickets", "current_ball", "drawn_balls",
+                      "winner", "winning_card", "winning_ticket_num", "winning_indices", "winning_line_name"):
+            self.state[field] = snap.get(field)
+        self.state["players"] = players
+        self.seq = snap["seq"]
+        self.snapshot_cache = {"seq": self.seq, "status": body, "snapshot": body}
+
+    def journal(self, kind, **fields):
+        self.journal_n += 1
+        fields.update({
+            "_id": f"{self.state['round_id']}:{self.journal_n:05d}", "room": self.room_id,
+            "round_id": self.state["round_id"], "n": self.journal_n, "type": kind, "ts": time.time()
+        })
+        journal_buffer.append(fields)
+
+    def open_journal(self):
+        self.journal_n = 0
+        self.journal("round_started", open=True, seed=self.state["seed"], stake=self.stake)
+
+    def adopt_round(self, round_id, tickets, seed=None, journal_n=0):
+        self.cards = engine_new()
+        self.state.update(new_round_state())
+        self.state["round_id"] = round_id
+        if seed:
+            self.state["seed"] = seed
+            self.state["seed_hash"] = hashlib.sha256(seed.encode()).hexdigest()
+        self.journal_n = journal_n
+        for t_num, ticket in tickets.items():
+            self.add_ticket(t_num, ticket["phone"], ticket["username"], pool_card(t_num), announce=False)
+        self.broadcast_state()
+
+    # 🌟 ክፍያ በሂደት ላይ እያለ ትኬቱ በ bitmap ይያዛል፤ ሁለት ግዢ አንድን ትኬት በአንድ ጊዜ መክፈል አይችሉም
+    def hold_ticket(self, slot):
+        if self.ticket_holds[slot] or str(slot) in self.state["sold_tickets"]:
             return False
+        self.ticket_holds[slot] = 1
+        return True
 
-    all_win_indices = set()
-    line_types = []
-    for i in range(5):
-        row_indices = [i*5 + j for j in range(5)]
-        if all(is_hit(idx) for idx in row_indices):
-            all_win_indices.update(row_indices)
-            line_types.append(f"ረድፍ {i+1}")
-    for j in range(5):
-        col_indices = [j + i*5 for i in range(5)]
-        if all(is_hit(idx) for idx in col_indices):
-            all_win_indices.update(col_indices)
-            line_types.append(f"አምድ {j+1}")
-    diag1_indices = [0, 6, 12, 18, 24]
-    if all(is_hit(idx) for idx in diag1_indices):
-        all_win_indices.update(diag1_indices)
-        line_types.append("ዲያጎናል ↘")
-    diag2_indices = [4, 8, 12, 16, 20]
-    if all(is_hit(idx) for idx in diag2_indices):
-        all_win_indices.update(diag2_indices)
-        line_types.append("ዲያጎናል ↙")
-    corner_indices = [0, 4, 20, 24]
-    if all(is_hit(idx) for idx in corner_indices):
-        all_win_indices.update(corner_indices)
-        line_types.append("ኮርነር (4 ማዕዘኖች)")
-
-    if all_win_indices:
-        return list(all_win_indices), " + ".join(line_types)
-    return None, None
-
-def refund_all_sold_tickets():
-    for t_num, phone_num in list(game_state["sold_tickets"].items()):
-        updated_user = wallets.find_one_and_update({"phone": phone_num}, {"$inc": {"balance": 10}}, return_document=True)
-        if updated_user:
-            notify_user_balance_update(phone_num, updated_user.get("balance", 0))
-
-def reset_game():
-    global reset_task_reference, claim_lock_active, pending_claims
-    reset_task_reference = None
-    claim_lock_active = False
-    pending_claims = []
-    game_state.update({
-        "status": "lobby", "winner": None, "winning_card": None, "winning_ticket_num": None, 
-        "winning_indices": None, "winning_line_name": None, "pot": 0, "players": {}, 
-        "sold_tickets": {}, "drawn_balls": [], "current_ball": "--", "timer": 30, "ball_timer": 2, "all_cards": {}
-    })
-    broadcast_game_state() 
+    def release_hold(self, slot):
+        self.ticket_holds[slot] = 0
+
+    def add_ticket(self, t_num, db_phone, username, flat, announce=True):
+        game_state = self.state
+        game_state["sold_tickets"][t_num] = db_phone
+        game_state["pot"] += self.stake
+        engine_add_card(self.cards, t_num, flat)
+        if db_phone not in game_state["players"]:
+            game_state["players"][db_phone] = {"cards": {t_num: flat}, "username": username}
+        else:
+            game_state["players"][db_phone]["cards"][t_num] = flat
+        if announce:
+            self.journal("ticket_sold", ticket=t_num, phone=db_phone, username=username)
+            gevent.spawn(self.broadcast_delta, "ticket_sold", ticket=t_num, phone=db_phone,
+                         pot=game_state["pot"], active_players=len(game_state["players"]))
+
+    def remove_ticket(self, t_num, db_phone, announce=True):
+        game_state = self.state
+        game_state["pot"] -= self.stake
+        del game_state["sold_tickets"][t_num]
+        engine_remove_card(self.cards, t_num)
+        if db_phone in game_state["players"]:
+            game_state["players"][db_phone]["cards"].pop(t_num, None)
+            if not game_state["players"][db_phone]["cards"]: 
+                game_state["players"].pop(db_phone, None)
+        if announce:
+            self.journal("ticket_cancelled", ticket=t_num, phone=db_phone)
+            gevent.spawn(self.broadcast_delta, "ticket_cancelled", ticket=t_num,
+                         pot=game_state["pot"], active_players=len(game_state["players"]))
+
+    # 🌟 ሌሎች worker ዎች የሸጡት ትኬት ጨዋታው ከመጀመሩ በፊት ከ Redis hash ጋር ይመሳሰላል
+    def reconcile_shared_tickets(self):
+        if shared is None:
+            return
+        try:
+            raw_tickets = shared.hgetall(self.key(f"tickets:{self.state['round_id']}"))
+        except Exception as e:
+            print(f"Shared tickets read error ({self.room_id}): {e}")
+            return
+        tickets = {t_num.decode(): json.loads(raw) for t_num, raw in raw_tickets.items()}
+        changed = False
+        for t_num, ticket in tickets.items():
+            if t_num not in self.state["sold_tickets"]:
+                self.add_ticket(t_num, ticket["phone"], ticket["username"], pool_card(t_num), announce=False)
+                self.journal("ticket_sold", ticket=t_num, phone=ticket["phone"], username=ticket["username"])
+                changed = True
+        for t_num, phone_num in list(self.state["sold_tickets"].items()):
+            if t_num not in tickets:
+                self.remove_ticket(t_num, phone_num, announce=False)
+                self.journal("ticket_cancelled", ticket=t_num, phone=phone_num)
+                changed = True
+        if changed:
+            self.broadcast_state()
+
+    def apply_event(self, event):
+        kind = event.get("type")
+        if kind == "claim":
+            result = self.claim(event["phone"])
+            shared.rpush(event["reply"], json.dumps(result))
+            shared.expire(event["reply"], 30)
+            return
+        if event.get("round_id") != self.state["round_id"] or self.state["status"] != "lobby":
+            return
+        t_num = event.get("ticket")
+        if kind == "ticket_sold" and t_num not in self.state["sold_tickets"]:
+            self.add_ticket(t_num, event["phone"], event["username"], pool_card(t_num))
+        elif kind == "ticket_cancelled" and self.state["sold_tickets"].get(t_num) == event["phone"]:
+            self.remove_ticket(t_num, event["phone"])
+
+    # 🌟 ክፍያው ከመፈጸሙ በፊት በ Redis ይመዘገባል፤ መሪው ቢሞት አዲሱ መሪ በተመሳሳይ settle_key ይጨርሰዋል
+    def settle(self, credits, kind):
+        settlement = {"key": f"{self.state['round_id']}:{kind}", "credits": credits}
+        if shared is not None:
+            try:
+                shared.set(self.key("settlement"), json.dumps(settlement))
+            except Exception as e:
+                print(f"Shared settlement record error ({settlement['key']}): {e}")
+            self.set_phase("settling")
+        self.journal("payout", key=settlement["key"], credits=credits)
+        if not settle_or_queue(credits, settlement["key"], self.state["round_id"], journaled=journal_sync()):
+            return
+        if shared is not None:
+            self.set_phase("done")
+            try:
+                shared.delete(self.key("settlement"))
+            except Exception as e:
+                print(f"Shared settlement clear error ({settlement['key']}): {e}")
+
+    def take_over(self):
+        try:
+            phase, _, round_id = (shared.get(self.key("phase")) or b"").decode().partition(":")
+            seed = (shared.get(self.key("seed")) or b"").decode() or None
+            pending = shared.get(self.key("settlement"))
+            raw_tickets = shared.hgetall(self.key(f"tickets:{round_id}")) if round_id else {}
+            self.seq = max(self.seq, int(shared.get(self.key("seq")) or 0))
+        except Exception as e:
+            print(f"Shared takeover read error ({self.room_id}): {e}")
+            phase, round_id, seed, pending, raw_tickets = "", "", None, None, {}
+        tickets = {t_num.decode(): json.loads(raw) for t_num, raw in raw_tickets.items()}
+
+        if pending:
+            settlement = json.loads(pending)
+            if settle_or_queue(settlement["credits"], settlement["key"]):
+                shared.delete(self.key("settlement"))
+        elif phase == "playing":
+            credits = {}
+            for ticket in tickets.values():
+                credits[ticket["phone"]] = credits.get(ticket["phone"], 0) + self.stake
+            settle_or_queue(credits, f"{round_id}:refund")
+        elif phase == "lobby":
+            self.adopt_round(round_id, tickets, seed=seed, journal_n=round_journal.count_documents({"round_id": round_id}))
+            return
+        self.reset()
+
+    def broadcast_result(self):
+        game_state = self.state
+        self.broadcast_delta(
+            "result",
+            status=game_state["status"],
+            timer=game_state["timer"],
+            deadline=game_state["deadline"],
+            winner=game_state["winner"],
+            winning_card=game_state["winning_card"],
+            winning_ticket_num=game_state["winning_ticket_num"],
+            winning_indices=game_state.get("winning_indices"),
+            winning_line_name=game_state.get("winning_line_name"),
+            round_id=game_state["round_id"],
+            round_seed=game_state["seed"]
+        )
+
+    def refund_all_sold_tickets(self):
+        credits = {}
+        for t_num, phone_num in list(self.state["sold_tickets"].items()):
+            credits[phone_num] = credits.get(phone_num, 0) + self.stake
+        self.settle(credits, "refund")
+
+    def reset(self):
+        self.round_winners = set()
+        self.cards = engine_new()
+        if self.journal_n and not round_settling(self.state["round_id"]):
+            self.journal("round_closed")
+        wallet_flush()
+        wallet_trim()
+        self.state.update(new_round_state())
+        self.open_journal()
+        self.set_phase("lobby")
+        self.broadcast_state()
+
+    def start(self):
+        if not self.loop_started:
+            self.loop_started = True
+            if self.journal_n == 0:
+                self.open_journal()
+            socketio.start_background_task(self.loop)
+
+    # 🌟 deadline በ epoch ms ለክላየንቶች ይላካል፤ ቆጠራውን ራሳቸው ስለሚያሰሉ በየሰከንዱ timer አይላክም
+    def set_deadline(self, seconds):
+        self.deadline = time.monotonic() + seconds
+        self.state["deadline"] = int((time.time() + seconds) * 1000)
+        return self.deadline
+
+    def loop(self):
+        game_state = self.state
+        while True:
+            if not is_leader:
+                self.loop_started = False
+                return
+            current_status = game_state["status"]
+            if current_status == "lobby":
+                game_state["timer"] = LOBBY_SECONDS
+                lobby_deadline = self.set_deadline(LOBBY_SECONDS)
+                self.broadcast_delta("timer", timer=LOBBY_SECONDS, deadline=game_state["deadline"])
+                sleep_until(lobby_deadline, "game")
+                if game_state["status"] != "lobby" or not is_leader:
+                    continue
+
+                self.set_phase("playing")
+                self.reconcile_shared_tickets()
+                if len(game_state["players"]) < 2:
+                    self.set_phase("lobby")
+                    continue
 
-def game_loop():
-    balls = [f"{'BINGO'[i//15]}{i+1}" for i in range(75)]
-    while True:
-        current_status = game_state["status"]
-        if current_status == "lobby":
-            for i in range(30, -1, -1):
-                if game_state["status"] != "lobby": 
-                    break
-                game_state["timer"] = i
-                broadcast_game_state() 
-                socketio.sleep(1) 
-            
-            if game_state["status"] == "lobby" and len(game_state["players"]) >= 2:
                 game_state["status"] = "playing"
+                self.journal("playing")
+                wallet_flush()
                 game_state["drawn_balls"] = []
-                game_state["ball_timer"] = 2
-                shuffled = balls.copy()
-                random.shuffle(shuffled)
-                broadcast_game_state()
-            else:
-                game_state["timer"] = 30
-                broadcast_game_state()
-                continue
-
-            if shuffled:
-                for j in range(2, -1, -1):
-                    if game_state["status"] != "playing":
-                        break
-                    game_state["ball_timer"] = j
-                    broadcast_game_state() 
-                    socketio.sleep(1)
+                game_state["ball_timer"] = PREP_SECONDS
+                next_ball_at = self.set_deadline(PREP_SECONDS)
+                self.broadcast_delta("status", status="playing", ball_timer=PREP_SECONDS, deadline=game_state["deadline"],
+                                     drawn_balls=[], current_ball=game_state["current_ball"])
 
-                for b in shuffled:
-                    if game_state["status"] != "playing": 
+                for b in round_draw_order(game_state["seed"]):
+                    sleep_until(next_ball_at, "game")
+                    if game_state["status"] != "playing" or not is_leader:
                         break
                     if len(game_state["players"]) < 2:
                         game_state["status"] = "result"
                         game_state["winner"] = "No Winner (Insufficient Players)"
-                        refund_all_sold_tickets()
+                        game_state["timer"] = HOUSE_RESULT_SECONDS
+                        self.set_deadline(HOUSE_RESULT_SECONDS)
+                        self.broadcast_result()
+                        self.refund_all_sold_tickets()
                         break
 
+                    game_state["ball_timer"] = 0
                     game_state["current_ball"] = b
                     game_state["drawn_balls"].append(b)
-                    broadcast_game_state() 
-                    socketio.sleep(3.5) 
-            
-            if game_state["status"] == "playing":
-                game_state["status"] = "result"
-                game_state["winner"] = "No Winner (House)"
-                refund_all_sold_tickets()
-                def house_countdown_and_reset():
-                    for t in range(5, -1, -1):
-                        if game_state["status"] != "result":
-                            return
-                        game_state["timer"] = t
-                        broadcast_game_state()
-                        socketio.sleep(1)
-                    reset_game()
-                global reset_task_reference
-                reset_task_reference = socketio.start_background_task(house_countdown_and_reset)
-            broadcast_game_state()
-        socketio.sleep(1)
+                    drawn_at = time.monotonic()
+                    winning_tickets = engine_mark_ball(self.cards, b)
+                    self.journal("ball", ball=b)
+                    self.broadcast_delta("ball", ball=b, count=len(game_state["drawn_balls"]))
+                    if winning_tickets and self.settle_winners(winning_tickets, b, drawn_at):
+                        break
+                    next_ball_at += BALL_INTERVAL
+
+                if game_state["status"] == "playing":
+                    game_state["status"] = "result"
+                    game_state["winner"] = "No Winner (House)"
+                    game_state["timer"] = HOUSE_RESULT_SECONDS
+                    self.set_deadline(HOUSE_RESULT_SECONDS)
+                    self.broadcast_result()
+                    self.refund_all_sold_tickets()
+            elif current_status == "result":
+                sleep_until(self.deadline, "game")
+                if game_state["status"] == "result" and is_leader:
+                    self.reset()
+            else:
+                loop_sleep(1, "game")
+
+    # 🌟 ኳሱ እንደወጣ ያሸነፉ ካርቴላዎች በሙሉ ተለይተው በአንድ ጊዜ ይከፈላሉ፤ የክላየንቱን claim አይጠብቅም
+    def settle_winners(self, tickets, ball, drawn_at):
+        game_state = self.state
+        winners = []
+        for t_num in sorted(tickets, key=int):
+            phone_num = game_state["sold_tickets"].get(t_num)
+            if phone_num is None or any(w["phone"] == phone_num for w in winners):
+                continue
+            indices, line_name = engine_card_win(self.cards, t_num)
+            player = game_state["players"][phone_num]
+            winners.append({
+                "phone": phone_num, "username": player["username"], "ticket_num": t_num,
+                "card": player["cards"][t_num], "indices": indices, "line_name": line_name
+            })
+        if not winners:
+            return False
+        detected_at = time.monotonic()
+
+        total_prize = game_state["pot"] * 0.8
+        share_prize = total_prize / len(winners)
+        if len(winners) == 1:
+            winner_display = f"{winners[0]['username']} አሸንፏል"
+        else:
+            winner_display = f"{' & '.join(w['username'] for w in winners)} አሸንፈዋል"
+
+        game_state["status"] = "result"
+        game_state["timer"] = RESULT_SECONDS
+        self.set_deadline(RESULT_SECONDS)
+        game_state["winner"] = winner_display
+        game_state["winning_card"] = winners[0]["card"]
+        game_state["winning_ticket_num"] = winners[0]["ticket_num"]
+        game_state["winning_indices"] = winners[0]["indices"]
+        game_state["winning_line_name"] = winners[0]["line_name"]
+        self.round_winners = {w["phone"] for w in winners}
+        self.broadcast_result()
+        broadcast_at = time.monotonic()
+        self.win_timing = {"round_id": game_state["round_id"], "drawn_at": drawn_at, "shown": 0}
+        observe("bingo_win_latency_seconds", detected_at - drawn_at, room=self.room_id, stage="detect")
+        observe("bingo_win_latency_seconds", broadcast_at - drawn_at, room=self.room_id, stage="broadcast")
+
+        for w in winners:
+            self.journal("winner", phone=w["phone"], ticket=w["ticket_num"], ball=ball)
+        self.settle({w["phone"]: share_prize for w in winners}, "win")
+        settled_at = time.monotonic()
+        observe("bingo_win_latency_seconds", settled_at - drawn_at, room=self.room_id, stage="settle")
+        print(f"Room {self.room_id} ball {ball}: {len(winners)} winner(s), detect {(detected_at - drawn_at) * 1000:.2f} ms, "
+              f"broadcast {(broadcast_at - drawn_at) * 1000:.2f} ms, settled {(settled_at - drawn_at) * 1000:.2f} ms")
+
+        if len(winners) == 1:
+            w = winners[0]
+            send_telegram(f"🏆 *WINNER!* \n👤 Name: {w['username']} | 📞 Phone: `{w['phone']}` | 🎫 Ticket: {w['ticket_num']} \n🎯 Winning Ball: {ball} \n💰 Prize Won: {total_prize:.2f} ETB")
+        else:
+            winner_texts = [f"👤 {w['username']} (`{w['phone']}`) - 🎫 {w['ticket_num']}" for w in winners]
+            send_telegram(f"🏆 *WINNERS (Shared Prize on Ball {ball})!* \n💰 Total Pot Share: {share_prize:.2f} ETB each ({len(winners)} winners)\n" + "\n".join(winner_texts))
+        return True
+
+    # 🌟 ክላየንቱ ውጤቱን በስክሪኑ ላይ ሲያሳይ ይመልሳል፤ ከኳሱ መውጣት እስከ ስክሪኑ ያለው ጊዜ ይለካል (በዙር እስከ 500 ክላየንት)
+    def record_result_shown(self, round_id):
+        timing = self.win_timing
+        if not timing or timing["round_id"] != round_id or timing["shown"] >= 500:
+            return
+        timing["shown"] += 1
+        observe("bingo_win_latency_seconds", time.monotonic() - timing["drawn_at"], room=self.room_id, stage="shown")
+
+    def claim(self, db_phone):
+        game_state = self.state
+        if game_state["status"] not in ["playing", "result"]:
+            return {"success": False, "msg": "ጨዋታው በሂደት ላይ አይደለም!"}
+        if db_phone not in game_state["players"]:
+            return {"success": False, "msg": "ተጫዋቹ አልተገኘም!"}
+        if not game_state["drawn_balls"]:
+            return {"success": False, "msg": "ኳስ አልወጣም!"}
+        if db_phone in self.round_winners:
+            return {"success": True}
+        return {"success": False, "msg": "ቢንጎ አልሞላም!"}
+
+def parse_game_rooms(spec):
+    registry = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        room_id, _, stake = item.partition(":")
+        try:
+            registry[room_id] = GameRoom(room_id, int(stake or room_id))
+        except ValueError:
+            print(f"Invalid room spec: {item}")
+    return registry or {"10": GameRoom("10", 10)}
+
+game_rooms = parse_game_rooms(GAME_ROOMS)
+DEFAULT_ROOM_ID = next(iter(game_rooms))
+
+def get_room(room_id):
+    return game_rooms.get(sanitize_input(room_id) or DEFAULT_ROOM_ID) or game_rooms[DEFAULT_ROOM_ID]
+
+# 🌟 ሂደቱ በዙር መሀል ቢቆም ጆርናሉ ተነቦ lobby ላይ ያለው ዙር ይቀጥላል፣ የተጀመረው ዙር ተመላሽ ይደረጋል
+@timed_task
+def recover_open_rounds():
+    for started in round_journal.find({"type": "round_started", "open": True}):
+        round_id, room = started["round_id"], game_rooms.get(started["room"])
+        if room is not None and room.state["round_id"] == round_id:
+            continue
+        tickets, payouts, playing, last_n = {}, [], False, 0
+        for event in round_journal.find({"round_id": round_id}).sort("n", 1):
+            last_n = event["n"]
+            if event["type"] == "ticket_sold":
+                tickets[event["ticket"]] = event
+            elif event["type"] == "ticket_cancelled":
+                tickets.pop(event["ticket"], None)
+            elif event["type"] == "playing":
+                playing = True
+            elif event["type"] == "payout":
+                payouts.append(event)
+
+        if payouts:
+            settled = all([settle_or_queue(event["credits"], event["key"], round_id) for event in payouts])
+        elif playing or room is None or room.journal_n or room.stake != started["stake"]:
+            credits = {}
+            for ticket in tickets.values():
+                credits[ticket["phone"]] = credits.get(ticket["phone"], 0) + started["stake"]
+            settled = settle_or_queue(credits, f"{round_id}:refund", round_id)
+        else:
+            room.adopt_round(round_id, tickets, seed=started["seed"], journal_n=last_n)
+            print(f"Resumed lobby round {round_id} in room {room.room_id} with {len(tickets)} tickets")
+            continue
+        if not settled:
+            print(f"Interrupted round {round_id} stays open until its settlement is applied")
+            continue
+        round_journal.update_one({"_id": started["_id"]}, {"$set": {"open": False}})
+        print(f"Closed interrupted round {round_id} ({'payout' if payouts else 'refund'})")
+
+CLAIM_TICKET_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return -1 end
+local claimed = redis.call('HSETNX', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], 86400)
+return claimed
+"""
+RELEASE_TICKET_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return -1 end
+local ticket = redis.call('HGET', KEYS[2], ARGV[2])
+if not ticket or cjson.decode(ticket)['phone'] ~= ARGV[3] then return 0 end
+return redis.call('HDEL', KEYS[2], ARGV[2])
+"""
+RENEW_LEADER_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+claim_ticket_script = shared.register_script(CLAIM_TICKET_LUA) if shared is not None else None
+release_ticket_script = shared.register_script(RELEASE_TICKET_LUA) if shared is not None else None
+renew_leader_script = shared.register_script(RENEW_LEADER_LUA) if shared is not None else None
+
+def shared_publish(room, event):
+    event["room"] = room.room_id
+    shared.publish(SHARED_EVENTS, json.dumps(event))
+
+# 🌟 ትኬቱ በ Redis hash ላይ በ atomic HSETNX ይያዛል፤ ዙሩ lobby ካልሆነ አይሸጥም
+def shared_claim_ticket(room, t_num, db_phone, username):
+    round_id = room.state["round_id"]
+    ticket = json.dumps({"phone": db_phone, "username": username})
+    try:
+        claimed = claim_ticket_script(keys=[room.key("phase"), room.key(f"tickets:{round_id}")], args=[f"lobby:{round_id}", t_num, ticket])
+        if claimed != 1:
+            return False
+        shared_publish(room, {"type": "ticket_sold", "round_id": round_id, "ticket": t_num, "phone": db_phone, "username": username})
+    except Exception as e:
+        print(f"Shared ticket claim error ({room.room_id}/{t_num}): {e}")
+        return False
+    return True
+
+def shared_release_ticket(room, t_num, db_phone):
+    round_id = room.state["round_id"]
+    try:
+        released = release_ticket_script(keys=[room.key("phase"), room.key(f"tickets:{round_id}")], args=[f"lobby:{round_id}", t_num, db_phone])
+        if released != 1:
+            return False
+        shared_publish(room, {"type": "ticket_cancelled", "round_id": round_id, "ticket": t_num, "phone": db_phone})
+    except Exception as e:
+        print(f"Shared ticket release error ({room.room_id}/{t_num}): {e}")
+        return False
+    return True
+
+def forward_claim(room, db_phone):
+    reply_key = f"bingo:reply:{uuid.uuid4().hex}"
+    try:
+        shared_publish(room, {"type": "claim", "phone": db_phone, "reply": reply_key})
+        reply = shared.blpop(reply_key, timeout=SHARED_REPLY_TIMEOUT)
+    except Exception as e:
+        print(f"Shared claim forward error ({room.room_id}): {e}")
+        reply = None
+    if not reply:
+        return {"success": False, "msg": "እባክዎ እንደገና ይሞክሩ!"}
+    return json.loads(reply[1])
+
+def shared_event_listener():
+    while True:
+        try:
+            pubsub = shared.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(SHARED_EVENTS)
+            for message in pubsub.listen():
+                if not is_leader:
+                    continue
+                try:
+                    event = json.loads(message["data"])
+                except ValueError:
+                    continue
+                room = game_rooms.get(event.get("room"))
+                if room:
+                    room.apply_event(event)
+        except Exception as e:
+            print(f"Shared event listener error: {e}")
+            socketio.sleep(1)
+
+def become_leader():
+    for game_room in game_rooms.values():
+        game_room.take_over()
+        game_room.start()
+    resume_broadcast_jobs()
+
+# 🌟 አንድ worker ብቻ መሪ ሆኖ የ draw loop ን ያካሂዳል፤ ቁልፉ ካልታደሰ ሌላው ይረከባል
+def leader_elector():
+    global is_leader
+    while True:
+        try:
+            held = bool(shared.set(LEADER_KEY, WORKER_ID, nx=True, px=LEADER_TTL * 1000)
+                        or renew_leader_script(keys=[LEADER_KEY], args=[WORKER_ID, LEADER_TTL * 1000]))
+        except Exception as e:
+            print(f"Leader election error: {e}")
+            held = False
+        if held and not is_leader:
+            is_leader = True
+            print(f"Worker {WORKER_ID} is now the game leader")
+            gevent.spawn(become_leader)
+        elif not held and is_leader:
+            is_leader = False
+        socketio.sleep(LEADER_TTL / 3)
 
 @app.route('/')
+@timed_route
 def index(): 
     return render_template('index.html')
 
+def build_user_status(room, phone):
+    game_state = room.state
+    entry = wallet_cache.get(phone)
+    if entry is not None:
+        db_phone, balance = phone, wallet_available(entry)
+    else:
+        user = wallets.find_one({"phone": phone}, {"phone": 1, "balance": 1}) if phone else None
+        db_phone = user['phone'] if user else phone
+        balance = user.get('balance', 0) if user else 0
+    p_data = game_state["players"].get(db_phone, {"cards": {}})
+    return {
+        "balance": balance, 
+        "my_cards": list(p_data["cards"].values()), 
+        "my_tickets": [int(t_num) for t_num in p_data["cards"]],
+        "is_waiting": game_state["status"] in ["playing", "result"] and db_phone not in game_state["players"]
+    }
+
+@app.route('/get_my_status')
+@timed_route
+def get_my_status():
+    room = get_room(request.args.get('room'))
+    room.sync_from_shared()
+    phone = session_phone()
+    if not phone:
+        return session_required()
+    user_status = build_user_status(room, phone)
+    user_status["seq"] = room.seq
+    return jsonify(user_status)
+
 @app.route('/get_status')
+@timed_route
 def get_status():
-    phone = sanitize_input(request.args.get('phone'))
-    user = wallets.find_one({"phone": phone}) if phone else None
-    db_phone = user['phone'] if user else phone
-    p_data = game_state["players"].get(db_phone, {"cards": {}})
-    cards_list = list(p_data["cards"].values())
-    clean_players = {k: {"username": v.get("username", ""), "cards": list(v.get("cards", {}).values())} for k, v in game_state["players"].items()}
-    
+    room = get_room(request.args.get('room'))
+    room.sync_from_shared()
+    phone = session_phone()
+    if not phone:
+        return session_required()
+    wire = wire_format(request.args.get('wire'))
+    user_part = encode_wire(build_user_status(room, phone), wire)
+    if wire == "msgpack":
+        # 🌟 [status, user] ባለ ሁለት አባል array፤ የተቀመጠው status bytes እንዳለ ይቀጠላል
+        body = b"\x92" + room.state_bytes("status", wire) + user_part
+        mimetype = "application/x-msgpack"
+    else:
+        body = room.state_bytes("status")[:-1] + b"," + user_part[1:]
+        mimetype = "application/json"
+
+    resp = app.response_class(body, mimetype=mimetype)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.set_etag(f"{room.room_id}-{room.seq}-{wire}-{zlib.crc32(user_part):08x}")
+    return resp.make_conditional(request)
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.args.get('token') != METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return app.response_class("forbidden\n", status=403, mimetype="text/plain")
+    gauges = {
+        "bingo_connected_sockets": [((), connected_sockets)],
+        "bingo_handlers_active": [((("kind", kind),), n) for kind, n in handlers_active.items()],
+        "bingo_telegram_queue_depth": [((), tg_queue.qsize() + sum(len(parked) for parked in tg_parked.values()))],
+        "bingo_webhook_queue_depth": [((), sum(q.qsize() for q in webhook_queues))],
+        "bingo_wallet_cache_entries": [((), len(wallet_cache))],
+        "bingo_journal_buffer_events": [((), len(journal_buffer))],
+        "bingo_settlements_pending": [((), len(pending_settlements))],
+        "bingo_leader": [((), int(is_leader))],
+        "bingo_index_drift": [((("collection", coll_name),), len(problems)) for coll_name, problems in index_drift.items()],
+        "bingo_room_players": [((("room", r.room_id),), len(r.state["players"])) for r in game_rooms.values()],
+        "bingo_room_seq": [((("room", r.room_id),), r.seq) for r in game_rooms.values()],
+    }
+    return app.response_class(render_metrics(gauges), mimetype="text/plain; version=0.0.4")
+
+@app.route('/card_pool')
+@timed_route
+def card_pool():
+    global CARD_POOL_BYTES
+    if request.args.get('wire') == "bin":
+        # 🌟 ለእያንዳንዱ ትኬት 25 byte፤ ትኬት n ከ (n-1)*25 ይጀምራል
+        resp = app.response_class(CARD_POOL[1:].tobytes(), mimetype="application/octet-stream")
+        resp.headers["X-Card-Seed"] = CARD_SEED
+        resp.set_etag(f"{CARD_SEED}-bin")
+    else:
+        if CARD_POOL_BYTES is None:
+            CARD_POOL_BYTES = encode_json({"seed": CARD_SEED, "cards": CARD_POOL[1:].tolist()})
+        resp = app.response_class(CARD_POOL_BYTES, mimetype="application/json")
+        resp.set_etag(CARD_SEED)
+    resp.headers["Cache-Control"] = "public, max-age=86400"
+    return resp.make_conditional(request)
+
+@app.route('/replay_round')
+@timed_route
+def replay_round_view():
+    round_seed = sanitize_input(request.args.get('seed'))
+    slots = [slot for slot in (ticket_slot(t) for t in request.args.get('tickets', '').split(',')) if slot]
+    if not round_seed or not slots:
+        return jsonify({"success": False})
+    balls, winners = replay_round(round_seed, slots)
     return jsonify({
-        "status": game_state["status"],
-        "timer": game_state["timer"],
-        "ball_timer": game_state["ball_timer"],
-        "pot": game_state["pot"],
-        "sold_tickets": game_state["sold_tickets"],
-        "current_ball": game_state["current_ball"],
-        "drawn_balls": game_state["drawn_balls"],
-        "winner": game_state["winner"],
-        "winning_card": game_state["winning_card"],
-        "winning_ticket_num": game_state["winning_ticket_num"],
-        "winning_indices": game_state.get("winning_indices"),
-        "winning_line_name": game_state.get("winning_line_name"),
-        "all_cards": game_state.get("all_cards", {}),
-        "players": clean_players, 
-        "balance": user['balance'] if user else 0, 
-        "my_cards": cards_list, 
-        "active_players": len(game_state["players"]),
-        "is_waiting": game_state["status"] in ["playing", "result"] and db_phone not in game_state["players"]
+        "success": True, "card_seed": CARD_SEED,
+        "seed_hash": hashlib.sha256(round_seed.encode()).hexdigest(),
+        "balls": balls, "winners": winners
     })
 
 @app.route('/buy_specific_ticket', methods=['POST'])
+@timed_route
 def buy_ticket():
     d = request.json or {}
-    ph, t_num, uname = sanitize_input(d.get('phone')), str(d.get('ticket_num')), sanitize_input(d.get('username'))
-    if not ph or not t_num:
+    room = get_room(d.get('room'))
+    room.sync_from_shared()
+    game_state = room.state
+    ph, slot, uname = session_phone(d), ticket_slot(d.get('ticket_num')), sanitize_input(d.get('username'))
+    if not ph:
+        return session_required()
+    if slot is None:
         return jsonify({"success": False})
-    user = wallets.find_one({"phone": ph})
-    if not user:
+    t_num = str(slot)
+    entry = wallet_get(ph)
+    if not entry:
         return jsonify({"success": False})
-    db_phone = user["phone"]
+    db_phone = entry["phone"]
 
-    if game_state["status"] != "lobby" or t_num in game_state["sold_tickets"]:
+    if game_state["status"] != "lobby" or not room.hold_ticket(slot):
         return jsonify({"success": False})
     
-    res = wallets.find_one_and_update(
-        {"phone": db_phone, "balance": {"$gte": 10}}, 
-        {"$inc": {"balance": -10}},
-        return_document=True
-    )
-    if res:
-        columns = [random.sample(range(r[0], r[1]+1), 5) for r in [(1,15), (16,30), (31,45), (46,60), (61,75)]]
-        flat = [columns[c][r] for r in range(5) for c in range(5)]
-        flat[12] = 0  
-        
-        game_state["sold_tickets"][t_num] = db_phone
-        game_state["pot"] += 10
-        game_state.setdefault("all_cards", {})[t_num] = flat
-        
-        p_uname = uname if uname else res.get("username", f"User_{db_phone[-4:]}")
-        if db_phone not in game_state["players"]:
-            game_state["players"][db_phone] = {"cards": {t_num: flat}, "username": p_uname}
-        else:
-            game_state["players"][db_phone]["cards"][t_num] = flat
+    try:
+        new_balance = wallet_reserve(entry, room.stake)
+        if new_balance is None:
+            return jsonify({"success": False})
+        p_uname = uname if uname else (entry["username"] or f"User_{db_phone[-4:]}")
+
+        if shared is None:
+            if game_state["status"] != "lobby":
+                wallet_release(entry, room.stake)
+                return jsonify({"success": False})
+            room.add_ticket(t_num, db_phone, p_uname, pool_card(slot))
+        elif not shared_claim_ticket(room, t_num, db_phone, p_uname):
+            wallet_release(entry, room.stake)
+            return jsonify({"success": False})
                 
-        gevent.spawn(notify_user_balance_update, db_phone, res.get("balance", 0))
-        gevent.spawn(broadcast_game_state)
-        return jsonify({"success": True, "balance": res.get("balance", 0)})
-    return jsonify({"success": False})
+        gevent.spawn(notify_user_balance_update, db_phone, new_balance)
+        return jsonify({"success": True, "balance": new_balance})
+    finally:
+        room.release_hold(slot)
 
 @app.route('/cancel_ticket', methods=['POST'])
+@timed_route
 def cancel_ticket():
     d = request.json or {}
-    ph, t_num = sanitize_input(d.get('phone')), str(d.get('ticket_num'))
-    user = wallets.find_one({"phone": ph})
-    if not user or game_state["status"] != "lobby":
+    room = get_room(d.get('room'))
+    room.sync_from_shared()
+    game_state = room.state
+    ph, slot = session_phone(d), ticket_slot(d.get('ticket_num'))
+    if not ph:
+        return session_required()
+    entry = wallet_get(ph)
+    if not entry or slot is None or game_state["status"] != "lobby":
         return jsonify({"success": False})
-    db_phone = user["phone"]
+    db_phone, t_num = entry["phone"], str(slot)
 
-    if game_state["sold_tickets"].get(t_num) == db_phone:
-        res = wallets.find_one_and_update({"phone": db_phone}, {"$inc": {"balance": 10}}, return_document=True)
-        game_state["pot"] -= 10
-        del game_state["sold_tickets"][t_num]
-        game_state.get("all_cards", {}).pop(t_num, None)
-        if db_phone in game_state["players"]:
-            game_state["players"][db_phone]["cards"].pop(t_num, None)
-            if not game_state["players"][db_phone]["cards"]: 
-                game_state["players"].pop(db_phone, None)
-        if res:
-            gevent.spawn(notify_user_balance_update, db_phone, res.get("balance", 0))
-        gevent.spawn(broadcast_game_state) 
+    # 🌟 በብዙ worker ሁነታ የትኬቱ ባለቤትነት በ Redis ስክሪፕቱ ይረጋገጣል (የአካባቢው ስቴት ሊዘገይ ይችላል)
+    if shared is not None:
+        released = shared_release_ticket(room, t_num, db_phone)
+    else:
+        released = game_state["sold_tickets"].get(t_num) == db_phone
+        if released:
+            room.remove_ticket(t_num, db_phone)
+    if released:
+        new_balance = wallet_release(entry, room.stake)
+        gevent.spawn(notify_user_balance_update, db_phone, new_balance)
         return jsonify({"success": True})
     return jsonify({"success": False})
 
 @app.route('/claim_bingo', methods=['POST'])
+@timed_route
 def claim_bingo():
-    global claim_lock_active, pending_claims
     d = request.json or {}
-    ph = sanitize_input(d.get('phone'))
-    
-    user_info = wallets.find_one({"phone": ph})
-    if not user_info:
-        return jsonify({"success": False, "msg": "ተጠቃሚው አልተገኘም!"})
-    db_phone = user_info["phone"]
-
-    if game_state["status"] not in ["playing", "result"]:
-        return jsonify({"success": False, "msg": "ጨዋታው በሂደት ላይ አይደለም!"})
-        
-    p_data = game_state["players"].get(db_phone)
-    if not p_data:
-        return jsonify({"success": False, "msg": "ተጫዋቹ አልተገኘም!"})
-        
-    current_drawn_balls = game_state["drawn_balls"]
-    if not current_drawn_balls:
-        return jsonify({"success": False, "msg": "ኳስ አልወጣም!"})
-        
-    valid_win_found = False
-    winning_ticket_num = None
-    winning_card_data = None
-    winning_line_type = None
-    winning_indices_list = None
-    
-    for t_num, card in p_data["cards"].items():
-        win_indices, line_type = check_winning_line(card, current_drawn_balls, player_marked_numbers=None)
-        if win_indices is not None:
-            valid_win_found = True
-            winning_ticket_num = str(t_num)
-            winning_card_data = card
-            winning_line_type = line_type
-            winning_indices_list = win_indices
-            break 
-            
-    if not valid_win_found:
-        return jsonify({"success": False, "msg": "ቢንጎ አልሞላም!"})
-        
-    claim_info = {
-        "phone": db_phone,
-        "username": p_data["username"],
-        "ticket_num": winning_ticket_num,
-        "card": winning_card_data,
-        "indices": winning_indices_list,
-        "line_name": winning_line_type,
-        "winning_ball": current_drawn_balls[-1]
-    }
-
-    if game_state["status"] == "playing":
-        if not claim_lock_active:
-            claim_lock_active = True
-            game_state["status"] = "result"
-            game_state["timer"] = 10
-            pending_claims = [claim_info]
-
-            def process_claims_by_ball():
-                global claim_lock_active, pending_claims
-                socketio.sleep(0.2)
-
-                total_prize = game_state["pot"] * 0.8  
-                num_winners = len(pending_claims)
-
-                if num_winners == 1:
-                    winner_display = f"{pending_claims[0]['username']} አሸንፏል"
-                else:
-                    winner_names = [c["username"] for c in pending_claims]
-                    winner_display = f"{' & '.join(winner_names)} አሸንፈዋል"
-
-                game_state["winner"] = winner_display
-                game_state["winning_card"] = pending_claims[0]["card"]  
-                game_state["winning_ticket_num"] = pending_claims[0]["ticket_num"] 
-                game_state["winning_indices"] = pending_claims[0]["indices"]
-                game_state["winning_line_name"] = pending_claims[0]["line_name"] 
-
-                def background_win_task():
-                    if num_winners == 1:
-                        w = pending_claims[0]
-                        win_res = wallets.find_one_and_update(
-                            {"phone": w["phone"]}, 
-                            {"$inc": {"balance": total_prize}}, 
-                            return_document=True
-                        )
-                        if win_res:
-                            gevent.spawn(notify_user_balance_update, w["phone"], win_res.get("balance", 0))
-                        
-                        success_msg = f"🏆 *WINNER!* \n👤 Name: {w['username']} | 📞 Phone: `{w['phone']}` | 🎫 Ticket: {w['ticket_num']} \n🎯 Winning Ball: {w['winning_ball']} \n💰 Prize Won: {total_prize:.2f} ETB"
-                        send_telegram(success_msg)
-                    else:
-                        share_prize = total_prize / num_winners
-                        winner_texts = []
-                        for w in pending_claims:
-                            w_res = wallets.find_one_and_update(
-                                {"phone": w["phone"]}, 
-                                {"$inc": {"balance": share_prize}}, 
-                                return_document=True
-                            )
-                            if w_res:
-                                gevent.spawn(notify_user_balance_update, w["phone"], w_res.get("balance", 0))
-                            winner_texts.append(f"👤 {w['username']} (`{w['phone']}`) - 🎫 {w['ticket_num']}")
-                        
-                        success_msg = f"🏆 *WINNERS (Shared Prize on Ball {pending_claims[0]['winning_ball']})!* \n💰 Total Pot Share: {share_prize:.2f} ETB each ({num_winners} winners)\n" + "\n".join(winner_texts)
-                        send_telegram(success_msg)
-                        
-                    broadcast_game_state()
-
-                gevent.spawn(background_win_task)
-
-                def countdown_and_reset():
-                    global claim_lock_active, pending_claims
-                    for t in range(10, -1, -1):
-                        if game_state["status"] != "result":
-                            return
-                        game_state["timer"] = t
-                        broadcast_game_state()
-                        socketio.sleep(1)
-                    reset_game()
-
-                socketio.start_background_task(countdown_and_reset)
-
-            socketio.start_background_task(process_claims_by_ball)
-        else:
-            already_exists = any(c["phone"] == db_phone for c in pending_claims)
-            if not already_exists:
-                pending_claims.append(claim_info)
-
-    elif game_state["status"] == "result" and claim_lock_active:
-        already_exists = any(c["phone"] == db_phone for c in pending_claims)
-        if not already_exists:
-            pending_claims.append(claim_info)
-
-    return jsonify({"success": True})
+    room = get_room(d.get('room'))
+    ph = session_phone(d)
+    if not ph:
+        return session_required()
+    if not is_leader:
+        return jsonify(forward_claim(room, ph))
+    return jsonify(room.claim(ph))
 
 @socketio.on('connect')
-def handle_connect():
-    global loop_started
+@timed_route
+def handle_connect(auth=None):
+    global loop_started, connected_sockets
+    connected_sockets += 1
+    auth = auth or {}
+    auth_phone = session_phone(auth, auth.get("token"))
+    bal_room = balance_room(auth_phone)
+    if bal_room:
+        join_room(bal_room)
     if not loop_started:
         loop_started = True
         set_webhook()
-        socketio.start_background_task(game_loop)
-    broadcast_game_state()
+        if shared is None:
+            recover_open_rounds()
+            for game_room in game_rooms.values():
+                game_room.start()
+            resume_broadcast_jobs()
+        else:
+            socketio.start_background_task(leader_elector)
+            socketio.start_background_task(shared_event_listener)
+        socketio.start_background_task(wallet_flusher)
+    room = get_room(auth.get("room"))
+    room.sync_from_shared()
+    wire = wire_format(auth.get("wire"))
+    join_room(room.sio_room)
+    join_room(room.wire_rooms[wire])
+    room.send_snapshot(auth_phone, wire)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    global connected_sockets
+    connected_sockets = max(0, connected_sockets - 1)
+
+@socketio.on('result_shown')
+@timed_route
+def handle_result_shown(data=None):
+    data = data or {}
+    room = get_room(data.get("room"))
+    room.record_result_shown(sanitize_input(data.get("round_id")))
+
+@socketio.on('clock_sync')
+@timed_route
+def handle_clock_sync(data=None):
+    return {"server_time": int(time.time() * 1000)}
+
+@socketio.on('request_snapshot')
+@timed_route
+def handle_request_snapshot(data=None):
+    data = data or {}
+    room = get_room(data.get("room"))
+    room.sync_from_shared()
+    room.send_snapshot(session_phone(data, data.get("token")), wire_format(data.get("wire")))
 
 if __name__ == '__main__':
     socketio.run(app, host='0.0.0.0', port=int(os.environ.get("PORT", 10000)))
@@ -0,0 +1,134 @@
+# 🌟 የካርቴላ ሞተር መለኪያ፦ የድሮው check_winning_line (በየኳሱ ሁሉንም ካርቴላ መፈተሽ) ከ engine_mark_ball ጋር ይወዳደራል
+#
+#   pip install mongomock
+#   python enginebench.py --cards 200,2000,20000 --balls 20 --json engine.json
+#
+# ሁለቱም በአንድ አይነት ካርቴላዎች እና የኳስ ቅደም ተከተል ይሰራሉ፤ ያሸነፉ ትኬቶች አንድ መሆናቸውም ይረጋገጣል።
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+def load_bot():
+    import mongomock
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ.setdefault("ADMIN_ID", "1")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot
+    return bot
+
+# 🌟 ከ user-005 በፊት የነበረው ፍተሻ እንዳለ (game loop በየኳሱ ለእያንዳንዱ ካርቴላ ይጠራው ነበር)
+def check_winning_line(card, drawn_numbers, player_marked_numbers=None):
+    drawn_set = set()
+    for b in drawn_numbers:
+        if len(b) > 1:
+            try:
+                drawn_set.add(int(b[1:]))
+            except ValueError:
+                pass
+    drawn_set.add(0)
+    marked_set = set(player_marked_numbers) if player_marked_numbers is not None else None
+
+    def is_hit(idx):
+        val = card[idx]
+        if idx == 12 or val == 0 or val == "Besh" or val == "★":
+            return True
+        try:
+            val_int = int(val)
+            if marked_set is not None:
+                return (val_int in drawn_set) and (val_int in marked_set)
+            return val_int in drawn_set
+        except:
+            return False
+
+    all_win_indices = set()
+    line_types = []
+    for i in range(5):
+        row_indices = [i*5 + j for j in range(5)]
+        if all(is_hit(idx) for idx in row_indices):
+            all_win_indices.update(row_indices)
+            line_types.append(f"ረድፍ {i+1}")
+    for j in range(5):
+        col_indices = [j + i*5 for i in range(5)]
+        if all(is_hit(idx) for idx in col_indices):
+            all_win_indices.update(col_indices)
+            line_types.append(f"አምድ {j+1}")
+    diag1_indices = [0, 6, 12, 18, 24]
+    if all(is_hit(idx) for idx in diag1_indices):
+        all_win_indices.update(diag1_indices)
+        line_types.append("ዲያጎናል ↘")
+    diag2_indices = [4, 8, 12, 16, 20]
+    if all(is_hit(idx) for idx in diag2_indices):
+        all_win_indices.update(diag2_indices)
+        line_types.append("ዲያጎናል ↙")
+    corner_indices = [0, 4, 20, 24]
+    if all(is_hit(idx) for idx in corner_indices):
+        all_win_indices.update(corner_indices)
+        line_types.append("ኮርነር (4 ማዕዘኖች)")
+
+    if all_win_indices:
+        return list(all_win_indices), " + ".join(line_types)
+    return None, None
+
+def random_cards(rng, count):
+    cards = []
+    for _ in range(count):
+        columns = [rng.sample(range(lo, lo + 15), 5) for lo in (1, 16, 31, 46, 61)]
+        card = [columns[c][r] for r in range(5) for c in range(5)]
+        card[12] = 0
+        cards.append(card)
+    return cards
+
+def run_case(bot, cards, order):
+    tickets = {str(i + 1): card for i, card in enumerate(cards)}
+
+    legacy_wins, drawn = [], []
+    start = time.perf_counter()
+    for ball in order:
+        drawn.append(ball)
+        legacy_wins.append(sorted(t for t, card in tickets.items() if check_winning_line(card, drawn)[0]))
+    legacy_ms = (time.perf_counter() - start) * 1000 / len(order)
+
+    card_store = bot.engine_new()
+    for t_num, card in tickets.items():
+        bot.engine_add_card(card_store, t_num, card)
+    engine_wins, won = [], set()
+    start = time.perf_counter()
+    for ball in order:
+        won.update(bot.engine_mark_ball(card_store, ball))
+        engine_wins.append(sorted(won))
+    engine_ms = (time.perf_counter() - start) * 1000 / len(order)
+
+    return {"cards": len(cards), "balls": len(order), "legacy_ms": legacy_ms, "engine_ms": engine_ms,
+            "winners": len(won), "same_winners": legacy_wins == engine_wins}
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-ball win evaluation: legacy check_winning_line scan vs the NumPy engine")
+    parser.add_argument("--cards", default="200,2000,20000", help="comma separated card counts")
+    parser.add_argument("--balls", type=int, default=20, help="balls drawn per case (the legacy scan is slow on large rounds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    bot = load_bot()
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'cards':>7}{'balls':>7}{'legacy ms/ball':>16}{'engine ms/ball':>16}{'winners':>9}  same")
+    for count in (int(c) for c in args.cards.split(",") if c.strip()):
+        order = rng.sample(bot.BALLS, min(args.balls, len(bot.BALLS)))
+        r = run_case(bot, random_cards(rng, count), order)
+        results.append(r)
+        print(f"{r['cards']:>7}{r['balls']:>7}{r['legacy_ms']:>16.2f}{r['engine_ms']:>16.3f}{r['winners']:>9}  {r['same_winners']}")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+    sys.exit(0 if all(r["same_winners"] for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
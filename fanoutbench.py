@@ -0,0 +1,79 @@
+# 🌟 የ balance_update fan-out መለኪያ፦ ለሁሉም (global) emit እና ለባለቤቱ room ብቻ emit በ N ግንኙነቶች ይወዳደራሉ
+#
+#   pip install mongomock
+#   python fanoutbench.py --connections 100,1000,5000 --updates 50 --json fanout.json
+#
+# bot.py በዚሁ process ውስጥ በ mongomock ይነሳል፤ ክላየንቶቹ የ Flask-SocketIO test client ናቸው። የሚለካው የሰርቨሩ
+# ድርሻ (packet encode + ለእያንዳንዱ socket መላክ) ነው፣ network አይደለም፤ ለማወዳደር በቂ ነው።
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import json
+import time
+import argparse
+
+def load_bot():
+    import mongomock
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ.setdefault("BOT_TOKEN", "fanoutbench")
+    os.environ.setdefault("ADMIN_ID", "1")
+    os.environ["TELEGRAM_API_URL"] = "http://127.0.0.1:9"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot
+    # 🌟 የመጀመሪያው connect የ game loop እና webhook ን እንዳያስነሳ
+    bot.loop_started = True
+    return bot
+
+def bench_phone(i):
+    return f"09{i:08d}"
+
+def drain(clients):
+    return sum(len(c.get_received()) for c in clients)
+
+def run_case(bot, connections, updates):
+    clients = [bot.socketio.test_client(bot.app, auth={"token": bot.issue_session(bench_phone(i))}) for i in range(connections)]
+    drain(clients)
+    # 🌟 እንደ payout/refund፦ የተለያዩ ተጫዋቾች ባላንስ አንድ በአንድ ይላካል
+    targets = [bench_phone(i * connections // updates) for i in range(updates)]
+    result = {"connections": connections, "updates": updates}
+
+    start = time.perf_counter()
+    for n, phone in enumerate(targets):
+        bot.socketio.emit('balance_update', {"phone": phone, "balance": n})
+    result["global_ms"] = (time.perf_counter() - start) * 1000 / updates
+    result["global_packets"] = drain(clients)
+
+    start = time.perf_counter()
+    for n, phone in enumerate(targets):
+        bot.notify_user_balance_update(phone, n)
+    result["room_ms"] = (time.perf_counter() - start) * 1000 / updates
+    result["room_packets"] = drain(clients)
+
+    for c in clients:
+        c.disconnect()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="balance_update fan-out cost: global emit vs per-owner room emit")
+    parser.add_argument("--connections", default="100,1000,5000", help="comma separated connection counts")
+    parser.add_argument("--updates", type=int, default=50, help="balance updates per case")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    bot = load_bot()
+    results = []
+    print(f"{'conns':>7}{'global ms/upd':>15}{'packets':>10}{'room ms/upd':>13}{'packets':>10}{'speedup':>9}")
+    for connections in (int(c) for c in args.connections.split(",") if c.strip()):
+        r = run_case(bot, connections, min(args.updates, connections))
+        results.append(r)
+        print(f"{r['connections']:>7}{r['global_ms']:>15.3f}{r['global_packets']:>10}{r['room_ms']:>13.3f}{r['room_packets']:>10}"
+              f"{r['global_ms'] / max(r['room_ms'], 1e-9):>8.0f}x")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# 🌟 የ index.html የ render ፍጥነት መለኪያ፦ አንድ ሙሉ ዙር (ሽያጭ፣ 75 ኳሶች፣ ውጤት) በ headless Chromium ውስጥ ይጫወታል
+#
+#   pip install playwright && python -m playwright install chromium
+#   python frametime.py --cpu-throttle 4 --json frames.json
+#   git show <rev>:templates/index.html > /tmp/old.html && python frametime.py --html /tmp/old.html   (ከቀድሞው ጋር ለማወዳደር)
+#
+# ሹፌሩ የገጹን applyGameUpdate እና cardPool ይጠቀማል፤ cardPool የገባው "Serve cards from a seeded per-ticket pool" ከሚለው
+# commit ጀምሮ ስለሆነ ማወዳደር የሚቻለው ከዚያ በኋላ ባሉ revision ዎች መካከል ብቻ ነው (የቀደሙት ገጾች ላይ ስክሪፕቱ ቆሞ ይወጣል)።
+#
+# ሰርቨር አያስፈልግም፤ ገጹ በ route ይቀርባል፣ ሌላው network ይዘጋል። game_update መልዕክቶቹ በሰርቨሩ ቅርጽ ተሠርተው
+# በገጹ የራሱ applyGameUpdate በየ frame አንድ አንድ ይገባሉ፤ የ handler ጊዜ (ከ style/layout ጋር) እና የ frame ርዝመት ይመዘገባሉ።
+import os
+import sys
+import json
+import random
+import argparse
+
+PAGE_URL = "http://bingo.test/"
+BENCH_PHONE = "0911000001"
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def ball_label(n):
+    return f"{'BINGO'[(n - 1) // 15]}{n}"
+
+def synthetic_pool(rng, count=500):
+    pool = []
+    for _ in range(count):
+        columns = [rng.sample(range(lo, lo + 15), 5) for lo in (1, 16, 31, 46, 61)]
+        card = [columns[c][r] for r in range(5) for c in range(5)]
+        card[12] = 0
+        pool.append(card)
+    return pool
+
+# 🌟 መልዕክቶቹ bot.py ከሚልካቸው ጋር አንድ አይነት ናቸው (snapshot, ticket_sold, status, ball, result)
+def round_updates(rng, round_no, seq, tickets, mine):
+    round_id = f"bench{round_no:07d}"
+    updates = [{
+        "type": "snapshot", "seq": seq, "room": "10", "round_id": round_id, "card_seed": "bench", "seed_hash": "",
+        "round_seed": None, "stake": 10, "status": "lobby", "timer": 30, "ball_timer": 3, "deadline": None, "pot": 0,
+        "sold_tickets": {}, "current_ball": "--", "drawn_balls": [], "winner": None, "winning_card": None,
+        "winning_ticket_num": None, "winning_indices": None, "winning_line_name": None, "active_players": 0
+    }]
+    sold = rng.sample(range(1, 501), tickets)
+    players = set()
+    for i, t_num in enumerate(sold):
+        phone = BENCH_PHONE if i < mine else f"09{rng.randint(20000000, 99999999)}"
+        players.add(phone)
+        seq += 1
+        updates.append({"type": "ticket_sold", "seq": seq, "ticket": str(t_num), "phone": phone,
+                        "pot": (i + 1) * 10, "active_players": len(players)})
+    seq += 1
+    updates.append({"type": "status", "seq": seq, "status": "playing", "ball_timer": 3, "deadline": None,
+                    "drawn_balls": [], "current_ball": "--"})
+    order = rng.sample(range(1, 76), 75)
+    for count, n in enumerate(order, 1):
+        seq += 1
+        updates.append({"type": "ball", "seq": seq, "ball": ball_label(n), "count": count})
+    seq += 1
+    updates.append({"type": "result", "seq": seq, "status": "result", "timer": 10, "deadline": None,
+                    "winner": "bench አሸንፏል", "winning_card": None, "winning_ticket_num": sold[0],
+                    "winning_indices": [0, 1, 2, 3, 4], "winning_line_name": "ረድፍ 1", "round_id": round_id, "round_seed": ""})
+    return updates, seq + 1
+
+# 🌟 በገጹ ውስጥ የሚሰራው ሹፌር፤ የገጹን global ተለዋዋጮች (phone, cardPool) እና applyGameUpdate ይጠቀማል
+DRIVER_JS = """
+async ({ updates, pool, benchPhone }) => {
+    document.getElementById('auth-ui').style.display = 'none';
+    document.getElementById('main-app-content').style.display = 'flex';
+    phone = benchPhone;
+    cardPool = pool; cardPoolSeed = 'bench';
+
+    const nextFrame = () => new Promise(resolve => requestAnimationFrame(resolve));
+    const frameTimes = [];
+    let running = true, last = null;
+    const tick = (ts) => {
+        if (last !== null) frameTimes.push(ts - last);
+        last = ts;
+        if (running) requestAnimationFrame(tick);
+    };
+    requestAnimationFrame(tick);
+
+    const longTasks = [];
+    let observer = null;
+    try {
+        observer = new PerformanceObserver(list => list.getEntries().forEach(e => longTasks.push(e.duration)));
+        observer.observe({ entryTypes: ['longtask'] });
+    } catch (e) {}
+
+    const handler = {};
+    for (const d of updates) {
+        await nextFrame();
+        const t0 = performance.now();
+        applyGameUpdate(d);
+        document.body.offsetHeight;
+        (handler[d.type] = handler[d.type] || []).push(performance.now() - t0);
+    }
+    await nextFrame(); await nextFrame();
+    running = false;
+    if (observer) observer.disconnect();
+    return { handler: handler, frames: frameTimes, long_tasks: longTasks, dom_nodes: document.getElementsByTagName('*').length };
+}
+"""
+
+def summarize(samples):
+    return {"n": len(samples), "p50": percentile(samples, 0.5), "p95": percentile(samples, 0.95), "max": max(samples or [0])}
+
+def run(args):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        sys.exit("playwright is required: pip install playwright && python -m playwright install chromium")
+
+    with open(args.html, encoding="utf-8") as f:
+        html = f.read()
+    rng = random.Random(args.seed)
+    pool = synthetic_pool(rng)
+    updates, seq = [], 1
+    for round_no in range(args.rounds):
+        batch, seq = round_updates(rng, round_no, seq, args.tickets, args.mine)
+        updates.extend(batch)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=not args.headed)
+        page = browser.new_page(viewport={"width": 412, "height": 915}, device_scale_factor=2.6, is_mobile=True, has_touch=True)
+
+        def route(request_route):
+            if request_route.request.url == PAGE_URL:
+                request_route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+            else:
+                request_route.abort()
+        page.route("**/*", route)
+        page.goto(PAGE_URL)
+        missing = page.evaluate("() => ['applyGameUpdate', 'cardPool'].filter(name => { try { eval(name); return false; } catch (e) { return true; } })")
+        if missing:
+            browser.close()
+            sys.exit(f"{args.html} has no {', '.join(missing)}; frametime.py only drives pages that render cards from cardPool")
+        if args.cpu_throttle > 1:
+            cdp = page.context.new_cdp_session(page)
+            cdp.send("Emulation.setCPUThrottlingRate", {"rate": args.cpu_throttle})
+        result = page.evaluate(DRIVER_JS, {"updates": updates, "pool": pool, "benchPhone": BENCH_PHONE})
+        browser.close()
+
+    frames = result["frames"]
+    summary = {
+        "html": args.html, "cpu_throttle": args.cpu_throttle, "rounds": args.rounds, "tickets": args.tickets,
+        "handler_ms": {kind: summarize(samples) for kind, samples in result["handler"].items()},
+        "handler_total_ms": sum(sum(samples) for samples in result["handler"].values()),
+        "frame_ms": summarize(frames),
+        "frames_over_16ms": sum(1 for f in frames if f > 1000 / 60 + 1),
+        "frames_over_50ms": sum(1 for f in frames if f > 50),
+        "long_tasks": len(result["long_tasks"]),
+        "dom_nodes": result["dom_nodes"],
+    }
+
+    print(f"{args.html}  cpu x{args.cpu_throttle}, {args.rounds} round(s), {args.tickets} tickets")
+    print(f"{'update':<14}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for kind, s in summary["handler_ms"].items():
+        print(f"{kind:<14}{s['n']:>6}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['max']:>10.2f}")
+    f = summary["frame_ms"]
+    print(f"frames {f['n']}  p50 {f['p50']:.1f} ms  p95 {f['p95']:.1f} ms  max {f['max']:.1f} ms  "
+          f">16.7ms {summary['frames_over_16ms']}  >50ms {summary['frames_over_50ms']}  long tasks {summary['long_tasks']}")
+    print(f"handler total {summary['handler_total_ms']:.1f} ms, dom nodes {summary['dom_nodes']}")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(summary, out, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame-time harness for templates/index.html in headless Chromium")
+    parser.add_argument("--html", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "index.html"))
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--tickets", type=int, default=300, help="tickets sold per round")
+    parser.add_argument("--mine", type=int, default=2, help="how many of them belong to the bench player")
+    parser.add_argument("--cpu-throttle", type=float, default=4, help="Chromium CPU slowdown, 4 approximates a low-end Android phone")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--json", help="write the summary to this file")
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
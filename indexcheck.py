@@ -0,0 +1,68 @@
+# 🌟 የ MongoDB index እና query-plan ፍተሻ፦ bot.py የሚልካቸውን query-ዎች (bot.QUERY_SHAPES) በ explain() ያያል፣
+# አንዱ COLLSCAN ከሆነ ወይም የታወጀ index ከጎደለ/ከተቀየረ በ exit code 1 ይወጣል።
+#
+#   MONGO_URL=mongodb://127.0.0.1:27017 python indexcheck.py --create    (ባዶ የሙከራ DB ላይ፣ index-ዎቹን ፈጥሮ ይፈትሻል)
+#   MONGO_URL=... python indexcheck.py                                   (live DB ላይ፣ ምንም አይቀይርም)
+#   MONGO_URL=... python indexcheck.py --create --seen shapes.json       (loadtest.py --query-shapes የመዘገባቸውን ጭምር)
+#
+# --seen ፋይል ውስጥ ያለ ቅርጽ QUERY_SHAPES ውስጥ ካልታወጀ ይወድቃል፤ ራሱም በ explain() ይፈተሻል።
+# mongomock explain አይደግፍም፤ እውነተኛ mongod ያስፈልጋል።
+import sys
+import json
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description="Check declared MongoDB indexes and query plans used by bot.py")
+    parser.add_argument("--create", action="store_true", help="create missing indexes before checking")
+    parser.add_argument("--seen", help="query shapes recorded with QUERY_SHAPE_LOG / loadtest.py --query-shapes")
+    args = parser.parse_args()
+
+    import bot
+
+    if args.create:
+        bot.ensure_indexes()
+    failed = False
+    for coll_name, problems in bot.check_index_drift().items():
+        print(f"drift   {coll_name}: {', '.join(problems)}")
+        failed = failed or any(not p.startswith("extra ") for p in problems)
+
+    for shape in bot.QUERY_SHAPES:
+        stages = bot.explain_query(shape)
+        scan = "COLLSCAN" in stages
+        if scan and shape.get("full_scan"):
+            verdict = "scan ok"
+        elif scan:
+            verdict = "COLLSCAN"
+            failed = True
+        else:
+            verdict = "ok"
+        print(f"{verdict:<8}{shape['collection']}.{shape['name']}: {', '.join(sorted(stages))}")
+
+    if args.seen:
+        declared = {}
+        for shape in bot.QUERY_SHAPES:
+            declared.setdefault(bot.query_shape_key(shape["collection"], bot.declared_filter(shape)), []).append(shape)
+        with open(args.seen) as f:
+            seen = json.load(f)
+        for shape in seen:
+            key = bot.query_shape_key(shape["collection"], shape["filter"])
+            label = f"{shape['collection']} {json.dumps(bot.filter_shape(shape['filter']), sort_keys=True)}"
+            if key not in declared:
+                print(f"{'MISSING':<8}{label}: not declared in QUERY_SHAPES")
+                failed = True
+                continue
+            stages = bot.explain_query(shape)
+            scan = "COLLSCAN" in stages
+            if scan and any(d.get("full_scan") for d in declared[key]):
+                verdict = "scan ok"
+            elif scan:
+                verdict = "COLLSCAN"
+                failed = True
+            else:
+                verdict = "ok"
+            print(f"{verdict:<8}seen {label}: {', '.join(sorted(stages))}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# 🌟 የጭነት ሙከራ (load test)፦ ብዙ ተጫዋቾችን አስመስሎ bot.py ን ከጫፍ እስከ ጫፍ ይፈትናል
+#
+#   pip install mongomock websocket-client psutil
+#   python loadtest.py --clients 500 --rounds 3 --mongomock --json results.json
+#   python loadtest.py --url http://127.0.0.1:10000 --clients 200     (ቀድሞ የሚሰራ ሰርቨር ላይ)
+#   MONGO_URL=... python loadtest.py --query-shapes shapes.json       (ሰርቨሩ የላካቸውን query ቅርጾች ይመዘግባል፤ indexcheck.py --seen)
+#
+# ሰርቨሩ በራሱ process ውስጥ ከ fake Telegram API ጋር ይነሳል፤ ተጫዋቾቹ ይመዘገባሉ፣ ትኬት ይገዛሉ፣
+# game_update ይሰማሉ፣ እንደ index.html /get_status ይጠይቃሉ፣ ሲሞላ /claim_bingo ይሽቀዳደማሉ።
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import random
+import argparse
+import subprocess
+import urllib.parse
+import gevent
+import requests
+import socketio
+from requests.adapters import HTTPAdapter
+
+PHONE_BASE = 990000000
+LINES = [[r * 5 + c for c in range(5)] for r in range(5)] + [[r * 5 + c for r in range(5)] for c in range(5)] + \
+        [[i * 6 for i in range(5)], [(i + 1) * 4 for i in range(5)], [0, 4, 20, 24]]
+
+def loadtest_phone(i):
+    return f"0{PHONE_BASE + i}"
+
+# 🌟 ሰርቨሩ initData ይጠይቃል፤ እንደ Telegram WebApp በ bot token ይፈረማል (ለእያንዳንዱ ተጫዋች የራሱ user id)
+def signed_init_data(bot_token, user_id):
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id, "first_name": f"load{user_id}"})}
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def card_has_line(card, drawn):
+    return any(all(card[i] == 0 or card[i] in drawn for i in line) for line in LINES)
+
+# ---------------------------------------------------------------- server
+def fake_telegram_app(env, start_response):
+    env["wsgi.input"].read()
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [b'{"ok": true, "result": {"message_id": 1}}']
+
+def serve(args):
+    if args.mongomock:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    from gevent import pywsgi
+    telegram = pywsgi.WSGIServer(("127.0.0.1", args.telegram_port), fake_telegram_app, log=None)
+    telegram.start()
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{args.telegram_port}"
+    os.environ.setdefault("BOT_TOKEN", "loadtest")
+    os.environ.setdefault("ADMIN_ID", "1")
+    os.environ.setdefault("GAME_ROOMS", args.rooms)
+    if args.query_shapes:
+        os.environ["QUERY_SHAPE_LOG"] = os.path.abspath(args.query_shapes)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot
+    from pymongo import UpdateOne
+    bot.LOBBY_SECONDS = args.lobby
+    bot.PREP_SECONDS = args.prep
+    bot.BALL_INTERVAL = args.ball_interval
+    bot.RESULT_SECONDS = args.result
+    bot.HOUSE_RESULT_SECONDS = args.result
+    bot.wallets.bulk_write([
+        UpdateOne({"phone": loadtest_phone(i)}, {"$set": {"balance": args.balance, "username": f"load{i}"}}, upsert=True)
+        for i in range(args.clients)
+    ], ordered=False)
+    print(f"loadtest server on :{args.port} (telegram :{args.telegram_port}, {args.clients} wallets)", flush=True)
+    bot.socketio.run(bot.app, host="127.0.0.1", port=args.port, log_output=False)
+
+def process_sampler(pid, samples, stop):
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        proc.cpu_percent(None)
+        while not stop["done"]:
+            gevent.sleep(1)
+            samples.append({"cpu": proc.cpu_percent(None), "rss_mb": proc.memory_info().rss / 1048576})
+    except ImportError:
+        ticks = os.sysconf("SC_CLK_TCK")
+        last = None
+        while not stop["done"]:
+            gevent.sleep(1)
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+            with open(f"/proc/{pid}/status") as f:
+                rss_kb = next(int(l.split()[1]) for l in f if l.startswith("VmRSS"))
+            now = time.monotonic()
+            if last:
+                samples.append({"cpu": 100 * (cpu_seconds - last[1]) / (now - last[0]), "rss_mb": rss_kb / 1024})
+            last = (now, cpu_seconds)
+    except Exception as e:
+        print(f"process sampler stopped: {e}")
+
+# ---------------------------------------------------------------- clients
+class Stats:
+    def __init__(self, clients):
+        self.latency = {}
+        self.errors = {}
+        self.bytes = [0] * clients
+        self.messages = [0] * clients
+        self.rounds = set()
+        self.buys = {"ok": 0, "rejected": 0}
+        self.claims = {"ok": 0, "rejected": 0}
+
+    def record(self, name, seconds, ok):
+        self.latency.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+def call(stats, http, name, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        res = http.request(method, url, timeout=30, **kwargs)
+        ok = res.status_code < 400
+        body = res.json() if ok and res.status_code != 304 else None
+    except Exception:
+        ok, body = False, None
+    stats.record(name, time.perf_counter() - started, ok)
+    return body
+
+def player(i, args, stats, card_pool, deadline):
+    phone = loadtest_phone(i)
+    base = args.url
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    login = {"phone": phone, "username": f"load{i}", "init_data": signed_init_data(args.bot_token, PHONE_BASE + i)}
+    session = call(stats, http, "register_or_login", "POST", f"{base}/register_or_login", json=login)
+    token = (session or {}).get("token", "")
+    http.headers["Authorization"] = f"Bearer {token}"
+
+    game = {"status": None, "round_id": None, "drawn": set(), "mine": [], "bought_round": None, "claimed_round": None, "rounds": 0}
+    sio = socketio.Client(reconnection=True)
+    claims = []
+
+    def claim(round_id):
+        body = call(stats, http, "claim_bingo", "POST", f"{base}/claim_bingo", json={"phone": phone, "room": args.room})
+        stats.claims["ok" if body and body.get("success") else "rejected"] += 1
+
+    @sio.on("game_update")
+    def on_game_update(d):
+        if isinstance(d, (bytes, bytearray)):
+            stats.bytes[i] += len(d)
+            d = json.loads(d)
+        else:
+            stats.bytes[i] += len(json.dumps(d, separators=(",", ":")))
+        stats.messages[i] += 1
+        kind = d.get("type")
+        if kind == "snapshot" or "status" in d:
+            if d.get("round_id") and d["round_id"] != game["round_id"]:
+                game.update(round_id=d["round_id"], drawn=set(), mine=[])
+            game["status"] = d.get("status", game["status"])
+            for ball in d.get("drawn_balls") or []:
+                game["drawn"].add(int(ball[1:]))
+        if kind == "ball":
+            game["drawn"].add(int(d["ball"][1:]))
+            if game["claimed_round"] != game["round_id"] and any(card_has_line(card_pool[t - 1], game["drawn"]) for t in game["mine"]):
+                game["claimed_round"] = game["round_id"]
+                claims.append(gevent.spawn(claim, game["round_id"]))
+        elif kind == "result":
+            game["status"] = "result"
+            game["rounds"] += 1
+            stats.rounds.add(d.get("round_id"))
+
+    try:
+        sio.connect(base, auth={"phone": phone, "token": token, "room": args.room}, transports=args.transports.split(","), wait_timeout=30)
+    except Exception as e:
+        stats.record("socket_connect", 0, False)
+        print(f"client {i} connect failed: {e}")
+        return
+
+    while time.monotonic() < deadline and game["rounds"] < args.rounds:
+        gevent.sleep(args.poll_interval * random.uniform(0.8, 1.2))
+        if args.poll_interval > 0:
+            call(stats, http, "get_status", "GET", f"{base}/get_status", params={"phone": phone, "room": args.room})
+        if game["status"] == "lobby" and game["bought_round"] != game["round_id"]:
+            game["bought_round"] = game["round_id"]
+            for t_num in random.sample(range(1, 501), args.tickets):
+                body = call(stats, http, "buy_specific_ticket", "POST", f"{base}/buy_specific_ticket",
+                            json={"phone": phone, "ticket_num": t_num, "username": f"load{i}", "room": args.room})
+                if body and body.get("success"):
+                    stats.buys["ok"] += 1
+                    game["mine"].append(t_num)
+                else:
+                    stats.buys["rejected"] += 1
+    gevent.joinall(claims, timeout=30)
+    sio.disconnect()
+
+def report(args, stats, elapsed, samples):
+    rounds = max(1, len(stats.rounds))
+    summary = {
+        "clients": args.clients, "rounds": len(stats.rounds), "elapsed_s": round(elapsed, 2),
+        "endpoints": {}, "buys": stats.buys, "claims": stats.claims,
+        "socket": {
+            "messages_per_client_round": round(sum(stats.messages) / args.clients / rounds, 1),
+            "bytes_per_client_round": round(sum(stats.bytes) / args.clients / rounds, 1),
+        },
+        "server": {
+            "cpu_avg_pct": round(sum(s["cpu"] for s in samples) / len(samples), 1) if samples else None,
+            "cpu_max_pct": round(max(s["cpu"] for s in samples), 1) if samples else None,
+            "rss_max_mb": round(max(s["rss_mb"] for s in samples), 1) if samples else None,
+        },
+    }
+    print(f"\n{args.clients} clients, {len(stats.rounds)} rounds in {elapsed:.1f}s")
+    print(f"{'endpoint':<22}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, values in sorted(stats.latency.items()):
+        row = {
+            "count": len(values), "errors": stats.errors.get(name, 0), "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.5) * 1000, 2), "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+        summary["endpoints"][name] = row
+        print(f"{name:<22}{row['count']:>8}{row['errors']:>8}{row['rps']:>9}{row['p50_ms']:>9}{row['p99_ms']:>9}")
+    print(f"buys {stats.buys}  claims {stats.claims}")
+    print(f"socket: {summary['socket']['messages_per_client_round']} msgs, {summary['socket']['bytes_per_client_round']} bytes per client per round")
+    print(f"server: cpu avg {summary['server']['cpu_avg_pct']}% max {summary['server']['cpu_max_pct']}%, rss max {summary['server']['rss_max_mb']} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+def run(args):
+    server = None
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        server_cmd = [sys.executable, os.path.abspath(__file__), "--serve"] + [a for a in sys.argv[1:] if a != "--serve"]
+        server = subprocess.Popen(server_cmd)
+        for _ in range(100):
+            try:
+                requests.get(f"{args.url}/card_pool", timeout=1)
+                break
+            except requests.RequestException:
+                gevent.sleep(0.2)
+        else:
+            server.kill()
+            sys.exit("loadtest server did not start")
+
+    card_pool = requests.get(f"{args.url}/card_pool", timeout=10).json()["cards"]
+    stats = Stats(args.clients)
+    samples, stop = [], {"done": False}
+    sampler = gevent.spawn(process_sampler, server.pid, samples, stop) if server else None
+    started = time.monotonic()
+    deadline = started + args.duration
+    players = []
+    for i in range(args.clients):
+        players.append(gevent.spawn(player, i, args, stats, card_pool, deadline))
+        gevent.sleep(args.ramp / max(1, args.clients))
+    gevent.joinall(players)
+    elapsed = time.monotonic() - started
+    stop["done"] = True
+    if sampler:
+        sampler.join(timeout=2)
+    if server:
+        server.terminate()
+        server.wait(timeout=10)
+    return report(args, stats, elapsed, samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the bingo bot")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=2, help="stop once every client saw this many results")
+    parser.add_argument("--duration", type=float, default=600, help="hard stop in seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which clients connect")
+    parser.add_argument("--tickets", type=int, default=1, help="tickets each client tries to buy per round")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="/get_status poll period, 0 disables polling")
+    parser.add_argument("--transports", default="websocket", help="Socket.IO transports, e.g. websocket or polling,websocket")
+    parser.add_argument("--room", default="10")
+    parser.add_argument("--rooms", default="10", help="GAME_ROOMS for the spawned server")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--telegram-port", type=int, default=18001)
+    parser.add_argument("--mongomock", action="store_true", help="run the spawned server against mongomock")
+    parser.add_argument("--query-shapes", help="record every query shape the spawned server sends (needs a real mongod)")
+    parser.add_argument("--bot-token", default=os.getenv("BOT_TOKEN", "loadtest"), help="signs each client's Telegram initData")
+    parser.add_argument("--balance", type=int, default=100000)
+    parser.add_argument("--lobby", type=float, default=10)
+    parser.add_argument("--prep", type=float, default=1)
+    parser.add_argument("--ball-interval", type=float, default=0.5)
+    parser.add_argument("--result", type=float, default=3)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# 🌟 bot.py በ mongomock ላይ ይጫናል፤ Telegram ጥሪዎች ወደ ዝግ port ይሄዳሉ (ፈተናዎቹ አይጠቀሙባቸውም)
+#
+#   pip install pytest mongomock
+#   python -m pytest -q tests
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+import pymongo
+pymongo.MongoClient = mongomock.MongoClient
+
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("BOT_TOKEN", "test")
+os.environ["TELEGRAM_API_URL"] = "http://127.0.0.1:9"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot as bot_module
+
+@pytest.fixture
+def bot(monkeypatch):
+    bot_module.wallets.delete_many({})
+    bot_module.wallet_cache.clear()
+    monkeypatch.setattr(bot_module, "wallet_batch", None)
+    monkeypatch.setattr(bot_module, "journal_buffer", [])
+    monkeypatch.setattr(bot_module, "pending_settlements", {})
+    monkeypatch.setattr(bot_module, "loop_started", True)
+    return bot_module
+
+@pytest.fixture
+def room(bot, monkeypatch):
+    game_room = bot.GameRoom("t", 10)
+    monkeypatch.setitem(bot.game_rooms, "t", game_room)
+    return game_room
+
+@pytest.fixture
+def players(bot):
+    def create(count, balance):
+        phones = [f"0977{i:06d}" for i in range(count)]
+        bot.wallets.insert_many([{"phone": p, "username": f"p{i}", "balance": balance} for i, p in enumerate(phones)])
+        return {p: {"Authorization": f"Bearer {bot.issue_session(p)}"} for p in phones}
+    return create
@@ -0,0 +1,49 @@
+import time
+import gevent
+from gevent.event import AsyncResult
+
+def fake_telegram(bot, monkeypatch):
+    sent = []
+
+    def telegram_call(method, payload, wait=False, timeout=60, files=None):
+        sent.append((method, payload.get("chat_id")))
+        result = AsyncResult()
+        gevent.spawn_later(0.001, result.set, {"ok": True, "result": {"message_id": len(sent)}})
+        return result.get() if wait else result
+    monkeypatch.setattr(bot, "telegram_call", telegram_call)
+    return sent
+
+def user_messages(bot, sent):
+    return [chat_id for method, chat_id in sent if method == "sendMessage" and chat_id != bot.ADMIN_ID]
+
+def test_resume_does_not_rerun_a_started_job(bot, monkeypatch):
+    sent = fake_telegram(bot, monkeypatch)
+    bot.broadcast_jobs.delete_many({})
+    bot.wallets.insert_many([{"phone": f"0966{i:06d}", "chat_id": str(1000 + i), "balance": 0} for i in range(60)])
+
+    assert bot.start_broadcast_job(42, "hello")
+    bot.resume_broadcast_jobs()
+    gevent.sleep(0.5)
+
+    assert sorted(user_messages(bot, sent)) == sorted(str(1000 + i) for i in range(60))
+    job = bot.broadcast_jobs.find_one({"_id": "bc_42"})
+    assert job["status"] == "done" and job["sent"] == 60
+
+def test_job_leased_by_another_worker_is_left_alone(bot, monkeypatch):
+    sent = fake_telegram(bot, monkeypatch)
+    bot.broadcast_jobs.delete_many({})
+    bot.wallets.insert_many([{"phone": f"0966{i:06d}", "chat_id": str(1000 + i), "balance": 0} for i in range(5)])
+    bot.broadcast_jobs.insert_one({
+        "_id": "bc_7", "text": "hi", "status": "running", "last_id": None, "sent": 0, "failed": 0,
+        "progress_message_id": 1, "owner": "other-worker", "lease_until": time.time() + 30
+    })
+
+    bot.resume_broadcast_jobs()
+    gevent.sleep(0.2)
+    assert user_messages(bot, sent) == []
+
+    bot.broadcast_jobs.update_one({"_id": "bc_7"}, {"$set": {"lease_until": time.time() - 1}})
+    bot.resume_broadcast_jobs()
+    gevent.sleep(0.3)
+    assert len(user_messages(bot, sent)) == 5
+    assert bot.broadcast_jobs.find_one({"_id": "bc_7"})["owner"] == bot.WORKER_ID
@@ -0,0 +1,31 @@
+import os
+import uuid
+import pytest
+from pymongo.mongo_client import MongoClient
+
+MONGO_URL = os.getenv("MONGO_URL")
+
+# 🌟 mongomock explain አይደግፍም፤ MONGO_URL ሲሰጥ ብቻ ባዶ የሙከራ DB ላይ index-ዎቹ ተፈጥረው QUERY_SHAPES በ explain() ይፈተሻሉ
+#
+#   MONGO_URL=mongodb://127.0.0.1:27017 python -m pytest -q tests/test_explain.py
+@pytest.fixture
+def real_db(bot, monkeypatch):
+    if not MONGO_URL:
+        pytest.skip("MONGO_URL not set (explain needs a real mongod)")
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    name = f"bingo_explain_{uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(bot, "db", client[name])
+    yield bot.db
+    client.drop_database(name)
+    client.close()
+
+def test_no_declared_query_shape_is_a_collection_scan(bot, real_db):
+    bot.ensure_indexes()
+    assert bot.check_index_drift() == {}
+
+    scans = {}
+    for shape in bot.QUERY_SHAPES:
+        stages = bot.explain_query(shape)
+        if "COLLSCAN" in stages and not shape.get("full_scan"):
+            scans[f"{shape['collection']}.{shape['name']}"] = sorted(stages)
+    assert not scans, f"these QUERY_SHAPES need an index: {scans}"
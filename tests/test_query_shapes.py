@@ -0,0 +1,153 @@
+import sys
+import json
+import time
+import gevent
+from bson import ObjectId
+from gevent.event import AsyncResult
+
+FILTER_METHODS = ("find", "find_one", "update_one", "find_one_and_update", "delete_one", "count_documents")
+
+# 🌟 bot.py በ Mongo ላይ የሚልከውን እያንዳንዱን filter ይመዘግባል (mongomock CommandListener አይጠራም)፤
+# mongomock ራሱ ውስጡ የሚያደርጋቸው ጥሪዎች እና የዚህ ፈተና ዝግጅት አይቆጠሩም
+def record_filters(bot, monkeypatch):
+    seen = {}
+
+    def note(coll, query):
+        if sys._getframe(2).f_code.co_filename == bot.__file__:
+            seen.setdefault(bot.query_shape_key(coll.name, query), query)
+
+    for coll in (bot.wallets, bot.broadcast_jobs, bot.round_journal, bot.webhook_updates, bot.webhook_dead_letters):
+        for method in FILTER_METHODS:
+            def wrapper(*args, _coll=coll, _real=getattr(coll, method), **kwargs):
+                note(_coll, args[0] if args else kwargs.get("filter"))
+                return _real(*args, **kwargs)
+            monkeypatch.setattr(coll, method, wrapper)
+
+        def aggregate(pipeline, *args, _coll=coll, _real=coll.aggregate, **kwargs):
+            note(_coll, pipeline[0].get("$match", {}) if pipeline else {})
+            return _real(pipeline, *args, **kwargs)
+
+        def bulk_write(ops, *args, _coll=coll, _real=coll.bulk_write, **kwargs):
+            for op in ops:
+                note(_coll, op._filter)
+            return _real(ops, *args, **kwargs)
+        monkeypatch.setattr(coll, "aggregate", aggregate)
+        monkeypatch.setattr(coll, "bulk_write", bulk_write)
+    return seen
+
+def fake_telegram(bot, monkeypatch):
+    def telegram_call(method, payload, wait=False, timeout=60, files=None):
+        result = AsyncResult()
+        result.set({"ok": True, "result": {"message_id": 1}})
+        return result.get() if wait else result
+    monkeypatch.setattr(bot, "telegram_call", telegram_call)
+
+def admin_message(bot, update_id, text):
+    bot.process_update({"update_id": update_id, "message": {"chat": {"id": int(bot.ADMIN_ID)}, "text": text}})
+
+def admin_callback(bot, message_id, data):
+    bot.process_update({"update_id": message_id, "callback_query": {
+        "id": "q", "data": data, "message": {"message_id": message_id, "text": "req", "chat": {"id": int(bot.ADMIN_ID)}}
+    }})
+
+def drive_every_flow(bot, room, players, monkeypatch):
+    auth = players(3, 1000)
+    a, b, c = auth
+    client = bot.app.test_client()
+    monkeypatch.setattr(bot, "REQUIRE_INIT_DATA", False)
+    client.post("/register_or_login", json={"phone": a, "username": "u"})
+    bot.request_wallet_binding(b, "555", "u", 1000)
+    admin_callback(bot, 9299, f"app_bind_{b}_555")
+
+    client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": 1}, headers=auth[a])
+    client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": 2}, headers=auth[b])
+    client.post("/cancel_ticket", json={"room": "t", "ticket_num": 2}, headers=auth[b])
+    client.post("/request_transfer", json={"receiver_phone": b, "amount": 5}, headers=auth[a])
+    bot.wallet_flush()
+
+    direct = dict(bot.wallet_get(c), direct=True)
+    bot.wallet_reserve(direct, 10)
+
+    bot.webhook_updates.delete_many({})
+    monkeypatch.setattr(bot, "WEBHOOK_RETRY_SECONDS", 0.01)
+    process_update, failures = bot.process_update, []
+    def fail_once(data):
+        if not failures:
+            failures.append(data["update_id"])
+            raise RuntimeError("injected failure")
+        process_update(data)
+    monkeypatch.setattr(bot, "process_update", fail_once)
+    bot.enqueue_update({"update_id": 9300, "message": {"chat": {"id": 42}, "text": "hi"}})
+    for _ in range(200):
+        if 9300 not in bot.webhook_pending:
+            break
+        gevent.sleep(0.01)
+    monkeypatch.setattr(bot, "process_update", process_update)
+    bot.webhook_dead_letters.delete_many({})
+    bot.webhook_dead_letters.insert_one({"_id": 9306, "update": {"update_id": 9306, "message": {"chat": {"id": 42}, "text": "hi"}}})
+    admin_message(bot, 9307, "/replay 9306")
+    admin_message(bot, 9301, f"/add {a} 50")
+    admin_message(bot, 9301, f"/add {a} 50")
+    admin_message(bot, 9302, f"/sub {a} 20")
+    admin_callback(bot, 9303, f"app_wit_{b}_10")
+    admin_message(bot, 9304, "/remove 0900000000")
+    bot.send_balance_report([])
+    bot.send_balance_report(["nonzero"])
+    bot.send_balance_report(["top", "5"])
+
+    bot.round_journal.delete_many({})
+    bot.round_journal.insert_many([
+        {"_id": "r9:00001", "round_id": "r9", "n": 1, "type": "round_started", "open": True, "room": "gone", "stake": 10, "seed": 1},
+        {"_id": "r9:00002", "round_id": "r9", "n": 2, "type": "ticket_sold", "ticket": "3", "phone": c},
+    ])
+    bot.recover_open_rounds()
+    bot.journal_write([{"_id": "r8:00002", "round_id": "r8", "n": 2, "type": "round_closed", "ts": time.time()}])
+
+    bot.broadcast_jobs.delete_many({})
+    bot.wallets.update_many({}, {"$set": {"chat_id": "700"}})
+    bot.start_broadcast_job(9305, "hello")
+    bot.broadcast_jobs.insert_one({"_id": "bc_page", "text": "hi", "status": "running", "last_id": ObjectId(),
+                                   "sent": 0, "failed": 0, "progress_message_id": 1, "owner": None, "lease_until": 0})
+    bot.run_broadcast_job("bc_page")
+    bot.broadcast_jobs.insert_one({"_id": "bc_held", "text": "hi", "status": "running", "last_id": None,
+                                   "sent": 0, "failed": 0, "progress_message_id": 1, "owner": "other", "lease_until": time.time() + 30})
+    bot.resume_broadcast_jobs()
+    gevent.sleep(0.2)
+
+def test_every_filter_bot_sends_is_declared(bot, room, players, monkeypatch):
+    fake_telegram(bot, monkeypatch)
+    seen = record_filters(bot, monkeypatch)
+    drive_every_flow(bot, room, players, monkeypatch)
+
+    declared = {bot.query_shape_key(s["collection"], bot.declared_filter(s)): s["name"] for s in bot.QUERY_SHAPES}
+    undeclared = {key: query for key, query in seen.items() if key not in declared}
+    assert not undeclared, f"add these to QUERY_SHAPES: {undeclared}"
+    unused = sorted(name for key, name in declared.items() if key not in seen)
+    assert not unused, f"QUERY_SHAPES entries no flow sends any more: {unused}"
+
+def test_command_listener_records_the_filters_it_sees(bot, tmp_path, monkeypatch):
+    log = tmp_path / "shapes.json"
+    monkeypatch.setattr(bot, "QUERY_SHAPE_LOG", str(log))
+    monkeypatch.setattr(bot, "seen_query_shapes", {})
+
+    bot.record_command_shape("find", {"find": "wallets", "filter": {"phone": "0911000000"}})
+    bot.record_command_shape("find", {"find": "wallets", "filter": {"phone": "0922000000"}})
+    bot.record_command_shape("find", {"find": "wallets", "filter": {"chat_id": {"$nin": [None, ""]}}, "sort": {"_id": 1}})
+    bot.record_command_shape("findAndModify", {"findAndModify": "broadcast_jobs", "query": {
+        "_id": "bc_1", "status": "running", "$or": [{"lease_until": None}, {"lease_until": {"$lt": 17.5}}]}})
+    bot.record_command_shape("update", {"update": "wallets", "updates": [
+        {"q": {"phone": "0911000000", "settlements": {"$ne": "wb:1"}}, "u": {}}]})
+    bot.record_command_shape("aggregate", {"aggregate": "wallets", "pipeline": [{"$group": {"_id": None}}]})
+    bot.record_command_shape("insert", {"insert": "round_journal", "documents": [{"_id": "x"}]})
+    bot.record_command_shape("ping", {"ping": 1})
+
+    recorded = json.loads(log.read_text())
+    assert len(recorded) == 5
+    assert recorded[0] == {"collection": "wallets", "filter": {"phone": "?"}, "sort": []}
+    assert recorded[1]["filter"] == {"chat_id": {"$nin": [None]}} and recorded[1]["sort"] == [["_id", 1]]
+    assert recorded[2]["filter"]["$or"] == [{"lease_until": None}, {"lease_until": {"$lt": 0}}]
+
+    declared = {bot.query_shape_key(s["collection"], bot.declared_filter(s)) for s in bot.QUERY_SHAPES}
+    assert all(bot.query_shape_key(r["collection"], r["filter"]) in declared for r in recorded)
+    bot.record_command_shape("find", {"find": "wallets", "filter": {"username": "x"}})
+    assert bot.query_shape_key("wallets", {"username": "?"}) not in declared
@@ -0,0 +1,139 @@
+STAKE = 10
+BALANCE = 100
+
+def buy(bot, headers, t_num):
+    return bot.app.test_client().post("/buy_specific_ticket", json={"room": "t", "ticket_num": t_num}, headers=headers).json["success"]
+
+def balance(bot, phone):
+    return bot.wallets.find_one({"phone": phone})["balance"]
+
+def failing_journal(bot, monkeypatch):
+    def bulk_write(ops, **kwargs):
+        raise RuntimeError("journal down")
+    monkeypatch.setattr(bot.round_journal, "bulk_write", bulk_write)
+
+# 🌟 payout ክስተቱ ወደ ጆርናሉ ካልተጻፈ ክፍያው አይፈጸምም፤ ሂደቱ ቢቆም ማገገሚያው ተመላሽ ብቻ ያደርጋል (ሁለት ጊዜ አይከፈልም)
+def test_payout_waits_for_its_journal_entry(bot, room, players, monkeypatch):
+    bot.round_journal.delete_many({})
+    (winner, w_headers), (loser, l_headers) = players(2, BALANCE).items()
+    room.open_journal()
+    assert buy(bot, w_headers, 1) and buy(bot, l_headers, 2)
+    room.journal("playing")
+    assert bot.journal_sync()
+    round_id = room.state["round_id"]
+
+    real_bulk_write = bot.round_journal.bulk_write
+    failing_journal(bot, monkeypatch)
+    room.settle({winner: 2 * STAKE}, "win")
+    assert balance(bot, winner) == BALANCE - STAKE
+    assert bot.pending_settlements[f"{round_id}:win"]["journaled"] is False
+
+    # 🌟 በዚህ ጊዜ ሂደቱ ቢቆም፦ ጆርናሉ payout የለውም፣ ትኬቶቹ ይመለሳሉ
+    monkeypatch.setattr(bot.round_journal, "bulk_write", real_bulk_write)
+    monkeypatch.setitem(bot.game_rooms, "t", bot.GameRoom("t", STAKE))
+    monkeypatch.setattr(bot, "journal_buffer", [])
+    monkeypatch.setattr(bot, "pending_settlements", {})
+    bot.recover_open_rounds()
+    assert balance(bot, winner) == BALANCE and balance(bot, loser) == BALANCE
+
+def test_queued_payout_is_applied_once_its_journal_entry_is_written(bot, room, players, monkeypatch):
+    bot.round_journal.delete_many({})
+    (winner, w_headers), (loser, l_headers) = players(2, BALANCE).items()
+    room.open_journal()
+    assert buy(bot, w_headers, 1) and buy(bot, l_headers, 2)
+    assert bot.journal_sync()
+    round_id = room.state["round_id"]
+
+    real_bulk_write = bot.round_journal.bulk_write
+    failing_journal(bot, monkeypatch)
+    room.settle({winner: 2 * STAKE}, "win")
+    bot.pending_settlements[f"{round_id}:win"]["retry_at"] = 0
+    bot.retry_settlements()
+    assert balance(bot, winner) == BALANCE - STAKE
+
+    monkeypatch.setattr(bot.round_journal, "bulk_write", real_bulk_write)
+    bot.pending_settlements[f"{round_id}:win"]["retry_at"] = 0
+    bot.retry_settlements()
+    assert not bot.pending_settlements
+    assert bot.round_journal.find_one({"round_id": round_id, "type": "payout"})["key"] == f"{round_id}:win"
+    assert balance(bot, winner) == BALANCE + STAKE
+    assert bot.journal_sync()
+    assert bot.round_journal.find_one({"_id": f"{round_id}:00001"})["open"] is False
+
+    # 🌟 ዙሩ ተዘግቷል፤ ማገገሚያው ምንም አይለውጥም
+    bot.recover_open_rounds()
+    assert balance(bot, winner) == BALANCE + STAKE and balance(bot, loser) == BALANCE - STAKE
+
+def write_journal(bot, round_id, *events, room="t", seed="feedc0de"):
+    bot.round_journal.delete_many({})
+    docs = [{"_id": f"{round_id}:00001", "round_id": round_id, "n": 1, "room": room, "type": "round_started",
+             "open": True, "seed": seed, "stake": STAKE}]
+    for n, (kind, fields) in enumerate(events, start=2):
+        docs.append(dict(fields, _id=f"{round_id}:{n:05d}", round_id=round_id, n=n, room=room, type=kind))
+    bot.round_journal.insert_many(docs)
+
+def sold(phone, t_num):
+    return ("ticket_sold", {"ticket": t_num, "phone": phone, "username": phone[-4:]})
+
+def round_open(bot, round_id):
+    return bot.round_journal.find_one({"_id": f"{round_id}:00001"})["open"]
+
+def recover_twice(bot, phones):
+    bot.recover_open_rounds()
+    assert bot.journal_sync()
+    after = {p: balance(bot, p) for p in phones}
+    bot.recover_open_rounds()
+    assert bot.journal_sync()
+    assert {p: balance(bot, p) for p in phones} == after
+    return after
+
+def test_lobby_round_is_resumed_with_its_tickets_and_seed(bot, room, players):
+    a, b = players(2, BALANCE - STAKE)
+    write_journal(bot, "rl", sold(a, "1"), sold(b, "2"), sold(b, "3"), ("ticket_cancelled", {"ticket": "3", "phone": b}))
+
+    after = recover_twice(bot, [a, b])
+    assert after == {a: BALANCE - STAKE, b: BALANCE - STAKE}
+    assert room.state["round_id"] == "rl"
+    assert room.state["sold_tickets"] == {"1": a, "2": b}
+    assert room.state["pot"] == 2 * STAKE
+    assert room.state["seed"] == "feedc0de"
+    assert room.journal_n == 5
+    assert round_open(bot, "rl")
+
+def test_round_interrupted_mid_draw_is_refunded_once(bot, room, players):
+    a, b = players(2, BALANCE - STAKE)
+    write_journal(bot, "rp", sold(a, "1"), sold(b, "2"), ("playing", {}), ("ball", {"ball": 7}), ("ball", {"ball": 12}))
+
+    after = recover_twice(bot, [a, b])
+    assert after == {a: BALANCE, b: BALANCE}
+    assert not round_open(bot, "rp")
+    assert room.state["round_id"] != "rp"
+
+def test_journaled_payout_is_replayed_without_paying_twice(bot, room, players):
+    a, b = players(2, BALANCE - STAKE)
+    # 🌟 a ቀድሞ ተከፍሏል (settle key በዋሌቱ ላይ አለ)፣ b ገና አልተከፈለም
+    bot.wallet_apply_once(a, 2 * STAKE, "rw:win")
+    write_journal(bot, "rw", sold(a, "1"), sold(b, "2"), ("playing", {}),
+                  ("payout", {"key": "rw:win", "credits": {a: 2 * STAKE, b: STAKE}}))
+
+    after = recover_twice(bot, [a, b])
+    assert after == {a: BALANCE + STAKE, b: BALANCE}
+    assert not round_open(bot, "rw")
+
+def test_payout_that_cannot_be_applied_keeps_the_round_open(bot, room, players, monkeypatch):
+    a, b = players(2, BALANCE - STAKE)
+    write_journal(bot, "rx", sold(a, "1"), sold(b, "2"), ("playing", {}), ("payout", {"key": "rx:win", "credits": {a: 2 * STAKE}}))
+    real_bulk_write = bot.wallets.bulk_write
+    def bulk_write(ops, **kwargs):
+        raise RuntimeError("mongo down")
+    monkeypatch.setattr(bot.wallets, "bulk_write", bulk_write)
+
+    bot.recover_open_rounds()
+    assert round_open(bot, "rx") and "rx:win" in bot.pending_settlements
+    assert balance(bot, a) == BALANCE - STAKE
+
+    monkeypatch.setattr(bot.wallets, "bulk_write", real_bulk_write)
+    bot.pending_settlements["rx:win"]["retry_at"] = 0
+    bot.retry_settlements()
+    assert bot.journal_sync()
+    assert balance(bot, a) == BALANCE + STAKE and not round_open(bot, "rx")
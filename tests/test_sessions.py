@@ -0,0 +1,90 @@
+import json
+import time
+import hmac
+import hashlib
+import urllib.parse
+
+def init_data(bot, user_id):
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id})}
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot.BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+def login(bot, phone, **extra):
+    return bot.app.test_client().post("/register_or_login", json=dict(phone=phone, username="u", **extra))
+
+def test_phone_only_login_is_refused_by_default(bot):
+    bot.wallets.insert_one({"phone": "0911222333", "balance": 500})
+    r = login(bot, "0911222333")
+    assert r.status_code == 401 and "token" not in r.json
+
+def test_initdata_cannot_take_over_a_wallet_with_another_chat_id(bot):
+    bot.wallets.insert_one({"phone": "0911222333", "chat_id": "777", "balance": 500})
+    r = login(bot, "0911222333", init_data=init_data(bot, 999))
+    assert r.status_code == 403
+    assert bot.wallets.find_one({"phone": "0911222333"})["chat_id"] == "777"
+
+    r = login(bot, "0911222333", init_data=init_data(bot, 777))
+    assert r.status_code == 200 and r.json["balance"] == 500
+    assert bot.read_session(r.json["token"])["p"] == "0911222333"
+    assert bot.wallets.find_one({"phone": "0911222333"})["chat_verified"] is True
+
+def record_telegram(bot, monkeypatch):
+    sent = []
+    monkeypatch.setattr(bot, "telegram_call", lambda method, payload, **kwargs: sent.append((method, payload)))
+    return sent
+
+def admin_callback(bot, message_id, data):
+    bot.process_update({"update_id": message_id, "callback_query": {
+        "id": "q", "data": data, "message": {"message_id": message_id, "text": "req", "chat": {"id": int(bot.ADMIN_ID)}}
+    }})
+
+def test_initdata_binds_an_empty_wallet_without_chat_id(bot):
+    bot.wallets.insert_one({"phone": "0911222444", "balance": 0})
+    assert login(bot, "0911222444", init_data=init_data(bot, 555)).status_code == 200
+    assert login(bot, "0911222444", init_data=init_data(bot, 556)).status_code == 403
+
+def test_funded_wallet_without_chat_id_waits_for_admin_binding(bot, monkeypatch):
+    sent = record_telegram(bot, monkeypatch)
+    bot.wallets.insert_one({"phone": "0911222444", "balance": 20})
+
+    for _ in range(2):
+        r = login(bot, "0911222444", init_data=init_data(bot, 555))
+        assert r.status_code == 403 and r.json["pending"] and "token" not in r.json
+    requests = [payload for method, payload in sent if "Binding" in payload.get("text", "")]
+    assert len(requests) == 1
+    assert "chat_id" not in bot.wallets.find_one({"phone": "0911222444"})
+
+    # 🌟 ሌላ አካውንት ጥያቄውን ቢተካው የቀድሞው ማረጋገጫ አይሰራም
+    assert login(bot, "0911222444", init_data=init_data(bot, 556)).status_code == 403
+    admin_callback(bot, 7001, "app_bind_0911222444_555")
+    assert "chat_id" not in bot.wallets.find_one({"phone": "0911222444"})
+    admin_callback(bot, 7002, "rej_bind_0911222444_556")
+
+    assert login(bot, "0911222444", init_data=init_data(bot, 555)).status_code == 403
+    admin_callback(bot, 7003, "app_bind_0911222444_555")
+    wallet = bot.wallets.find_one({"phone": "0911222444"})
+    assert wallet["chat_id"] == "555" and wallet["chat_verified"] is True and "bind_chat_id" not in wallet
+    assert ("sendMessage", "555") in [(method, payload.get("chat_id")) for method, payload in sent]
+
+    r = login(bot, "0911222444", init_data=init_data(bot, 555))
+    assert r.status_code == 200 and r.json["balance"] == 20
+    assert login(bot, "0911222444", init_data=init_data(bot, 556)).status_code == 403
+
+def test_session_token_is_only_read_from_the_header(bot):
+    bot.wallets.insert_one({"phone": "0911222666", "balance": 0})
+    token = bot.issue_session("0911222666")
+    client = bot.app.test_client()
+    assert client.get("/get_my_status?room=t", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert client.get(f"/get_my_status?room=t&token={token}").status_code == 401
+    assert client.post("/claim_bingo", json={"room": "t", "token": token}).status_code == 401
+
+def test_rollout_flag_allows_phone_login_but_not_rebinding(bot, monkeypatch):
+    monkeypatch.setattr(bot, "REQUIRE_INIT_DATA", False)
+    bot.wallets.insert_one({"phone": "0911222555", "chat_id": "777", "balance": 0})
+    r = login(bot, "0911222555", chat_id="999")
+    assert r.status_code == 200
+    assert bot.wallets.find_one({"phone": "0911222555"})["chat_id"] == "777"
+    assert login(bot, "0911222555", init_data=init_data(bot, 777)).status_code == 200
+    assert login(bot, "0911222555").status_code == 403
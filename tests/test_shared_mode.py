@@ -0,0 +1,151 @@
+import json
+import gevent
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+STAKE = 10
+BALANCE = 100
+
+# 🌟 REDIS_URL ሁነታ በ fakeredis ላይ (Lua ስክሪፕቶቹ እውነት ይሮጣሉ)፤ ይህ worker መሪ ሆኖ ይጀምራል
+@pytest.fixture
+def shared(bot, room, monkeypatch):
+    redis_db = fakeredis.FakeRedis()
+    monkeypatch.setattr(bot, "shared", redis_db)
+    monkeypatch.setattr(bot, "claim_ticket_script", redis_db.register_script(bot.CLAIM_TICKET_LUA))
+    monkeypatch.setattr(bot, "release_ticket_script", redis_db.register_script(bot.RELEASE_TICKET_LUA))
+    monkeypatch.setattr(bot, "renew_leader_script", redis_db.register_script(bot.RENEW_LEADER_LUA))
+    monkeypatch.setattr(bot, "is_leader", True)
+    monkeypatch.setattr(bot, "WORKER_ID", "worker-a")
+    room.set_phase("lobby")
+    return redis_db
+
+def post(bot, path, headers, **body):
+    return bot.app.test_client().post(path, json=dict(body, room="t"), headers=headers).json
+
+def sold(shared, room):
+    raw = shared.hgetall(room.key(f"tickets:{room.state['round_id']}"))
+    return {t_num.decode(): json.loads(ticket)["phone"] for t_num, ticket in raw.items()}
+
+def test_ticket_claim_and_release_go_through_redis(bot, room, shared, players):
+    (a, a_headers), (b, b_headers) = players(2, BALANCE).items()
+
+    assert post(bot, "/buy_specific_ticket", a_headers, ticket_num=5)["success"]
+    assert not post(bot, "/buy_specific_ticket", b_headers, ticket_num=5)["success"]
+    assert sold(shared, room) == {"5": a}
+    assert bot.wallets.find_one({"phone": a})["balance"] == BALANCE - STAKE
+    assert bot.wallets.find_one({"phone": b})["balance"] == BALANCE
+
+    assert not post(bot, "/cancel_ticket", b_headers, ticket_num=5)["success"]
+    assert post(bot, "/cancel_ticket", a_headers, ticket_num=5)["success"]
+    assert sold(shared, room) == {}
+    assert bot.wallets.find_one({"phone": a})["balance"] == BALANCE
+
+    assert post(bot, "/buy_specific_ticket", b_headers, ticket_num=5)["success"]
+    assert sold(shared, room) == {"5": b}
+
+def test_tickets_are_not_sold_once_the_round_left_the_lobby(bot, room, shared, players):
+    (a, a_headers), = players(1, BALANCE).items()
+    assert post(bot, "/buy_specific_ticket", a_headers, ticket_num=1)["success"]
+    room.set_phase("playing")
+
+    assert not bot.shared_claim_ticket(room, "2", a, "u")
+    assert not bot.shared_release_ticket(room, "1", a)
+    assert sold(shared, room) == {"1": a}
+
+# 🌟 የቀድሞው መሪ lobby ላይ እያለ ቢቆም አዲሱ መሪ ያንኑ ዙር (ትኬቶች፣ seed) ይቀጥላል
+def test_new_leader_adopts_the_lobby_round_with_its_seed(bot, room, shared, players, monkeypatch):
+    (a, a_headers), (b, b_headers) = players(2, BALANCE).items()
+    assert post(bot, "/buy_specific_ticket", a_headers, ticket_num=1)["success"]
+    assert post(bot, "/buy_specific_ticket", b_headers, ticket_num=2)["success"]
+    round_id, seed, seed_hash = room.state["round_id"], room.state["seed"], room.state["seed_hash"]
+
+    successor = bot.GameRoom("t", STAKE)
+    monkeypatch.setitem(bot.game_rooms, "t", successor)
+    assert successor.state["seed"] != seed
+    successor.take_over()
+
+    assert successor.state["round_id"] == round_id
+    assert successor.state["seed"] == seed and successor.state["seed_hash"] == seed_hash
+    assert successor.state["sold_tickets"] == {"1": a, "2": b}
+    assert successor.state["pot"] == 2 * STAKE
+
+def test_new_leader_refunds_a_round_that_was_playing(bot, room, shared, players, monkeypatch):
+    (a, a_headers), (b, b_headers) = players(2, BALANCE).items()
+    assert post(bot, "/buy_specific_ticket", a_headers, ticket_num=1)["success"]
+    assert post(bot, "/buy_specific_ticket", b_headers, ticket_num=2)["success"]
+    room.set_phase("playing")
+    round_id = room.state["round_id"]
+
+    successor = bot.GameRoom("t", STAKE)
+    monkeypatch.setitem(bot.game_rooms, "t", successor)
+    successor.take_over()
+    successor.take_over()
+
+    assert bot.wallets.find_one({"phone": a})["balance"] == BALANCE
+    assert bot.wallets.find_one({"phone": b})["balance"] == BALANCE
+    assert successor.state["round_id"] != round_id
+    assert shared.get(room.key("phase")).decode() == f"lobby:{successor.state['round_id']}"
+
+def test_new_leader_finishes_a_recorded_settlement(bot, room, shared, players, monkeypatch):
+    (a, _), = players(1, BALANCE).items()
+    shared.set(room.key("settlement"), json.dumps({"key": "r1:win", "credits": {a: 50}}))
+    room.set_phase("settling")
+
+    successor = bot.GameRoom("t", STAKE)
+    monkeypatch.setitem(bot.game_rooms, "t", successor)
+    successor.take_over()
+    assert bot.wallets.find_one({"phone": a})["balance"] == BALANCE + 50
+    assert shared.get(room.key("settlement")) is None
+
+# 🌟 የመሪው ቁልፍ የሚታደሰው በያዘው worker ብቻ ነው፤ ጊዜው ሲያልፍ ሌላው ይረከባል
+def test_leadership_moves_when_the_leader_stops_renewing(bot, room, shared, monkeypatch):
+    monkeypatch.setattr(bot, "LEADER_TTL", 1)
+    monkeypatch.setattr(bot, "is_leader", False)
+    took_over = []
+    monkeypatch.setattr(bot, "become_leader", lambda: took_over.append(bot.WORKER_ID))
+
+    first = gevent.spawn(bot.leader_elector)
+    gevent.sleep(0.2)
+    assert bot.is_leader and took_over == ["worker-a"]
+    assert shared.get(bot.LEADER_KEY) == b"worker-a"
+
+    # 🌟 worker-a ይቆማል፤ worker-b ቁልፉ እስኪያልፍ አይረከብም
+    first.kill()
+    monkeypatch.setattr(bot, "is_leader", False)
+    monkeypatch.setattr(bot, "WORKER_ID", "worker-b")
+    assert bot.renew_leader_script(keys=[bot.LEADER_KEY], args=["worker-b", 1000]) == 0
+    second = gevent.spawn(bot.leader_elector)
+    gevent.sleep(0.05)
+    assert not bot.is_leader
+    gevent.sleep(1.5)
+    second.kill()
+    assert bot.is_leader and took_over == ["worker-a", "worker-b"]
+    assert shared.get(bot.LEADER_KEY) == b"worker-b"
+
+# 🌟 መሪ ያልሆነ worker የ bingo ጥያቄውን በ Redis ያስተላልፋል፤ መልሱን መሪው በ reply list ይመልሳል
+def test_claim_is_forwarded_to_the_leader(bot, room, shared, players, monkeypatch):
+    (a, a_headers), (b, b_headers) = players(2, BALANCE).items()
+    room.state.update(status="playing", drawn_balls=[7], players={a: {"cards": {}, "username": "a"}})
+    room.round_winners = {a}
+
+    def leader():
+        pubsub = shared.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(bot.SHARED_EVENTS)
+        while True:
+            message = pubsub.get_message(timeout=0.01)
+            if message:
+                event = json.loads(message["data"])
+                bot.game_rooms[event["room"]].apply_event(event)
+            gevent.sleep(0.001)
+    listener = gevent.spawn(leader)
+    gevent.sleep(0.02)
+    monkeypatch.setattr(bot, "is_leader", False)
+    monkeypatch.setattr(room, "sync_from_shared", lambda: None)
+
+    assert post(bot, "/claim_bingo", a_headers) == {"success": True}
+    assert post(bot, "/claim_bingo", b_headers) == room.claim(b)
+    listener.kill()
+
+    monkeypatch.setattr(bot, "SHARED_REPLY_TIMEOUT", 0.2)
+    assert post(bot, "/claim_bingo", a_headers)["success"] is False
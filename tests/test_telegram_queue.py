@@ -0,0 +1,53 @@
+import time
+import gevent
+from gevent.queue import Queue
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+def fake_session(bot, monkeypatch, limited=()):
+    sent = []
+    limited = set(limited)
+
+    class Session:
+        def post(self, url, json=None, data=None, files=None, timeout=None):
+            payload = json or data
+            at = time.monotonic()
+            gevent.sleep(0.001)
+            key = (payload.get("chat_id"), payload.get("text"))
+            if key in limited:
+                limited.discard(key)
+                return FakeResponse(429, {"ok": False, "parameters": {"retry_after": 0.05}})
+            sent.append((url.rsplit("/", 1)[1], payload.get("chat_id"), payload.get("text"), at))
+            return FakeResponse(200, {"ok": True, "result": {}})
+
+    monkeypatch.setattr(bot, "tg_session", Session())
+    monkeypatch.setattr(bot, "tg_queue", Queue())
+    monkeypatch.setattr(bot, "tg_limits", {"global": 0.0, "chats": {}})
+    monkeypatch.setattr(bot, "tg_parked", {})
+    monkeypatch.setattr(bot, "tg_workers_started", False)
+    monkeypatch.setattr(bot, "TG_CHAT_INTERVAL", 0.05)
+    return sent
+
+# 🌟 ለአንድ chat የሚላክ ብዙ መልዕክት ሁሉንም worker አይይዝም፤ ሌሎች chat ዎች እና answerCallbackQuery ወዲያው ይሄዳሉ
+def test_burst_to_one_chat_does_not_hold_every_worker(bot, monkeypatch):
+    sent = fake_session(bot, monkeypatch, limited={("1", "page 3")})
+    burst = [bot.telegram_call("sendMessage", {"chat_id": "1", "text": f"page {i}"}) for i in range(30)]
+    gevent.sleep(0.01)
+
+    started = time.monotonic()
+    other = bot.telegram_call("sendMessage", {"chat_id": "2", "text": "hello"})
+    answer = bot.telegram_call("answerCallbackQuery", {"callback_query_id": "q", "text": "ok"})
+    assert other.get(timeout=1)["ok"] and answer.get(timeout=1)["ok"]
+    assert time.monotonic() - started < 0.2
+
+    assert all(result.get(timeout=5)["ok"] for result in burst)
+    pages = [(text, at) for method, chat_id, text, at in sent if chat_id == "1"]
+    assert [text for text, _ in pages] == [f"page {i}" for i in range(30)]
+    assert all(b - a >= 0.04 for (_, a), (_, b) in zip(pages, pages[1:]))
+    assert not bot.tg_parked
@@ -0,0 +1,56 @@
+import random
+import gevent
+
+STAKE = 10
+BALANCE = 1000
+
+def buy_storm(bot, auth, attempts, tickets, seed):
+    rng = random.Random(seed)
+    phones = list(auth)
+    wins = {}
+
+    def buyer(phone, t_num):
+        r = bot.app.test_client().post("/buy_specific_ticket", json={"room": "t", "ticket_num": t_num}, headers=auth[phone])
+        if r.json["success"]:
+            wins.setdefault(str(t_num), []).append(phone)
+
+    gevent.joinall([gevent.spawn(buyer, rng.choice(phones), rng.randint(1, tickets)) for _ in range(attempts)], raise_error=True)
+    return wins
+
+def assert_one_sale_per_ticket(bot, room, auth, wins):
+    sold = room.state["sold_tickets"]
+    assert all(len(buyers) == 1 for buyers in wins.values())
+    assert {t: buyers[0] for t, buyers in wins.items()} == sold
+    assert room.state["pot"] == STAKE * len(sold)
+    assert len(room.cards["tickets"]) == len(sold)
+    for phone in auth:
+        owned = sum(1 for owner in sold.values() if owner == phone)
+        assert bot.wallets.find_one({"phone": phone})["balance"] == BALANCE - STAKE * owned
+
+def test_concurrent_buys_cached_wallets(bot, room, players):
+    auth = players(100, BALANCE)
+    wins = buy_storm(bot, auth, 3000, 20, seed=14)
+    bot.wallet_flush()
+    assert len(wins) == 20
+    assert_one_sale_per_ticket(bot, room, auth, wins)
+
+# 🌟 በ Redis ሁነታ ክፍያው በቀጥታ Mongo ላይ ነው (entry["direct"])፤ debit ሲጠበቅ ሌሎች ግዢዎች ይገባሉ
+def test_concurrent_buys_direct_mongo_debit(bot, room, players, monkeypatch):
+    auth = players(100, BALANCE)
+    wallet_get = bot.wallet_get
+
+    def direct_wallet_get(phone_num):
+        entry = wallet_get(phone_num)
+        bot.wallet_cache.pop(phone_num, None)
+        return dict(entry, direct=True) if entry else None
+    monkeypatch.setattr(bot, "wallet_get", direct_wallet_get)
+
+    find_one_and_update = bot.wallets.find_one_and_update
+    def slow_debit(*args, **kwargs):
+        gevent.sleep(0.001)
+        return find_one_and_update(*args, **kwargs)
+    monkeypatch.setattr(bot.wallets, "find_one_and_update", slow_debit)
+
+    wins = buy_storm(bot, auth, 3000, 20, seed=15)
+    assert len(wins) == 20
+    assert_one_sale_per_ticket(bot, room, auth, wins)
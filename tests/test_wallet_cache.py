@@ -0,0 +1,202 @@
+import random
+import gevent
+import pytest
+
+STAKE = 10
+BALANCE = 100
+
+# 🌟 bulk_write በመሀል ይቆማል (ሌሎች ጥያቄዎች እንዲገቡ)፤ አንዳንዴ ሳይጻፍ፣ አንዳንዴ ከተጻፈ በኋላ (ack ጠፍቶ) ይወድቃል
+def flaky_bulk_write(bot, monkeypatch, rng, stats):
+    real = bot.wallets.bulk_write
+
+    def bulk_write(ops, **kwargs):
+        gevent.sleep(0)
+        roll = rng.random()
+        if roll < 0.25:
+            stats["before"] += 1
+            raise RuntimeError("injected failure before write")
+        result = real(ops, **kwargs)
+        gevent.sleep(0)
+        if roll < 0.5:
+            stats["after"] += 1
+            raise RuntimeError("injected failure after write")
+        return result
+    monkeypatch.setattr(bot.wallets, "bulk_write", bulk_write)
+    return real
+
+def drain(bot):
+    for _ in range(20):
+        bot.wallet_flush()
+        if bot.wallet_batch is None and not any(e["pending"] or e["inflight"] or e["stale"] for e in bot.wallet_cache.values()):
+            return
+    raise AssertionError("wallet cache did not drain")
+
+def test_buy_cancel_storm_conserves_money(bot, room, players, monkeypatch):
+    rng = random.Random(8)
+    auth = players(40, BALANCE)
+    stats = {"before": 0, "after": 0, "negative": []}
+    deposits = {p: 0 for p in auth}
+    real_bulk_write = flaky_bulk_write(bot, monkeypatch, rng, stats)
+    running = {"storm": True}
+
+    def flusher():
+        while running["storm"]:
+            bot.wallet_flush()
+            gevent.sleep(0.001)
+
+    # 🌟 የአድሚን ዲፖዚት በቀጥታ Mongo ላይ ይገባል፤ ካሽው በ wallet_sync ማወቅ አለበት
+    def depositor():
+        phones = list(auth)
+        n = 0
+        while running["storm"]:
+            n += 1
+            phone = rng.choice(phones)
+            updated, _ = bot.wallet_apply_once(phone, 5, f"dep_{n}")
+            if updated:
+                deposits[phone] += 5
+                bot.notify_wallet_balance(phone, updated["balance"])
+            gevent.sleep(0.002)
+
+    def player(phone, headers):
+        client = bot.app.test_client()
+        mine = []
+        for _ in range(60):
+            if mine and rng.random() < 0.4:
+                t_num = mine.pop(rng.randrange(len(mine)))
+                r = client.post("/cancel_ticket", json={"room": "t", "ticket_num": t_num}, headers=headers)
+                if not r.json["success"]:
+                    mine.append(t_num)
+            else:
+                t_num = rng.randint(1, 80)
+                r = client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": t_num}, headers=headers)
+                if r.json["success"]:
+                    mine.append(t_num)
+            entry = bot.wallet_cache.get(phone)
+            if entry and bot.wallet_available(entry) < 0:
+                stats["negative"].append(phone)
+            gevent.sleep(0)
+
+    background = [gevent.spawn(flusher), gevent.spawn(depositor)]
+    gevent.joinall([gevent.spawn(player, p, h) for p, h in auth.items()], raise_error=True)
+    running["storm"] = False
+    gevent.joinall(background, raise_error=True)
+    monkeypatch.setattr(bot.wallets, "bulk_write", real_bulk_write)
+    drain(bot)
+
+    assert stats["before"] and stats["after"], "storm never hit an injected failure"
+    assert not stats["negative"]
+    balances = {u["phone"]: u["balance"] for u in bot.wallets.find({}, {"phone": 1, "balance": 1})}
+    assert all(b >= 0 for b in balances.values())
+    sold = room.state["sold_tickets"]
+    assert room.state["pot"] == STAKE * len(sold)
+    assert sum(balances.values()) + room.state["pot"] == BALANCE * len(auth) + sum(deposits.values())
+    for phone in auth:
+        owned = sum(1 for owner in sold.values() if owner == phone)
+        assert balances[phone] == BALANCE + deposits[phone] - STAKE * owned
+        assert bot.wallet_available(bot.wallet_get(phone)) == balances[phone]
+
+def test_flush_failure_after_write_is_not_applied_twice(bot, room, players, monkeypatch):
+    auth = players(1, BALANCE)
+    phone, headers = next(iter(auth.items()))
+    client = bot.app.test_client()
+    assert client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": 7}, headers=headers).json["success"]
+
+    real = bot.wallets.bulk_write
+    def applied_then_lost(ops, **kwargs):
+        real(ops, **kwargs)
+        raise RuntimeError("ack lost")
+    monkeypatch.setattr(bot.wallets, "bulk_write", applied_then_lost)
+    assert bot.wallet_flush() is False
+    monkeypatch.setattr(bot.wallets, "bulk_write", real)
+    drain(bot)
+
+    assert bot.wallets.find_one({"phone": phone})["balance"] == BALANCE - STAKE
+    assert bot.wallet_available(bot.wallet_get(phone)) == BALANCE - STAKE
+
+def approve_withdrawal(bot, message_id, phone, amount):
+    bot.process_update({"update_id": message_id, "callback_query": {
+        "id": "q", "data": f"app_wit_{phone}_{amount}",
+        "message": {"message_id": message_id, "text": "req", "chat": {"id": int(bot.ADMIN_ID)}}
+    }})
+
+def slow_mongo_debit(bot, monkeypatch):
+    real = bot.wallets.find_one_and_update
+    def find_one_and_update(*args, **kwargs):
+        gevent.sleep(0.01)
+        return real(*args, **kwargs)
+    monkeypatch.setattr(bot.wallets, "find_one_and_update", find_one_and_update)
+
+# 🌟 የአድሚን ዊዝድሮዋል እና ትኬት ግዢ አንድ ላይ ሲመጡ ከሁለቱ አንዱ ብቻ ይሳካል፤ ባላንሱ ከዜሮ በታች አይወርድም
+def test_withdrawal_approval_and_cached_buy_cannot_spend_the_same_money(bot, room, players, monkeypatch):
+    monkeypatch.setattr(bot, "telegram_call", lambda *args, **kwargs: None)
+    slow_mongo_debit(bot, monkeypatch)
+    auth = players(2, BALANCE)
+    (first, first_headers), (second, second_headers) = auth.items()
+    client = bot.app.test_client()
+
+    # 🌟 ዊዝድሮዋሉ Mongo ላይ እየጻፈ እያለ ግዢ ይገባል
+    withdrawal = gevent.spawn(approve_withdrawal, bot, 501, first, BALANCE)
+    gevent.sleep(0.001)
+    bought = client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": 1}, headers=first_headers).json["success"]
+    withdrawal.get()
+    assert not bought
+
+    # 🌟 ግዢው ገና ካሽ ላይ እያለ (ወደ Mongo ሳይጻፍ) ዊዝድሮዋል ይጸድቃል
+    assert client.post("/buy_specific_ticket", json={"room": "t", "ticket_num": 2}, headers=second_headers).json["success"]
+    approve_withdrawal(bot, 502, second, BALANCE)
+    drain(bot)
+
+    assert bot.wallets.find_one({"phone": first})["balance"] == 0
+    assert bot.wallets.find_one({"phone": second})["balance"] == BALANCE - STAKE
+    assert room.state["sold_tickets"] == {"2": second}
+    assert bot.wallet_available(bot.wallet_get(second)) == BALANCE - STAKE
+
+def test_debit_is_refused_and_retried_when_the_cache_cannot_be_flushed(bot, room, players, monkeypatch):
+    monkeypatch.setattr(bot, "telegram_call", lambda *args, **kwargs: None)
+    phone, headers = next(iter(players(1, BALANCE).items()))
+    assert bot.app.test_client().post("/buy_specific_ticket", json={"room": "t", "ticket_num": 3}, headers=headers).json["success"]
+
+    def bulk_write(ops, **kwargs):
+        raise RuntimeError("mongo down")
+    monkeypatch.setattr(bot.wallets, "bulk_write", bulk_write)
+    with pytest.raises(RuntimeError):
+        approve_withdrawal(bot, 503, phone, 50)
+    assert bot.wallets.find_one({"phone": phone})["balance"] == BALANCE
+    assert not bot.wallet_action_applied(phone, "cb_503")
+
+# 🌟 bulk_write ተሳክቶ መልሶ ማንበቡ ቢወድቅ inflight አይቀርም፤ ቀጥሎ የሚመጣ ዲፖዚት ካሹን ከ Mongo ጋር ያስተካክላል
+def test_failed_read_back_does_not_leave_the_batch_inflight(bot, room, players, monkeypatch):
+    phone, headers = next(iter(players(1, BALANCE).items()))
+    assert bot.app.test_client().post("/buy_specific_ticket", json={"room": "t", "ticket_num": 4}, headers=headers).json["success"]
+
+    real_find = bot.wallets.find
+    def find(*args, **kwargs):
+        raise RuntimeError("read timeout")
+    monkeypatch.setattr(bot.wallets, "find", find)
+    assert bot.wallet_flush() is True
+    entry = bot.wallet_cache[phone]
+    assert entry["inflight"] == 0 and entry["stale"]
+    assert bot.wallet_available(entry) == BALANCE - STAKE
+    monkeypatch.setattr(bot.wallets, "find", real_find)
+
+    bot.wallet_apply_once(phone, 50, "dep_1")
+    drain(bot)
+    assert bot.wallets.find_one({"phone": phone})["balance"] == BALANCE - STAKE + 50
+    assert bot.wallet_available(bot.wallet_get(phone)) == BALANCE - STAKE + 50
+
+def test_flusher_keeps_running_after_an_error(bot, monkeypatch):
+    monkeypatch.setattr(bot, "WALLET_FLUSH_INTERVAL", 0.001)
+    monkeypatch.setattr(bot, "journal_buffer", [{"_id": "x"}])
+    calls = []
+    def journal_write(events):
+        calls.append(events)
+        if len(calls) == 1:
+            raise RuntimeError("journal write blew up")
+        return True
+    monkeypatch.setattr(bot, "journal_write", journal_write)
+
+    flusher = gevent.spawn(bot.wallet_flusher)
+    gevent.sleep(0.05)
+    assert not flusher.dead
+    flusher.kill()
+    assert len(calls) == 2 and calls[1] == [{"_id": "x"}]
@@ -0,0 +1,67 @@
+import gevent
+
+ADMIN_UPDATE = 9100
+
+def admin_update(bot, update_id, text):
+    return {"update_id": update_id, "message": {"chat": {"id": int(bot.ADMIN_ID)}, "text": text}}
+
+def wait_done(bot, update_id):
+    for _ in range(200):
+        if update_id not in bot.webhook_pending:
+            return
+        gevent.sleep(0.01)
+    raise AssertionError(f"update {update_id} still pending")
+
+def test_failed_add_is_retried_and_applied_once(bot, players, monkeypatch):
+    phone = next(iter(players(1, 100)))
+    bot.webhook_updates.delete_many({})
+    monkeypatch.setattr(bot, "WEBHOOK_RETRY_SECONDS", 0.01)
+    calls = []
+
+    # 🌟 ባላንሱ ከተጨመረ በኋላ የአድሚን መልዕክቱ ይወድቃል (ለምሳሌ Mongo/Telegram ስህተት)
+    def telegram_call(method, payload, **kwargs):
+        calls.append(method)
+        if len(calls) == 1:
+            raise RuntimeError("injected failure")
+    monkeypatch.setattr(bot, "telegram_call", telegram_call)
+
+    assert bot.enqueue_update(admin_update(bot, ADMIN_UPDATE, f"/add {phone} 50"))
+    wait_done(bot, ADMIN_UPDATE)
+
+    assert len(calls) == 2
+    assert bot.wallets.find_one({"phone": phone})["balance"] == 150
+    assert bot.webhook_updates.find_one({"_id": ADMIN_UPDATE})
+    bot.enqueue_update(admin_update(bot, ADMIN_UPDATE, f"/add {phone} 50"))
+    wait_done(bot, ADMIN_UPDATE)
+    assert bot.wallets.find_one({"phone": phone})["balance"] == 150
+
+def test_update_that_keeps_failing_is_dead_lettered_and_can_be_replayed(bot, players, monkeypatch):
+    phone = next(iter(players(1, 100)))
+    bot.webhook_updates.delete_many({})
+    bot.webhook_dead_letters.delete_many({})
+    monkeypatch.setattr(bot, "WEBHOOK_RETRY_SECONDS", 0.01)
+    calls = []
+
+    def telegram_call(method, payload, **kwargs):
+        calls.append(payload.get("text", ""))
+        raise RuntimeError("injected failure")
+    monkeypatch.setattr(bot, "telegram_call", telegram_call)
+
+    assert bot.enqueue_update(admin_update(bot, ADMIN_UPDATE + 1, f"/sub {phone} 30"))
+    wait_done(bot, ADMIN_UPDATE + 1)
+
+    assert bot.wallets.find_one({"phone": phone})["balance"] == 70
+    assert bot.webhook_updates.find_one({"_id": ADMIN_UPDATE + 1}) is None
+    dead = bot.webhook_dead_letters.find_one({"_id": ADMIN_UPDATE + 1})
+    assert dead["update"]["message"]["text"] == f"/sub {phone} 30" and dead["attempts"] == bot.WEBHOOK_ATTEMPTS
+    assert f"/replay {ADMIN_UPDATE + 1}" in calls[-1]
+
+    # 🌟 ችግሩ ከተፈታ በኋላ አድሚኑ ይደግመዋል፤ ቅናሹ ቀድሞ ስለተመዘገበ እንደገና አይቀነስም
+    monkeypatch.setattr(bot, "telegram_call", lambda method, payload, **kwargs: calls.append(payload.get("text", "")))
+    bot.process_update(admin_update(bot, ADMIN_UPDATE + 2, f"/replay {ADMIN_UPDATE + 1}"))
+    wait_done(bot, ADMIN_UPDATE + 1)
+    assert bot.wallets.find_one({"phone": phone})["balance"] == 70
+    assert bot.webhook_dead_letters.find_one({"_id": ADMIN_UPDATE + 1}) is None
+    assert bot.webhook_updates.find_one({"_id": ADMIN_UPDATE + 1})
+    bot.process_update(admin_update(bot, ADMIN_UPDATE + 3, f"/replay {ADMIN_UPDATE + 1}"))
+    assert "❌" in calls[-1]